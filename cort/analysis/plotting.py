@@ -3,14 +3,6 @@
 from __future__ import division
 
 
-from matplotlib import pyplot
-from matplotlib import cm
-
-import numpy
-
-from pylab import rcParams
-
-
 __author__ = 'martscsn'
 
 
@@ -44,6 +36,13 @@ def plot(data,
             "Type of anaphor",
             "Number of Errors")
     """
+    # imported here to avoid loading matplotlib when importing cort.analysis
+    from matplotlib import pyplot
+    from matplotlib import cm
+
+    import numpy
+
+    from pylab import rcParams
 
     rcParams['xtick.major.pad'] = '12'
     rcParams['ytick.major.pad'] = '12'
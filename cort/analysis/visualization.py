@@ -3,8 +3,6 @@ from __future__ import print_function
 import shutil
 import html
 import os
-import webbrowser
-from distutils.dir_util import mkpath
 from random import randint
 
 import cort
@@ -142,6 +140,7 @@ class Visualizer:
             shutil.copytree(package_dir + "/analysis/visualization",
                             "temp/output/visualization")
 
+        import webbrowser
         webbrowser.open_new_tab("file://" + abs_path)
 
     def __generate_html(self, document, mentions):
@@ -110,6 +110,8 @@ class CoNLLDocument:
 
         self.antecedent_decisions = {}
 
+        self.__derived = {}
+
     def __repr__(self):
         return self.folder + self.id + ", part " + self.part
 
@@ -302,6 +304,27 @@ class CoNLLDocument:
             if sentence_span.embeds(span):
                 return sentence_span
 
+    def derived(self, function):
+        """ Compute a structure derived from the document once.
+
+        Args:
+            function (function: CoNLLDocument -> object): A function computing
+                the structure, for example the constructor of an index over
+                the system mentions.
+
+        Returns:
+            The result of applying ``function`` to this document. The result
+            is cached, hence the function is only called once, unless
+            ``system_mentions`` is replaced in the meantime.
+        """
+        cached = self.__derived.get(function)
+
+        if cached is None or cached[0] is not self.system_mentions:
+            cached = (self.system_mentions, function(self))
+            self.__derived[function] = cached
+
+        return cached[1]
+
     def get_string_representation(self):
         """ Get a string representation of the document.
 
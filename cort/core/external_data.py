@@ -2,6 +2,11 @@
 
 import os
 import pickle
+import tempfile
+
+
+import mmh3
+import numpy
 
 
 import cort
@@ -12,33 +17,315 @@ from cort.core import util
 __author__ = 'smartschat'
 
 
+def _hash_key(key):
+    """ Hash a string (or a tuple of strings) to an unsigned 64 bit integer.
+
+    Args:
+        key (str or tuple(str)): The key to hash. Tuples are joined with a tab
+            character before hashing.
+
+    Returns:
+        int: A 64 bit hash of the key.
+    """
+    if isinstance(key, tuple):
+        key = "\t".join(key)
+
+    return mmh3.hash64(key)[0] % 2**64
+
+
+class CompactStringMap:
+    """ A read-only mapping from strings to integers backed by numpy arrays.
+
+    Keys are stored as sorted 64 bit hashes, values in an array aligned with
+    the keys. Both arrays can be stored as ``.npy`` files and memory-mapped,
+    such that several processes share one copy of the data via the page
+    cache. If no values are given, the structure behaves like a set.
+
+    Attributes:
+        keys (numpy.array): Sorted hashes of all keys (dtype uint64).
+        values (numpy.array): The values corresponding to the keys, or None.
+        labels (list(str)): If not None, values are interpreted as indices
+            into this list when looked up.
+    """
+    def __init__(self, keys, values=None, labels=None):
+        """ Initialize the mapping from arrays.
+
+        Args:
+            keys (numpy.array): Sorted hashes of all keys (dtype uint64).
+            values (numpy.array): The values corresponding to the keys.
+                Defaults to None.
+            labels (list(str)): If not None, values are interpreted as indices
+                into this list when looked up. Defaults to None.
+        """
+        self.keys = keys
+        self.values = values
+        self.labels = labels
+
+    @staticmethod
+    def from_mapping(mapping, labels=None):
+        """ Build a compact mapping from a dict or a set.
+
+        Args:
+            mapping (dict(str, int) or set(str)): The data to store. Keys may
+                also be tuples of strings.
+            labels (list(str)): If not None, values of ``mapping`` must be
+                contained in this list, and are stored as indices into it.
+
+        Returns:
+            CompactStringMap: A mapping containing the data.
+        """
+        hashes = numpy.fromiter((_hash_key(key) for key in mapping),
+                                dtype=numpy.uint64, count=len(mapping))
+        order = numpy.argsort(hashes, kind="mergesort")
+
+        values = None
+        if isinstance(mapping, dict):
+            if labels is not None:
+                label_to_index = dict((label, i) for i, label
+                                      in enumerate(labels))
+                values = [label_to_index[value] for value in mapping.values()]
+            else:
+                values = list(mapping.values())
+
+            values = numpy.array(values, dtype=numpy.int32)[order]
+
+        return CompactStringMap(hashes[order], values, labels)
+
+    @classmethod
+    def load(cls, prefix, labels=None):
+        """ Load a compact mapping stored via ``save``.
+
+        The arrays are memory-mapped read-only.
+
+        Args:
+            prefix (str): The path prefix the mapping was saved to.
+            labels (list(str)): Labels for the values (see class
+                documentation). Defaults to None.
+
+        Returns:
+            CompactStringMap: The memory-mapped mapping.
+        """
+        keys = numpy.load(prefix + ".keys.npy", mmap_mode="r")
+
+        values = None
+        if os.path.exists(prefix + ".values.npy"):
+            values = numpy.load(prefix + ".values.npy", mmap_mode="r")
+
+        return cls(keys, values, labels)
+
+    def save(self, prefix):
+        """ Save the mapping to ``prefix.keys.npy`` and ``prefix.values.npy``.
+
+        Files are written to a temporary location first and then moved, so
+        that processes concurrently loading the mapping never see partially
+        written files.
+
+        Args:
+            prefix (str): The path prefix of the files.
+        """
+        # keys are written last, their presence marks a complete mapping
+        arrays = [(".keys.npy", self.keys)]
+        if self.values is not None:
+            arrays.insert(0, (".values.npy", self.values))
+
+        for suffix, array in arrays:
+            handle, temp_name = tempfile.mkstemp(
+                dir=os.path.dirname(prefix), suffix=".npy")
+            with os.fdopen(handle, "wb") as temp_file:
+                numpy.save(temp_file, array)
+            os.rename(temp_name, prefix + suffix)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __index(self, key):
+        hashed = numpy.uint64(_hash_key(key))
+        index = int(numpy.searchsorted(self.keys, hashed))
+
+        if index < len(self.keys) and self.keys[index] == hashed:
+            return index
+
+    def __contains__(self, key):
+        return self.__index(key) is not None
+
+    def __getitem__(self, key):
+        index = self.__index(key)
+
+        if index is None or self.values is None:
+            raise KeyError(key)
+
+        value = int(self.values[index])
+
+        if self.labels is not None:
+            return self.labels[value]
+        else:
+            return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+class CompactPairMap(CompactStringMap):
+    """ A read-only mapping from strings to all strings they are paired with.
+
+    Keys are sorted 64 bit hashes of the first components of the pairs, where
+    each pair is stored in both directions. The values are the hashes of the
+    corresponding second components. A key occurs once for every string it is
+    paired with.
+    """
+    @staticmethod
+    def from_pairs(pairs):
+        """ Build a compact pair mapping from a set of string pairs.
+
+        Args:
+            pairs (set((str, str))): The pairs to store.
+
+        Returns:
+            CompactPairMap: A mapping containing the pairs in both directions.
+        """
+        firsts = numpy.array([_hash_key(first) for first, _ in pairs],
+                             dtype=numpy.uint64)
+        seconds = numpy.array([_hash_key(second) for _, second in pairs],
+                              dtype=numpy.uint64)
+
+        keys = numpy.concatenate([firsts, seconds])
+        values = numpy.concatenate([seconds, firsts])
+        order = numpy.argsort(keys, kind="mergesort")
+
+        return CompactPairMap(keys[order], values[order])
+
+    def partners(self, strings):
+        """ Find all pairs among a list of strings.
+
+        Args:
+            strings (list(str)): A list of strings.
+
+        Returns:
+            list((int, int)): All index pairs ``(i, j)`` such that
+            ``(strings[i], strings[j])`` or ``(strings[j], strings[i])`` is
+            contained in the mapping (each pair is returned in both orders).
+        """
+        hashes = [_hash_key(string) for string in strings]
+
+        hash_to_indices = {}
+        for i, hashed in enumerate(hashes):
+            hash_to_indices.setdefault(hashed, []).append(i)
+
+        begins = numpy.searchsorted(self.keys, numpy.array(
+            hashes, dtype=numpy.uint64), side="left")
+        ends = numpy.searchsorted(self.keys, numpy.array(
+            hashes, dtype=numpy.uint64), side="right")
+
+        pairs = []
+
+        for i, (begin, end) in enumerate(zip(begins, ends)):
+            for partner in self.values[begin:end].tolist():
+                for j in hash_to_indices.get(partner, []):
+                    pairs.append((i, j))
+
+        return pairs
+
+
+def _load_compact(name, sources, build, labels=None, cls=CompactStringMap):
+    """ Load a compact resource, building it from its sources if needed.
+
+    The compact files are stored next to the sources in the resources
+    directory. If that directory is not writable, they are stored in the
+    directory given by the environment variable ``CORT_CACHE`` (defaulting to
+    ``~/.cache/cort``). If they cannot be stored at all, the mapping is kept in
+    memory.
+
+    Args:
+        name (str): The name of the compact resource.
+        sources (list(str)): Paths of the files the resource is built from.
+        build (function: () -> CompactStringMap): Builds the resource from
+            the sources.
+        labels (list(str)): Labels for the values of the mapping. Defaults
+            to None.
+        cls (class): The class of the mapping, ``CompactStringMap`` or a
+            subclass of it. Defaults to ``CompactStringMap``.
+
+    Returns:
+        CompactStringMap: The mapping.
+    """
+    source_time = max([os.path.getmtime(source) for source in sources
+                       if os.path.exists(source)] or [0])
+
+    directories = [
+        os.path.dirname(sources[0]),
+        os.environ.get("CORT_CACHE",
+                       os.path.join(os.path.expanduser("~"), ".cache", "cort"))
+    ]
+
+    for directory in directories:
+        prefix = os.path.join(directory, name)
+        if (os.path.exists(prefix + ".keys.npy")
+                and os.path.getmtime(prefix + ".keys.npy") >= source_time):
+            return cls.load(prefix, labels)
+
+    compact = build()
+
+    for directory in directories:
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            compact.save(os.path.join(directory, name))
+            return cls.load(os.path.join(directory, name), labels)
+        except (IOError, OSError):
+            continue
+
+    return compact
+
+
+def build_compact_resources():
+    """ Build the compact representations of all available resources.
+
+    This is done automatically when a resource is first used, but can be
+    called beforehand (for example after installation) to avoid concurrent
+    building by several worker processes.
+    """
+    GenderData.get_instance()
+    LexicalData.get_instance()
+
+    directory = cort.__path__[0] + "/resources/"
+    if os.path.exists(directory + "singletons_not_cleaned.obj"):
+        SingletonMentions.get_instance()
+
+
 @singletons.Singleton
 class GenderData:
     """ Read in and access data from lists with gender information.
 
     Attributes:
-        word_to_gender (dict(str, str)): A mapping from lower-case strings
+        word_to_gender (CompactStringMap): A mapping from lower-case strings
             to one of four genders: 'MALE', 'FEMALE', 'NEUTRAL' and 'PLURAL'.
     """
     def __init__(self):
         """ Initialize the word-to-gender mapping from gender lists.
         """
-        self.word_to_gender = {}
-
         directory = cort.__path__[0] + "/resources/"
 
+        genders = ["MALE", "FEMALE", "NEUTRAL", "PLURAL"]
         lists = [
-            open(directory + "male.list"),
-            open(directory + "female.list"),
-            open(directory + "neutral.list"),
-            open(directory + "plural.list")
+            directory + "male.list",
+            directory + "female.list",
+            directory + "neutral.list",
+            directory + "plural.list"
         ]
 
-        genders = ["MALE", "FEMALE", "NEUTRAL", "PLURAL"]
+        def build():
+            word_to_gender = {}
 
-        for gender, gender_list in zip(genders, lists):
-            for word in gender_list.readlines():
-                self.word_to_gender[word.strip()] = gender
+            for gender, gender_list in zip(genders, lists):
+                for word in open(gender_list).readlines():
+                    word_to_gender[word.strip()] = gender
+
+            return CompactStringMap.from_mapping(word_to_gender, genders)
+
+        self.word_to_gender = _load_compact("gender", lists, build, genders)
 
     def look_up(self, attributes):
         """ Look up the gender of a mention described by the input attributes.
@@ -73,17 +360,46 @@ class LexicalData:
     """ Read in and access data containing pairs of coreferent mention strings.
 
     Attributes:
-        pairs (set((str, str))): A set of string pairs, which represent strings
-            of potentially coreferent mentions.
+        pairs (CompactStringMap): A set of string pairs, which represent
+            strings of potentially coreferent mentions.
     """
     def __init__(self):
         """ Initialize the set of pairs from
             package_root/resources/coreferent_pairs.obj.
         """
-        directory = cort.__path__[0] + "/resources/"
+        self.source = cort.__path__[0] + "/resources/coreferent_pairs.obj"
+
+        self.pairs = _load_compact(
+            "coreferent_pairs", [self.source],
+            lambda: CompactStringMap.from_mapping(
+                pickle.load(open(self.source, "rb"))))
 
-        self.pairs = pickle.load(
-            open(directory + "coreferent_pairs.obj", "rb"))
+        self.__partners = None
+
+    def partners(self, strings):
+        """ Find all pairs of potentially coreferent strings among a list of
+        strings.
+
+        This is much faster than calling ``look_up`` for all pairs of
+        mentions in a document.
+
+        Args:
+            strings (list(str)): A list of strings of mentions, without
+                determiners and possessive s (as in ``look_up``).
+
+        Returns:
+            list((int, int)): All index pairs ``(i, j)`` such that the pair
+            of ``strings[i]`` and ``strings[j]`` can be found in the list of
+            pairs (in both orders).
+        """
+        if self.__partners is None:
+            self.__partners = _load_compact(
+                "coreferent_pair_partners", [self.source],
+                lambda: CompactPairMap.from_pairs(
+                    pickle.load(open(self.source, "rb"))),
+                cls=CompactPairMap)
+
+        return self.__partners.partners(strings)
 
     def look_up(self, anaphor, antecedent):
         """ Look up strings of the mentions in the pair list.
@@ -117,14 +433,17 @@ class SingletonMentions:
     """ Read in and access data strings of singleton mentions.
 
     Attributes:
-        singletons (set(str)): A set of strings, which represent strings of
-            of potential singleton mentions.
+        singletons (CompactStringMap): The strings of potential singleton
+            mentions. The pickled resource is a set of strings, hence the map
+            stores keys only and supports membership tests.
     """
     def __init__(self):
         """ Initialize the set of pairs from
             package_root/resources/singletons_not_cleaned.obj.
         """
-        directory = cort.__path__[0] + "/resources/"
+        source = cort.__path__[0] + "/resources/singletons_not_cleaned.obj"
 
-        self.singletons = pickle.load(
-            open(directory + "singletons_not_cleaned.obj", "rb"))
+        self.singletons = _load_compact(
+            "singletons_not_cleaned", [source],
+            lambda: CompactStringMap.from_mapping(
+                pickle.load(open(source, "rb"))))
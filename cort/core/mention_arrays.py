@@ -0,0 +1,245 @@
+""" Represent attributes of the mentions in a document as numpy arrays. """
+
+
+import numpy
+
+
+__author__ = 'smartschat'
+
+
+class MentionArrays:
+    """ Integer-coded attributes of a list of mentions.
+
+    Attribute values are computed once per mention and stored in numpy arrays
+    aligned with the list of mentions, so that properties of many mention
+    pairs can be computed with array operations (for example, two mentions
+    have the same head iff the codes of their heads are equal).
+
+    Attributes are described either by a name (then the value is looked up in
+    ``mention.attributes``) or by a function mapping a mention to a value.
+    All arrays are computed lazily and cached. Dummy mentions are skipped:
+    their codes are -1, and their rows in incidence matrices are empty.
+
+    Attributes:
+        mentions (list(Mention)): The mentions, usually the system mentions of
+            a document.
+    """
+    def __init__(self, mentions):
+        """ Initialize the arrays from a list of mentions.
+
+        Args:
+            mentions (list(Mention)): The mentions, usually the system mentions
+                of a document.
+        """
+        self.mentions = mentions
+        self.__cache = {}
+
+    def __len__(self):
+        return len(self.mentions)
+
+    def __values(self, attribute):
+        if callable(attribute):
+            return [None if mention.is_dummy() else attribute(mention)
+                    for mention in self.mentions]
+        else:
+            return [mention.attributes.get(attribute)
+                    for mention in self.mentions]
+
+    def codes(self, attribute):
+        """ Encode an attribute as integers.
+
+        Args:
+            attribute (str or function: Mention -> object): The attribute,
+                either given by its name or computed by a function. Values
+                must be hashable, lists are converted to tuples.
+
+        Returns:
+            numpy.array: For each mention, an integer code of the attribute
+            value (dtype int32). Two mentions have the same code if and only
+            if their values are equal. The code is -1 for dummy mentions.
+        """
+        key = ("codes", attribute)
+
+        if key not in self.__cache:
+            value_to_code = {}
+            codes = numpy.full(len(self.mentions), -1, dtype=numpy.int32)
+
+            for i, value in enumerate(self.__values(attribute)):
+                if self.mentions[i].is_dummy():
+                    continue
+
+                if isinstance(value, list):
+                    value = tuple(value)
+
+                codes[i] = value_to_code.setdefault(value, len(value_to_code))
+
+            self.__cache[key] = codes
+
+        return self.__cache[key]
+
+    def numbers(self, attribute):
+        """ Get a numeric attribute as an array.
+
+        Args:
+            attribute (str or function: Mention -> int): The attribute,
+                either given by its name or computed by a function.
+
+        Returns:
+            numpy.array: For each mention, the value of the attribute (dtype
+            int64). The value is -1 for dummy mentions.
+        """
+        key = ("numbers", attribute)
+
+        if key not in self.__cache:
+            self.__cache[key] = numpy.array(
+                [-1 if mention.is_dummy() else value for mention, value
+                 in zip(self.mentions, self.__values(attribute))],
+                dtype=numpy.int64)
+
+        return self.__cache[key]
+
+    def incidence(self, attribute):
+        """ Represent a set-valued attribute as an incidence matrix.
+
+        Args:
+            attribute (str or function: Mention -> set): The attribute,
+                either given by its name or computed by a function. Values
+                must be iterables of hashable elements.
+
+        Returns:
+            numpy.array: A matrix with one row per mention and one column per
+            distinct element occurring in any value (dtype float32). An entry
+            is 1 if the element is contained in the value for the mention,
+            and 0 otherwise. Products of rows hence count common elements.
+        """
+        key = ("incidence", attribute)
+
+        if key not in self.__cache:
+            element_to_column = {}
+            rows = []
+            columns = []
+
+            for i, value in enumerate(self.__values(attribute)):
+                if self.mentions[i].is_dummy():
+                    continue
+
+                for element in set(value):
+                    rows.append(i)
+                    columns.append(element_to_column.setdefault(
+                        element, len(element_to_column)))
+
+            matrix = numpy.zeros((len(self.mentions), len(element_to_column)),
+                                 dtype=numpy.float32)
+            matrix[rows, columns] = 1
+
+            self.__cache[key] = matrix
+
+        return self.__cache[key]
+
+    def gold_set_ids(self):
+        """ Get the annotated set ids of the mentions as integers.
+
+        Returns:
+            numpy.array: For each mention, an integer code of its annotated
+            set id (dtype int32). Two mentions are coreferent according to the
+            gold annotation iff their codes are equal and not -1. The code is
+            -1 for dummy mentions and for mentions without annotated set id.
+        """
+        key = ("gold_set_ids",)
+
+        if key not in self.__cache:
+            set_id_to_code = {}
+            codes = numpy.full(len(self.mentions), -1, dtype=numpy.int32)
+
+            for i, mention in enumerate(self.mentions):
+                set_id = mention.attributes.get("annotated_set_id")
+
+                if mention.is_dummy() or set_id is None:
+                    continue
+
+                codes[i] = set_id_to_code.setdefault(set_id,
+                                                     len(set_id_to_code))
+
+            self.__cache[key] = codes
+
+        return self.__cache[key]
+
+    def consistency(self, anaphors, antecedents):
+        """ Compute whether linking pairs of mentions is consistent with the
+        gold annotation.
+
+        This is a vectorized version of ``Mention.decision_is_consistent``
+        for pairs of mentions of the same document: a pair is consistent if
+        the mentions are coreferent, or if one of them is the dummy mention
+        and the other one does not have a preceding coreferent mention.
+
+        Args:
+            anaphors (numpy.array): Indices of the first mentions of the
+                pairs.
+            antecedents (numpy.array): Indices of the second mentions of the
+                pairs.
+
+        Returns:
+            numpy.array: A boolean array, which is True for pairs whose
+            linking is consistent with the gold annotation.
+        """
+        key = ("starts_gold_entity",)
+
+        if key not in self.__cache:
+            self.__cache[key] = numpy.array(
+                [mention.attributes.get("annotated_set_id") is None
+                 or bool(mention.attributes.get("first_in_gold_entity"))
+                 for mention in self.mentions], dtype=bool)
+
+        starts_entity = self.__cache[key]
+        is_dummy = self.is_dummy()
+        set_ids = self.gold_set_ids()
+
+        anaphors = numpy.asarray(anaphors, dtype=numpy.int64)
+        antecedents = numpy.asarray(antecedents, dtype=numpy.int64)
+
+        anaphor_is_dummy = is_dummy[anaphors]
+        antecedent_is_dummy = is_dummy[antecedents]
+
+        coreferent = ((set_ids[anaphors] >= 0)
+                      & (set_ids[anaphors] == set_ids[antecedents]))
+
+        return numpy.where(
+            anaphor_is_dummy,
+            antecedent_is_dummy | starts_entity[antecedents],
+            numpy.where(antecedent_is_dummy, starts_entity[anaphors],
+                        coreferent))
+
+    def is_dummy(self):
+        """ Get which mentions are dummy mentions.
+
+        Returns:
+            numpy.array: For each mention, whether it is a dummy mention
+            (dtype bool).
+        """
+        key = ("is_dummy",)
+
+        if key not in self.__cache:
+            self.__cache[key] = numpy.array(
+                [mention.is_dummy() for mention in self.mentions], dtype=bool)
+
+        return self.__cache[key]
+
+    def derived(self, function):
+        """ Compute a structure derived from the arrays once.
+
+        Args:
+            function (function: MentionArrays -> object): A function computing
+                the structure, for example the constructor of an index over
+                the mentions.
+
+        Returns:
+            The result of applying ``function`` to this object. The result is
+            cached, hence the function is only called once.
+        """
+        key = ("derived", function)
+
+        if key not in self.__cache:
+            self.__cache[key] = function(self)
+
+        return self.__cache[key]
@@ -2,8 +2,10 @@
 
 import re
 
+
 from nltk.corpus import wordnet as wn
 
+
 from cort.core import external_data
 from cort.core import head_finders
 from cort.core import nltk_util
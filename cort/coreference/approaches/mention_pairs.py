@@ -30,14 +30,25 @@ Reference:
 """
 
 
+import numpy
+
+
 from cort.coreference import instance_extractors
+from cort.coreference import instance_store
+from cort.coreference import label_weights
 from cort.coreference import perceptrons
 
 
 __author__ = 'martscsn'
 
 
-def extract_training_substructures(doc):
+# bounds for the number of arcs scored at once during training
+_MIN_WINDOW = 8
+_MAX_WINDOW = 4096
+_UPDATES_PER_WINDOW = 2
+
+
+def extract_training_substructures(doc, candidate_antecedents=None):
     """ Extract the search space for training the mention pair model,
 
     The mention pair model consists in computing labels "+" (coreferent) and
@@ -54,9 +65,15 @@ def extract_training_substructures(doc):
     j >0, if the mention m_j is in some coreference chain, add all pairs
     (m_j, m_{j-1}), (m_j, m_{j-2}), ..., (m_j, m_i) to the list, where
     m_i is the first mention preceding m_j which is coreferent with m_j.
+    If candidate antecedents are given, only the pairs (m_j, m_k) where m_k
+    is a candidate antecedent of m_j are added.
 
     Args:
         doc (CoNLLDocument): The document to extract substructures from.
+        candidate_antecedents (CandidateAntecedents): The candidate
+            antecedents of the system mentions of the document (see
+            ``cort.coreference.candidates``). Defaults to None, which means
+            that all preceding mentions are candidates.
 
     Returns:
         (list(list(Mention, Mention))): The nested list of mention pairs
@@ -64,13 +81,41 @@ def extract_training_substructures(doc):
     """
     substructures = []
 
+    system_mentions = doc.system_mentions
+
+    if candidate_antecedents is not None:
+        # the index of the closest preceding coreferent mention, such that
+        # pairs beyond it are not generated although they are candidates
+        closest = [0]*len(system_mentions)
+        last_in_set = {}
+
+        for i, ana in enumerate(system_mentions):
+            set_id = ana.attributes["annotated_set_id"]
+
+            if set_id is not None and not ana.is_dummy():
+                closest[i] = last_in_set.get(set_id, 0)
+                last_in_set[set_id] = i
+
+        for i, ana in enumerate(system_mentions):
+            if not ana.attributes["annotated_set_id"]:
+                continue
+
+            substructures.extend(
+                [(ana, system_mentions[j])]
+                for j in candidate_antecedents.antecedents(i)
+                if j > 0 and j >= closest[i])
+
+        return substructures
+
     # iterate over mentions
-    for i, ana in enumerate(doc.system_mentions):
+    for i, ana in enumerate(system_mentions):
         if not ana.attributes["annotated_set_id"]:
             continue
 
-        # iterate in reversed order over candidate antecedents
-        for ante in sorted(doc.system_mentions[1:i], reverse=True):
+        # iterate in reversed order over candidate antecedents (system
+        # mentions are sorted)
+        for j in range(i - 1, 0, -1):
+            ante = system_mentions[j]
             substructures.append([(ana, ante)])
 
             if ana.is_coreferent_with(ante):
@@ -79,7 +124,7 @@ def extract_training_substructures(doc):
     return substructures
 
 
-def extract_testing_substructures(doc):
+def extract_testing_substructures(doc, candidate_antecedents=None):
     """ Extract the search space for predicting with the mention pair model,
 
     The mention ranking model consists in computing the optimal antecedent
@@ -93,8 +138,15 @@ def extract_testing_substructures(doc):
 
     (m_2, m_1), (m_3, m_2), (m_3, m_1), (m_4, m_3), ...
 
+    If candidate antecedents are given, only the pairs of a mention and one
+    of its candidate antecedents are extracted.
+
     Args:
         doc (CoNLLDocument): The document to extract substructures from.
+        candidate_antecedents (CandidateAntecedents): The candidate
+            antecedents of the system mentions of the document (see
+            ``cort.coreference.candidates``). Defaults to None, which means
+            that all preceding mentions are candidates.
 
     Returns:
         (list(list(Mention, Mention))): The nested list of mention pairs
@@ -102,16 +154,31 @@ def extract_testing_substructures(doc):
     """
     substructures = []
 
+    if candidate_antecedents is not None:
+        for i, ana in enumerate(doc.system_mentions):
+            substructures.extend(
+                [(ana, doc.system_mentions[j])]
+                for j in candidate_antecedents.antecedents(i) if j > 0)
+
+        return substructures
+
     # iterate over mentions
     for i, ana in enumerate(doc.system_mentions):
 
-        # iterate in reversed order over candidate antecedents
-        for ante in sorted(doc.system_mentions[1:i], reverse=True):
-            substructures.append([(ana, ante)])
+        # iterate in reversed order over candidate antecedents (system
+        # mentions are sorted)
+        substructures.extend([(ana, doc.system_mentions[j])]
+                             for j in range(i - 1, 0, -1))
 
     return substructures
 
 
+# both functions generate only the candidate antecedents they are given (see
+# InstanceExtractor)
+extract_training_substructures.accepts_candidates = True
+extract_testing_substructures.accepts_candidates = True
+
+
 class MentionPairsPerceptron(perceptrons.Perceptron):
     """ A perceptron for the mention pair model. """
     def argmax(self, substructure, arc_information):
@@ -153,8 +220,8 @@ class MentionPairsPerceptron(perceptrons.Perceptron):
         arc = substructure[0]
         features, costs, consistent = arc_information[arc]
 
-        score_coref = self.score_arc(features, costs, "+")
-        score_non_coref = self.score_arc(features, costs, "-")
+        score_coref, score_non_coref = self.score_arc_by_label(
+            features, costs, ["+", "-"])
 
         if score_coref >= score_non_coref:
             label = "+"
@@ -173,5 +240,155 @@ class MentionPairsPerceptron(perceptrons.Perceptron):
         return ([arc], [label], [score], [arc], [coref_label], [coref_score],
                 label == coref_label)
 
+    def _predict_store(self, store):
+        """ Predict labels for all mention pairs of a store at once.
+
+        All arcs are scored for both labels with ``score_arcs_by_label``.
+        For each arc, the highest-scoring label is chosen as in ``argmax``.
+
+        Args:
+            store (InstanceStore): The instances.
+
+        Returns:
+            None if some substructure does not consist of exactly one arc,
+            otherwise the output of ``predict``, where arcs are represented
+            by their index in ``store``.
+        """
+        arcs = store.substructure_offsets[:-1]
+
+        if not numpy.all(numpy.diff(store.substructure_offsets) == 1):
+            return None
+
+        score_coref, score_non_coref = self.score_arcs_by_label(
+            store, ["+", "-"])[:, arcs]
+
+        is_coref = score_coref >= score_non_coref
+
+        labels = numpy.where(is_coref, "+", "-").tolist()
+        scores = numpy.where(is_coref, score_coref, score_non_coref).tolist()
+
+        return ([[arc] for arc in arcs.tolist()],
+                [[label] for label in labels],
+                [[score] for score in scores])
+
+    def _fit_substructures(self, indices, substructures, arc_information,
+                           counter, cached_priors, cached_weights):
+        """ Perform perceptron updates for a sequence of mention pairs.
+
+        If the instances are given as an ``InstanceStore``, arcs are not
+        decoded one after another. Instead, the features of a window of arcs
+        are gathered from the store, and the scores of all arcs in the window
+        under both labels are computed at once via ``numpy.add.reduceat``.
+        Only the first wrongly labeled arc leads to an update, since the
+        update changes the scores of the subsequent arcs, which are hence
+        scored again. The size of the window adapts to the distance between
+        updates.
+
+        The resulting weights are the same as when decoding the arcs one
+        after another (see ``Perceptron._fit_substructures``).
+        """
+        if not isinstance(arc_information, instance_store.InstanceStore):
+            return super(MentionPairsPerceptron, self)._fit_substructures(
+                indices, substructures, arc_information, counter,
+                cached_priors, cached_weights)
+
+        store = arc_information
+
+        indices = numpy.asarray(indices, dtype=numpy.int64)
+        arcs = store.substructure_offsets[indices]
+
+        if not numpy.all(store.substructure_offsets[indices + 1] - arcs == 1):
+            return super(MentionPairsPerceptron, self)._fit_substructures(
+                indices, substructures, arc_information, counter,
+                cached_priors, cached_weights)
+
+        consistent = store.consistency[arcs]
+
+        # if the rows of the weight matrix are the weights of "+" and "-",
+        # the weights of both labels are gathered at once
+        if isinstance(self.weights, label_weights.LabelWeights) and \
+                self.weights.labels == ["+", "-"]:
+            weights = self.weights.matrix
+        else:
+            weights = None
+
+        incorrect = 0
+        position = 0
+        window = _MIN_WINDOW
+
+        while position < len(arcs):
+            window_arcs = arcs[position:position + window]
+            window_consistent = consistent[position:position + window]
+            features, offsets = store.arc_features(window_arcs)
+
+            # reduceat needs a valid index for arcs without features at the
+            # end of the window
+            features = numpy.append(features, 0)
+            empty = offsets[1:] == offsets[:-1]
+            has_empty = empty.any()
+
+            # the first arc of the window which was not visited yet
+            begin = 0
+            updates = 0
+
+            while begin < len(window_arcs):
+                rest_features = features[offsets[begin]:]
+                rest_offsets = offsets[begin:-1] - offsets[begin]
+
+                # the costs are the same for both labels. Hence the label
+                # "+" is predicted iff the difference of the summed weights
+                # is not smaller than the difference of the priors
+                if weights is not None:
+                    sums = numpy.add.reduceat(
+                        weights.take(rest_features, axis=1), rest_offsets,
+                        axis=1)
+                else:
+                    sums = [numpy.add.reduceat(self.weights[label][
+                        rest_features], rest_offsets) for label in "+-"]
+
+                margins = sums[0] - sums[1]
+
+                if has_empty:
+                    margins[empty[begin:]] = 0
+
+                wrong = numpy.flatnonzero(
+                    (margins >= self.priors["-"] - self.priors["+"]) !=
+                    window_consistent[begin:])
+
+                if len(wrong) == 0:
+                    counter += len(window_arcs) - begin
+                    break
+
+                first = begin + int(wrong[0])
+                counter += first - begin
+
+                if window_consistent[first]:
+                    good, bad = "+", "-"
+                else:
+                    good, bad = "-", "+"
+
+                arc_features = features[offsets[first]:offsets[first + 1]]
+                self.weights[good][arc_features] += 1
+                cached_weights[good][arc_features] += counter
+                self.priors[good] += 1
+                cached_priors[good] += counter
+                self.weights[bad][arc_features] -= 1
+                cached_weights[bad][arc_features] -= counter
+                self.priors[bad] -= 1
+                cached_priors[bad] -= counter
+
+                incorrect += 1
+                updates += 1
+                counter += 1
+                begin = first + 1
+
+            position += len(window_arcs)
+
+            # aim at a few updates per window
+            window = min(max(_UPDATES_PER_WINDOW * len(window_arcs) //
+                             max(updates, 1), _MIN_WINDOW), _MAX_WINDOW)
+
+        return incorrect, counter
+
     def get_labels(self):
         return ["+", "-"]
@@ -0,0 +1,359 @@
+""" A per-document index of mentions by normalized keys.
+
+Many string-matching features only fire for pairs of mentions which agree on
+some normalized key, such as their lowercased string or their head. Instead of
+comparing the strings of all pairs of mentions, a ``BlockingIndex`` maps each
+mention to its keys once per document. It then serves two purposes:
+
+    - as a fast path for string-matching features, which answer whether two
+      mentions share a key by comparing integers,
+    - as a candidate generator: pairs of mentions sharing a key are
+      generated as candidate arcs even if a candidate policy excludes them
+      (see ``cort.coreference.candidates.CandidateAntecedents``), such that
+      matching names survive restrictions on the distance between mentions.
+
+The following kinds of keys are supported:
+
+    - "string": the lowercased string of the mention,
+    - "cleaned": the lowercased string without determiners and possessive s,
+    - "head": the lowercased head,
+    - "alias": the first and last head token, the head without dots and the
+      acronyms of the head. Two names can only be aliases (as computed by
+      the alias features) if they share an alias key,
+    - "lexical": pairs of mentions whose cleaned strings are contained in the
+      list of potentially coreferent strings (see ``LexicalData``).
+
+Keys are only computed for mentions which can take part in a match: pronouns,
+demonstratives and verbs have no keys, numeric mentions have no head key, and
+only names have alias keys.
+"""
+
+import re
+
+
+import numpy
+
+
+from cort.core import external_data
+from cort.core import mention_arrays
+from cort.core import util
+
+
+__author__ = 'smartschat'
+
+
+KINDS = ["string", "cleaned", "head", "alias", "lexical"]
+
+
+def _is_pronominal(mention):
+    return mention.attributes["type"] in ["PRO", "DEM", "VRB"]
+
+
+def _string_key(mention):
+    if not _is_pronominal(mention):
+        return mention.attributes["tokens_as_lowercase_string"]
+
+
+def _cleaned(mention):
+    return " ".join(util.clean_via_pos(mention.attributes["tokens"],
+                                       mention.attributes["pos"]))
+
+
+def _cleaned_key(mention):
+    if not _is_pronominal(mention):
+        return _cleaned(mention).lower()
+
+
+def _head_key(mention):
+    if (not _is_pronominal(mention)
+            and mention.attributes["semantic_class"] != "NUMERIC"):
+        return mention.attributes["head_as_lowercase_string"]
+
+
+def _alias_keys(mention):
+    head = mention.attributes["head"]
+
+    if mention.attributes["type"] != "NAM" or not head:
+        return []
+
+    joined = " ".join(head)
+
+    keys = [("first", head[0]),
+            ("last", head[-1]),
+            ("without_dots", joined.replace(".", "")),
+            ("abbreviation", joined)]
+
+    company_designator = r'assoc|bros|co|coop|corp|devel|inc|llc|ltd\.?'
+    tokens = [token for token in head
+              if not re.match(company_designator, token.lower())]
+    initials = [token[0] for token in tokens if token[0].isupper()]
+
+    for acronym in [" ".join(tokens), "".join(initials),
+                    ".".join(initials) + "."]:
+        keys.append(("abbreviation", acronym))
+
+    return keys
+
+
+SINGLE_KEYS = {
+    "string": _string_key,
+    "cleaned": _cleaned_key,
+    "head": _head_key,
+}
+
+
+class BlockingIndex:
+    """ An index of the mentions of a document by normalized keys.
+
+    Mentions are referred to by their position in ``mentions.mentions``. For
+    the system mentions of a document, this is the position in
+    ``document.system_mentions``, with the dummy mention at index 0. The dummy
+    mention has no keys.
+
+    Attributes:
+        mentions (MentionArrays): The mentions.
+        mentions_to_ids (dict(Mention, int)): A mapping of mentions to their
+            positions.
+    """
+    def __init__(self, mentions):
+        """ Initialize the index. Keys are computed lazily for each kind.
+
+        Args:
+            mentions (MentionArrays): The mentions, usually the system
+                mentions of a document.
+        """
+        self.mentions = mentions
+        self.mentions_to_ids = {mention: i for i, mention
+                                in enumerate(mentions.mentions)}
+        self.__codes = {}
+        self.__pairs = {}
+        self.__matchers = {}
+
+    @staticmethod
+    def of(mentions):
+        """ Get the index for a set of mentions.
+
+        Args:
+            mentions (MentionArrays): The mentions.
+
+        Returns:
+            BlockingIndex: The index, which is built once per ``MentionArrays``
+            object.
+        """
+        return mentions.derived(BlockingIndex)
+
+    def codes(self, kind):
+        """ Get integer codes of the keys of a kind with at most one key per
+        mention.
+
+        Args:
+            kind (str): One of "string", "cleaned" and "head".
+
+        Returns:
+            numpy.array: For each mention, an integer identifying its key
+            (dtype int64). Two mentions share a key iff their codes are equal
+            and not -1. The code is -1 for mentions without key.
+        """
+        if kind not in self.__codes:
+            key_function = SINGLE_KEYS[kind]
+            key_to_code = {}
+            codes = numpy.full(len(self.mentions), -1, dtype=numpy.int64)
+
+            for i, mention in enumerate(self.mentions.mentions):
+                if mention.is_dummy():
+                    continue
+
+                key = key_function(mention)
+
+                if key is not None:
+                    codes[i] = key_to_code.setdefault(key, len(key_to_code))
+
+            self.__codes[kind] = codes
+
+        return self.__codes[kind]
+
+    def pairs(self, kind):
+        """ Get all pairs of mentions which share a key of some kind.
+
+        Args:
+            kind (str): One of the kinds in ``KINDS``.
+
+        Returns:
+            numpy.array: The sorted codes ``i * len(mentions) + j`` of all
+            pairs of distinct mentions ``i`` and ``j`` which share a key. Each
+            pair occurs in both orders.
+        """
+        if kind not in self.__pairs:
+            if kind in SINGLE_KEYS:
+                groups = _groups(enumerate(self.codes(kind).tolist()), [-1])
+                pairs = _pairs_in_groups(groups)
+            elif kind == "alias":
+                groups = _groups(
+                    (i, key)
+                    for i, mention in enumerate(self.mentions.mentions)
+                    if not mention.is_dummy()
+                    for key in _alias_keys(mention))
+                pairs = _pairs_in_groups(groups)
+            elif kind == "lexical":
+                pairs = self.__lexical_pairs()
+            else:
+                raise ValueError("Unknown kind of key: " + str(kind))
+
+            n = len(self.mentions)
+            codes = numpy.array([i * n + j for i, j in pairs],
+                                dtype=numpy.int64)
+            self.__pairs[kind] = numpy.unique(codes)
+
+        return self.__pairs[kind]
+
+    def __lexical_pairs(self):
+        lexical_data = external_data.LexicalData.get_instance()
+
+        ids = [i for i, mention in enumerate(self.mentions.mentions)
+               if not mention.is_dummy()]
+        strings = [_cleaned(self.mentions.mentions[i]) for i in ids]
+
+        return [(ids[i], ids[j]) for i, j in lexical_data.partners(strings)
+                if i != j]
+
+    def partners(self, kinds):
+        """ Get all pairs of mentions which share a key of some kinds, where
+        the second mention precedes the first one.
+
+        Args:
+            kinds (list(str)): Kinds in ``KINDS``.
+
+        Returns:
+            A tuple consisting of the indices of the first mentions and the
+            indices of the second mentions of the pairs (numpy arrays of
+            dtype int64). Pairs are sorted by the first mention, and by the
+            second mention in descending order. Pairs sharing keys of
+            several kinds occur once.
+        """
+        n = len(self.mentions)
+
+        codes = numpy.unique(numpy.concatenate(
+            [numpy.zeros(0, dtype=numpy.int64)] +
+            [self.pairs(kind) for kind in kinds]))
+
+        anaphors = codes // n
+        antecedents = codes % n
+
+        preceding = antecedents < anaphors
+        anaphors = anaphors[preceding]
+        antecedents = antecedents[preceding]
+
+        order = numpy.lexsort((-antecedents, anaphors))
+
+        return anaphors[order], antecedents[order]
+
+    def share_key(self, kind, anaphors, antecedents):
+        """ Compute whether pairs of mentions share a key of some kind.
+
+        Args:
+            kind (str): One of the kinds in ``KINDS``.
+            anaphors (numpy.array): Indices of the first mentions of the
+                pairs.
+            antecedents (numpy.array): Indices of the second mentions of the
+                pairs.
+
+        Returns:
+            numpy.array: A boolean array, which is True for pairs of mentions
+            sharing a key.
+        """
+        anaphors = numpy.asarray(anaphors, dtype=numpy.int64)
+        antecedents = numpy.asarray(antecedents, dtype=numpy.int64)
+
+        if kind in SINGLE_KEYS:
+            codes = self.codes(kind)
+            return ((codes[anaphors] == codes[antecedents])
+                    & (codes[anaphors] >= 0))
+
+        pairs = self.pairs(kind)
+        queries = anaphors * len(self.mentions) + antecedents
+        positions = numpy.searchsorted(pairs, queries)
+
+        found = numpy.zeros(len(queries), dtype=bool)
+        in_range = positions < len(pairs)
+        found[in_range] = pairs[positions[in_range]] == queries[in_range]
+
+        return found
+
+    def match(self, kind, anaphor, antecedent):
+        """ Compute whether two mentions share a key of some kind.
+
+        Args:
+            kind (str): One of the kinds in ``KINDS``.
+            anaphor (Mention): A mention in the index.
+            antecedent (Mention): Another mention in the index.
+
+        Returns:
+            bool: True if the mentions share a key.
+        """
+        if kind not in self.__matchers:
+            if kind in SINGLE_KEYS:
+                codes = self.codes(kind).tolist()
+                self.__matchers[kind] = \
+                    lambda i, j: codes[i] == codes[j] and codes[i] >= 0
+            else:
+                pairs = set(self.pairs(kind).tolist())
+                n = len(self.mentions)
+                self.__matchers[kind] = lambda i, j: i * n + j in pairs
+
+        return self.__matchers[kind](self.mentions_to_ids[anaphor],
+                                     self.mentions_to_ids[antecedent])
+
+
+def for_document(document):
+    """ Get the index for the system mentions of a document.
+
+    Args:
+        document (CoNLLDocument): A document.
+
+    Returns:
+        BlockingIndex: The index for ``document.system_mentions``, which is
+        built once per document and list of system mentions, or None if the
+        document has no system mentions.
+    """
+    if document is None or not getattr(document, "system_mentions", None):
+        return None
+
+    return document.derived(_system_mentions_index)
+
+
+def _system_mentions_index(document):
+    return BlockingIndex.of(
+        mention_arrays.MentionArrays(document.system_mentions))
+
+
+def lookup(anaphor, antecedent):
+    """ Get the index covering both mentions of a pair.
+
+    Args:
+        anaphor (Mention): A mention.
+        antecedent (Mention): Another mention.
+
+    Returns:
+        BlockingIndex: The index for the system mentions of the document of
+        ``anaphor`` if it contains both mentions, None otherwise.
+    """
+    index = for_document(anaphor.document)
+
+    if (index is not None and anaphor in index.mentions_to_ids
+            and antecedent in index.mentions_to_ids):
+        return index
+
+
+def _groups(indices_and_keys, ignore=()):
+    groups = {}
+
+    for i, key in indices_and_keys:
+        if key not in ignore:
+            groups.setdefault(key, set()).add(i)
+
+    return groups.values()
+
+
+def _pairs_in_groups(groups):
+    return [(i, j) for group in groups for i in group for j in group
+            if i != j]
@@ -0,0 +1,325 @@
+""" Policies which restrict the candidate antecedents of mentions.
+
+Without restrictions, every preceding mention is a candidate antecedent of a
+mention, hence the number of candidate arcs grows quadratically with the
+number of mentions in a document. Candidate policies bound this number.
+
+A candidate policy is a function which takes a ``MentionArrays`` object for
+the system mentions of a document (sorted by position, with the dummy mention
+at index 0) and returns a numpy array containing for each mention the index of
+the first mention which may serve as its antecedent. An arc from the mention
+at index ``i`` to the mention at index ``j`` is kept if ``j`` is at least the
+bound for ``i``. Arcs to the dummy mention are always kept.
+
+Policies are applied by ``InstanceExtractor`` to the search space extracted
+for training as well as for testing. Together with the pairs of mentions
+which share a blocking key (see ``cort.coreference.blocking``), a policy
+defines the ``CandidateAntecedents`` of the mentions of a document. Functions
+extracting the search space may generate only these candidates, such that the
+pruned arcs are never built (see ``InstanceExtractor``).
+"""
+
+
+import numpy
+
+
+from cort.coreference import blocking
+
+
+__author__ = 'smartschat'
+
+
+def all_candidates(mentions):
+    """ Allow all mentions as candidate antecedents.
+
+    Args:
+        mentions (MentionArrays): The system mentions of a document.
+
+    Returns:
+        numpy.array: An array of zeros, one for each mention.
+    """
+    return numpy.zeros(len(mentions), dtype=numpy.int64)
+
+
+class MentionDistance:
+    """ Allow only antecedents which are at most a fixed number of mentions
+    away.
+
+    Attributes:
+        max_distance (int): The maximum distance in mentions. A distance of 1
+            allows only the directly preceding mention.
+    """
+    def __init__(self, max_distance):
+        """ Initialize the policy.
+
+        Args:
+            max_distance (int): The maximum distance in mentions.
+        """
+        self.max_distance = max_distance
+
+    def __call__(self, mentions):
+        return numpy.arange(len(mentions), dtype=numpy.int64) \
+            - self.max_distance
+
+
+class SentenceDistance:
+    """ Allow only antecedents which are at most a fixed number of sentences
+    away. The maximum distance may depend on the type of the anaphor.
+
+    Attributes:
+        max_distance (int): The maximum distance in sentences for mentions
+            whose type does not occur in ``max_distance_by_type``. If None,
+            the distance for these mentions is not restricted.
+        max_distance_by_type (dict(str, int)): A mapping of mention types (see
+            ``Mention``, for example "PRO" or "NAM") to the maximum distance in
+            sentences for mentions of that type.
+    """
+    def __init__(self, max_distance=None, max_distance_by_type=None):
+        """ Initialize the policy.
+
+        Args:
+            max_distance (int): The maximum distance in sentences for
+                mentions whose type is not in ``max_distance_by_type``.
+                Defaults to None, which means no restriction.
+            max_distance_by_type (dict(str, int)): A mapping of mention types
+                to the maximum distance in sentences for mentions of that
+                type. Defaults to None, which is interpreted as an empty
+                mapping.
+        """
+        self.max_distance = max_distance
+
+        if max_distance_by_type is None:
+            self.max_distance_by_type = {}
+        else:
+            self.max_distance_by_type = max_distance_by_type
+
+    def __call__(self, mentions):
+        sentence_ids = mentions.numbers("sentence_id")
+
+        unrestricted = len(mentions) + sentence_ids.max(initial=0) + 1
+
+        max_distances = numpy.array(
+            [self.__max_distance(mention, unrestricted)
+             for mention in mentions.mentions], dtype=numpy.int64)
+
+        # sentence ids are sorted, since mentions are sorted
+        return numpy.searchsorted(sentence_ids, sentence_ids - max_distances,
+                                  side="left")
+
+    def __max_distance(self, mention, unrestricted):
+        if mention.is_dummy():
+            return unrestricted
+
+        max_distance = self.max_distance_by_type.get(
+            mention.attributes["type"], self.max_distance)
+
+        if max_distance is None:
+            return unrestricted
+        else:
+            return max_distance
+
+
+class Intersection:
+    """ Allow only antecedents which are allowed by all of a list of
+    policies.
+
+    Attributes:
+        policies (list(function: MentionArrays -> numpy.array)): The
+            policies.
+    """
+    def __init__(self, policies):
+        """ Initialize the policy.
+
+        Args:
+            policies (list(function: MentionArrays -> numpy.array)): The
+                policies.
+        """
+        self.policies = policies
+
+    def __call__(self, mentions):
+        bounds = all_candidates(mentions)
+
+        for policy in self.policies:
+            bounds = numpy.maximum(bounds, policy(mentions))
+
+        return bounds
+
+
+class CandidateAntecedents:
+    """ The candidate antecedents of the mentions of a document.
+
+    A mention is a candidate antecedent of a mention at index ``i`` if it is
+    allowed by a candidate policy, or if it shares a blocking key with the
+    mention at index ``i``. The dummy mention is always a candidate.
+
+    Attributes:
+        mentions (MentionArrays): The system mentions of a document.
+        bounds (numpy.array): For each mention, the index of the first
+            mention allowed as its antecedent by the policy.
+    """
+    def __init__(self, mentions, policy=None, blocking_kinds=None):
+        """ Compute the candidate antecedents.
+
+        Args:
+            mentions (MentionArrays): The system mentions of a document.
+            policy (function: MentionArrays -> numpy.array): A candidate
+                policy. Defaults to None, which means that all preceding
+                mentions are candidates.
+            blocking_kinds (list(str)): Kinds of keys (see
+                ``cort.coreference.blocking``) such that mentions sharing a
+                key are candidates regardless of ``policy``. Defaults to
+                None, which is interpreted as an empty list.
+        """
+        self.mentions = mentions
+
+        if policy is None:
+            self.bounds = all_candidates(mentions)
+        else:
+            self.bounds = policy(mentions)
+
+        self.__blocking_kinds = blocking_kinds or []
+
+        if self.__blocking_kinds:
+            anaphors, antecedents = blocking.BlockingIndex.of(
+                mentions).partners(self.__blocking_kinds)
+        else:
+            anaphors = numpy.zeros(0, dtype=numpy.int64)
+            antecedents = numpy.zeros(0, dtype=numpy.int64)
+
+        # partners which are not allowed by the policy anyway
+        beyond = antecedents < self.bounds[anaphors]
+        self.__partner_anaphors = anaphors[beyond]
+        self.__partner_antecedents = antecedents[beyond]
+
+        self.__partners = {}
+        for anaphor, antecedent in zip(self.__partner_anaphors.tolist(),
+                                       self.__partner_antecedents.tolist()):
+            self.__partners.setdefault(anaphor, []).append(antecedent)
+
+    def antecedents(self, anaphor):
+        """ Get the candidate antecedents of a mention.
+
+        Args:
+            anaphor (int): The index of the mention.
+
+        Returns:
+            list(int): The indices of the candidate antecedents, in
+            descending order. The last index is 0, the dummy mention.
+        """
+        bound = max(int(self.bounds[anaphor]), 0)
+
+        candidates = list(range(anaphor - 1, bound - 1, -1))
+
+        if bound > 0:
+            candidates += self.__partners.get(anaphor, [])
+            candidates.append(0)
+
+        return candidates
+
+    def allows(self, anaphors, antecedents):
+        """ Compute whether arcs connect mentions to candidate antecedents.
+
+        Args:
+            anaphors (numpy.array): Indices of the anaphors of the arcs.
+            antecedents (numpy.array): Indices of the antecedents of the
+                arcs.
+
+        Returns:
+            numpy.array: A boolean array, which is True for arcs to candidate
+            antecedents.
+        """
+        anaphors = numpy.asarray(anaphors, dtype=numpy.int64)
+        antecedents = numpy.asarray(antecedents, dtype=numpy.int64)
+
+        allowed = ((antecedents >= self.bounds[anaphors])
+                   | self.mentions.is_dummy()[antecedents])
+
+        index = blocking.BlockingIndex.of(self.mentions)
+        for kind in self.__blocking_kinds:
+            allowed |= index.share_key(kind, anaphors, antecedents)
+
+        return allowed
+
+    def n_pairs(self):
+        """ Count the pairs of a mention and a preceding mention.
+
+        Returns:
+            int: The number of pairs of a mention and a preceding mention,
+            both not the dummy mention, which is the number of candidate
+            arcs before pruning.
+        """
+        n = int((~self.mentions.is_dummy()).sum())
+
+        return n * (n - 1) // 2
+
+    def coreferent_pairs_pruned(self):
+        """ Count the pairs of coreferent mentions which are not candidates.
+
+        Returns:
+            int: The number of pairs of a mention and a preceding coreferent
+            mention (according to ``MentionArrays.gold_set_ids``) which is not
+            a candidate antecedent of the mention.
+        """
+        set_ids = self.mentions.gold_set_ids().astype(numpy.int64)
+        n = len(self.mentions)
+
+        annotated = numpy.flatnonzero(set_ids >= 0)
+
+        # mentions are sorted by set id and then by index, hence the
+        # coreferent mentions preceding a bound are found by binary search
+        keys = numpy.sort(set_ids[annotated] * (n + 1) + annotated)
+
+        bounds = numpy.clip(self.bounds[annotated], 0, annotated)
+
+        below_bound = (
+            numpy.searchsorted(keys, set_ids[annotated] * (n + 1) + bounds) -
+            numpy.searchsorted(keys, set_ids[annotated] * (n + 1)))
+
+        partners_coreferent = (
+            (set_ids[self.__partner_anaphors] >= 0)
+            & (set_ids[self.__partner_anaphors] ==
+               set_ids[self.__partner_antecedents]))
+
+        return int(below_bound.sum() - partners_coreferent.sum())
+
+
+def from_arguments(max_mention_distance=None,
+                   max_sentence_distance=None,
+                   max_sentence_distance_by_type=None):
+    """ Build a candidate policy from (command line) arguments.
+
+    Args:
+        max_mention_distance (int): The maximum distance in mentions. Defaults
+            to None, which means no restriction.
+        max_sentence_distance (int): The maximum distance in sentences.
+            Defaults to None, which means no restriction.
+        max_sentence_distance_by_type (list(str)): Maximum distances in
+            sentences for individual mention types, in the form ``TYPE:DIST``,
+            for example ``["PRO:3", "NAM:10"]``. Defaults to None.
+
+    Returns:
+        The policy combining all restrictions, or None if no restriction is
+        given.
+    """
+    policies = []
+
+    if max_mention_distance is not None:
+        policies.append(MentionDistance(int(max_mention_distance)))
+
+    by_type = {}
+    for type_and_distance in max_sentence_distance_by_type or []:
+        mention_type, distance = type_and_distance.split(":")
+        by_type[mention_type] = int(distance)
+
+    if max_sentence_distance is not None or by_type:
+        if max_sentence_distance is not None:
+            max_sentence_distance = int(max_sentence_distance)
+
+        policies.append(SentenceDistance(max_sentence_distance, by_type))
+
+    if not policies:
+        return None
+    elif len(policies) == 1:
+        return policies[0]
+    else:
+        return Intersection(policies)
@@ -0,0 +1,150 @@
+""" Save and restore the state of training after each epoch.
+
+Training a perceptron on a large corpus takes several hours. To be able to
+resume training that was interrupted, a ``Perceptron`` writes a checkpoint
+after each epoch to a ``Checkpoints`` directory (see ``Perceptron.fit``).
+A checkpoint consists of the current weights, the accumulated updates for
+averaging, the number of visited substructures, the order of the data and the
+state of the random number generator, such that resumed training yields the
+same model as uninterrupted training.
+
+Each checkpoint is a subdirectory ``epoch.<n>`` containing a file
+``checkpoint.json`` with the values describing the state, and a ``.npy``
+file for each array. Checkpoints are first written to a temporary directory
+and then renamed, hence an interrupted write does not leave an incomplete
+checkpoint behind. Only the most recent checkpoints are kept.
+"""
+
+import json
+import os
+import shutil
+
+
+import numpy
+
+
+__author__ = 'smartschat'
+
+
+# bump when the layout of a checkpoint changes
+FORMAT_VERSION = "1"
+
+
+class Checkpoints:
+    """ A directory of training checkpoints.
+
+    Attributes:
+        directory (str): The directory.
+        resume (bool): Whether training should be resumed from the most
+            recent checkpoint in the directory.
+        keep (int): The number of most recent checkpoints that are kept.
+    """
+    def __init__(self, directory, resume=False, keep=1):
+        """ Initialize the checkpoints.
+
+        Args:
+            directory (str): The directory. It is created if it does not
+                exist.
+            resume (bool): Whether training should be resumed from the most
+                recent checkpoint in the directory. Defaults to False.
+            keep (int): The number of most recent checkpoints that are kept.
+                Defaults to 1.
+        """
+        self.directory = directory
+        self.resume = resume
+        self.keep = keep
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def epochs(self):
+        """ Get the epochs of all complete checkpoints in the directory.
+
+        Returns:
+            list(int): The epochs, sorted in ascending order.
+        """
+        epochs = []
+
+        for name in os.listdir(self.directory):
+            prefix, _, epoch = name.partition(".")
+
+            if prefix == "epoch" and epoch.isdigit():
+                epochs.append(int(epoch))
+
+        return sorted(epochs)
+
+    def save(self, epoch, values, arrays):
+        """ Write a checkpoint, and remove checkpoints which are not kept.
+
+        Args:
+            epoch (int): The epoch after which the checkpoint is written.
+            values (dict): Values describing the state of training, which
+                must be serializable as JSON.
+            arrays (dict(str, numpy.array)): Arrays describing the state of
+                training.
+        """
+        path = self.__path(epoch)
+        partial = path + ".partial"
+
+        if os.path.isdir(partial):
+            shutil.rmtree(partial)
+
+        os.makedirs(partial)
+
+        names = sorted(arrays)
+
+        for i, name in enumerate(names):
+            numpy.save(os.path.join(partial, str(i) + ".npy"), arrays[name])
+
+        description = {
+            "format_version": FORMAT_VERSION,
+            "epoch": epoch,
+            "values": values,
+            "arrays": names,
+        }
+
+        with open(os.path.join(partial, "checkpoint.json"), "w") as \
+                checkpoint_file:
+            json.dump(description, checkpoint_file, indent=2, sort_keys=True)
+
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+
+        os.rename(partial, path)
+
+        for old_epoch in self.epochs()[:-self.keep]:
+            shutil.rmtree(self.__path(old_epoch))
+
+    def load(self):
+        """ Read the most recent checkpoint.
+
+        Returns:
+            A tuple consisting of the epoch of the checkpoint, the values and
+            the arrays describing the state of training (as passed to
+            ``save``), or None if there is no checkpoint.
+
+        Raises:
+            ValueError: If the checkpoint was written by an incompatible
+                version of this module.
+        """
+        epochs = self.epochs()
+
+        if not epochs:
+            return None
+
+        path = self.__path(epochs[-1])
+
+        with open(os.path.join(path, "checkpoint.json")) as checkpoint_file:
+            description = json.load(checkpoint_file)
+
+        if description["format_version"] != FORMAT_VERSION:
+            raise ValueError("Unsupported checkpoint format version: " +
+                             str(description["format_version"]))
+
+        arrays = {name: numpy.load(os.path.join(path, str(i) + ".npy"))
+                  for i, name in enumerate(description["arrays"])}
+
+        return description["epoch"], description["values"], arrays
+
+    def __path(self, epoch):
+        return os.path.join(self.directory, "epoch." + str(epoch))
@@ -45,6 +45,17 @@ def best_first(substructures, labels, scores, coref_labels=None):
     mention_entity_mapping = {}
     antecedent_mapping = {}
 
+    def set_coreference(anaphor, best):
+        # set coreference information based on the best-scoring antecedent
+        if anaphor and best and not best.is_dummy():
+            antecedent_mapping[anaphor] = best
+            if best not in mention_entity_mapping:
+                mention_entity_mapping[best] = \
+                    best.document.system_mentions.index(best)
+
+            mention_entity_mapping[anaphor] = \
+                mention_entity_mapping[best]
+
     for substructure, substructure_label, substructure_score in zip(
             substructures, labels, scores):
         # each substructure consists of one pair
@@ -53,16 +64,8 @@ def best_first(substructures, labels, scores, coref_labels=None):
         score = substructure_score[0]
         current_anaphor, current_antecedent = pair
         if current_anaphor != anaphor:
-            # change in anaphor: set coreference information based on
-            # best-scoring antecedent
-            if anaphor and best and not best.is_dummy():
-                antecedent_mapping[anaphor] = best
-                if best not in mention_entity_mapping:
-                    mention_entity_mapping[best] = \
-                        best.document.system_mentions.index(best)
-
-                mention_entity_mapping[anaphor] = \
-                    mention_entity_mapping[best]
+            # change in anaphor
+            set_coreference(anaphor, best)
 
             best = None
             max_val = float('-inf')
@@ -73,6 +76,9 @@ def best_first(substructures, labels, scores, coref_labels=None):
 
         anaphor = current_anaphor
 
+    # the decision for the last anaphor
+    set_coreference(anaphor, best)
+
     return mention_entity_mapping, antecedent_mapping
 
 
@@ -0,0 +1,447 @@
+""" Coarse-to-fine pruning of candidate antecedents.
+
+Scoring an arc with the full feature set (including all feature
+conjunctions) is expensive. In coarse-to-fine mode, a cheap linear model first
+scores every candidate antecedent of a mention, using only mention features
+(which are computed once per mention) and a few pairwise features with
+vectorized implementations. Only the k best-scoring antecedents of each
+mention are then passed on to full feature extraction and decoding.
+
+The coarse model is trained with a ranking perceptron: for every anaphor, the
+highest-scoring candidate should be coreferent with the anaphor.
+"""
+
+from __future__ import division
+
+import logging
+import random
+
+
+import numpy
+
+
+from cort.core import mention_arrays
+from cort.coreference import feature_hashing
+from cort.coreference import features
+
+
+__author__ = 'smartschat'
+
+
+# seed for hashing the mention distance feature
+DISTANCE = 0x1e6b5a8ec4f3f8b1
+
+
+class CoarseScorer:
+    """ A cheap linear model for ranking candidate antecedents.
+
+    Attributes:
+        k (int): The number of candidate antecedents kept for each anaphor.
+        mention_features (list(function: Mention -> str)): Features for
+            mentions. The first feature is conjoined with the features of the
+            antecedent, the pairwise features and the mention distance.
+        pairwise_features (list(function: (Mention, Mention) -> str)):
+            Features for mention pairs. Should be cheap to compute, i.e.
+            provide vectorized implementations (see
+            ``cort.coreference.features``).
+        n_iter (int): The number of epochs for training.
+        seed (int): The random seed for shuffling the data.
+        n_features (int): The size of the feature space (a power of two).
+        weights (numpy.array): The weights of the model, or None if the model
+            has not been trained yet.
+    """
+    def __init__(self,
+                 k=10,
+                 mention_features=None,
+                 pairwise_features=None,
+                 n_iter=5,
+                 seed=23,
+                 n_features=2**20,
+                 weights=None):
+        """ Initialize the scorer.
+
+        Args:
+            k (int): The number of candidate antecedents kept for each
+                anaphor. Defaults to 10.
+            mention_features (list(function: Mention -> str)): Features for
+                mentions. If None, defaults to fine type, gender, number,
+                semantic class and named entity tag of the head.
+            pairwise_features (list(function: (Mention, Mention) -> str)):
+                Features for mention pairs. If None, defaults to exact match,
+                head match, alias, sentence distance and same speaker.
+            n_iter (int): The number of epochs for training. Defaults to 5.
+            seed (int): The random seed for shuffling the data. Defaults to
+                23.
+            n_features (int): The size of the feature space (a power of two).
+                Defaults to 2**20.
+            weights (numpy.array): The weights of a trained model. Defaults to
+                None.
+        """
+        self.k = k
+
+        if mention_features is None:
+            self.mention_features = [
+                features.fine_type,
+                features.gender,
+                features.number,
+                features.sem_class,
+                features.head_ner
+            ]
+        else:
+            self.mention_features = mention_features
+
+        if pairwise_features is None:
+            self.pairwise_features = [
+                features.exact_match,
+                features.head_match,
+                features.alias,
+                features.sentence_distance,
+                features.same_speaker
+            ]
+        else:
+            self.pairwise_features = pairwise_features
+
+        self.n_iter = n_iter
+        self.seed = seed
+        self.n_features = n_features
+        self.weights = weights
+
+    def arc_features(self, mentions, anaphors, antecedents,
+                     mention_hashes=None):
+        """ Compute the features of arcs for the coarse model.
+
+        Args:
+            mentions (MentionArrays): The mentions of a document.
+            anaphors (numpy.array): Indices of the anaphors of the arcs in
+                ``mentions.mentions``.
+            antecedents (numpy.array): Indices of the antecedents of the arcs
+                in ``mentions.mentions``. Must not be the dummy mention.
+            mention_hashes (numpy.array): Hashes of the mention features of
+                all mentions, as computed by ``mention_hashes``. Computed if
+                None.
+
+        Returns:
+            A tuple consisting of a matrix of feature indices (one row per
+            arc, dtype int64) and a boolean matrix of the same shape
+            describing which features fire.
+        """
+        if mention_hashes is None:
+            mention_hashes = self.mention_hashes(mentions)
+
+        anaphors = numpy.asarray(anaphors, dtype=numpy.int64)
+        antecedents = numpy.asarray(antecedents, dtype=numpy.int64)
+
+        ana = feature_hashing.combine(feature_hashing.ANAPHOR,
+                                      mention_hashes[anaphors])
+        ante = feature_hashing.combine(feature_hashing.ANTECEDENT,
+                                       mention_hashes[antecedents])
+
+        pairwise = numpy.zeros((len(anaphors), len(self.pairwise_features)),
+                               dtype=numpy.uint64)
+        fired = numpy.zeros(pairwise.shape, dtype=bool)
+
+        for j, (codes, values) in enumerate(
+                features.compute_pairwise_features(
+                    self.pairwise_features, mentions, anaphors,
+                    antecedents)):
+            value_hashes = numpy.array(
+                [feature_hashing.hash_string(value) for value in values],
+                dtype=numpy.uint64)
+            fired[:, j] = codes >= 0
+            pairwise[fired[:, j], j] = value_hashes[codes[fired[:, j]]]
+
+        # log-scaled distance in mentions
+        distance = feature_hashing.combine(
+            DISTANCE,
+            numpy.log2(numpy.abs(anaphors - antecedents)).astype(
+                numpy.uint64)
+        )[:, numpy.newaxis]
+
+        columns = [ana, ante, pairwise, distance]
+        columns_fired = [numpy.ones(ana.shape, dtype=bool),
+                         numpy.ones(ante.shape, dtype=bool),
+                         fired,
+                         numpy.ones(distance.shape, dtype=bool)]
+
+        # conjoin the first mention feature of the anaphor with the antecedent
+        # features, the pairwise features and the distance
+        if self.mention_features:
+            others = numpy.hstack([ante, pairwise, distance])
+            columns.append(feature_hashing.combine(ana[:, :1], others))
+            columns_fired.append(numpy.hstack(columns_fired[1:]))
+
+        hashes = numpy.hstack(columns)
+        hashes &= numpy.uint64(self.n_features - 1)
+
+        return hashes.astype(numpy.int64), numpy.hstack(columns_fired)
+
+    def mention_hashes(self, mentions):
+        """ Hash the mention features of all mentions.
+
+        Args:
+            mentions (MentionArrays): The mentions of a document.
+
+        Returns:
+            numpy.array: A matrix with one row per mention, containing the
+            hashes of the mention features (dtype uint64). The row of the
+            dummy mention contains zeros.
+        """
+        hashes = numpy.zeros((len(mentions), len(self.mention_features)),
+                             dtype=numpy.uint64)
+
+        for i, mention in enumerate(mentions.mentions):
+            if not mention.is_dummy():
+                hashes[i] = [feature_hashing.hash_string(feature(mention))
+                             for feature in self.mention_features]
+
+        return hashes
+
+    def score(self, mentions, anaphors, antecedents, mention_hashes=None):
+        """ Score arcs according to the coarse model.
+
+        Args:
+            mentions (MentionArrays): The mentions of a document.
+            anaphors (numpy.array): Indices of the anaphors of the arcs in
+                ``mentions.mentions``.
+            antecedents (numpy.array): Indices of the antecedents of the arcs
+                in ``mentions.mentions``. Must not be the dummy mention.
+            mention_hashes (numpy.array): Hashes of the mention features of
+                all mentions, as computed by ``mention_hashes``. Computed if
+                None.
+
+        Returns:
+            numpy.array: The score of each arc.
+        """
+        hashes, fired = self.arc_features(mentions, anaphors, antecedents,
+                                          mention_hashes)
+
+        return numpy.where(fired, self.weights[hashes], 0).sum(axis=1)
+
+    def rank(self, mentions, anaphors, antecedents, mention_hashes=None):
+        """ Rank the candidate antecedents of each anaphor.
+
+        Args:
+            mentions (MentionArrays): The mentions of a document.
+            anaphors (numpy.array): Indices of the anaphors of the arcs in
+                ``mentions.mentions``.
+            antecedents (numpy.array): Indices of the antecedents of the arcs
+                in ``mentions.mentions``. Must not be the dummy mention.
+            mention_hashes (numpy.array): Hashes of the mention features of
+                all mentions, as computed by ``mention_hashes``. Computed if
+                None.
+
+        Returns:
+            numpy.array: For each arc, the rank of its antecedent among the
+            candidate antecedents of its anaphor (starting at 0). Ties are
+            broken in favor of closer antecedents.
+        """
+        anaphors = numpy.asarray(anaphors, dtype=numpy.int64)
+        antecedents = numpy.asarray(antecedents, dtype=numpy.int64)
+
+        scores = self.score(mentions, anaphors, antecedents, mention_hashes)
+
+        # group by anaphor, best-scoring and closest antecedents first
+        order = numpy.lexsort((-antecedents, -scores, anaphors))
+        sorted_anaphors = anaphors[order]
+        group_starts = numpy.searchsorted(sorted_anaphors, sorted_anaphors,
+                                          side="left")
+
+        ranks = numpy.empty(len(anaphors), dtype=numpy.int64)
+        ranks[order] = numpy.arange(len(anaphors)) - group_starts
+
+        return ranks
+
+    def prune(self, mentions, anaphors, antecedents):
+        """ Select the k best-scoring candidate antecedents of each anaphor.
+
+        Args:
+            mentions (MentionArrays): The mentions of a document.
+            anaphors (numpy.array): Indices of the anaphors of the arcs in
+                ``mentions.mentions``.
+            antecedents (numpy.array): Indices of the antecedents of the arcs
+                in ``mentions.mentions``. Must not be the dummy mention.
+
+        Returns:
+            numpy.array: A boolean array, which is True for arcs that are
+            kept.
+        """
+        return self.rank(mentions, anaphors, antecedents) < self.k
+
+    def fit(self, corpus, candidate_policy=None):
+        """ Train the coarse model.
+
+        Each mention which is coreferent with a preceding mention is an
+        anaphor. All preceding mentions allowed by ``candidate_policy`` are
+        its candidate antecedents. If the highest-scoring candidate is not
+        coreferent with the anaphor, the weights are updated towards the
+        highest-scoring coreferent candidate. The final weights are averaged
+        over all updates.
+
+        Args:
+            corpus (Corpus): A corpus with system mentions and gold
+                coreference annotation.
+            candidate_policy (function: MentionArrays -> numpy.array): A
+                policy restricting the candidate antecedents of each mention
+                (see ``cort.coreference.candidates``). Defaults to None, which
+                means that all preceding mentions are candidates.
+
+        Returns:
+            numpy.array: The learned weights. Also sets ``self.weights``.
+        """
+        weights = numpy.zeros(self.n_features)
+        cached_weights = numpy.zeros(self.n_features)
+        self.weights = weights
+
+        rand = random.Random(self.seed)
+        counter = 1
+
+        documents = list(corpus.documents)
+
+        for epoch in range(1, self.n_iter + 1):
+            rand.shuffle(documents)
+            incorrect = 0
+            total = 0
+
+            for doc in documents:
+                mentions = mention_arrays.MentionArrays(doc.system_mentions)
+
+                for anaphor_hashes, anaphor_fired, coreferent in \
+                        self.__anaphors(mentions, candidate_policy, rand):
+                    scores = numpy.where(anaphor_fired,
+                                         weights[anaphor_hashes],
+                                         0).sum(axis=1)
+
+                    predicted = int(numpy.argmax(scores))
+
+                    if not coreferent[predicted]:
+                        gold = int(numpy.flatnonzero(coreferent)[
+                            numpy.argmax(scores[coreferent])])
+
+                        for row, delta in [(gold, 1), (predicted, -1)]:
+                            indices = anaphor_hashes[row][anaphor_fired[row]]
+                            numpy.add.at(weights, indices, delta)
+                            numpy.add.at(cached_weights, indices,
+                                         delta * counter)
+
+                        incorrect += 1
+
+                    total += 1
+                    counter += 1
+
+            logging.info("Finished coarse epoch " + str(epoch))
+            logging.info("\tIncorrect top-ranked antecedents: " +
+                         str(incorrect) + "/" + str(total))
+
+        weights -= cached_weights / counter
+
+        return self.weights
+
+    def __anaphors(self, mentions, candidate_policy, rand, block_size=10000):
+        mention_hashes = self.mention_hashes(mentions)
+
+        # compute features for blocks of anaphors to bound memory usage
+        blocks = [[]]
+        block_arcs = 0
+
+        for anaphor in self.__anaphor_indices(mentions, candidate_policy):
+            if block_arcs >= block_size:
+                blocks.append([])
+                block_arcs = 0
+
+            blocks[-1].append(anaphor)
+            block_arcs += len(anaphor[1])
+
+        for block in blocks:
+            if not block:
+                continue
+
+            anaphors = numpy.concatenate([
+                numpy.full(len(candidates), anaphor, dtype=numpy.int64)
+                for anaphor, candidates, _ in block])
+            antecedents = numpy.concatenate(
+                [candidates for _, candidates, _ in block])
+
+            hashes, fired = self.arc_features(mentions, anaphors,
+                                              antecedents, mention_hashes)
+
+            offsets = numpy.cumsum([0] + [len(candidates) for _, candidates, _
+                                          in block])
+
+            order = list(range(len(block)))
+            rand.shuffle(order)
+
+            for i in order:
+                start, end = offsets[i], offsets[i + 1]
+                yield hashes[start:end], fired[start:end], block[i][2]
+
+    def __anaphor_indices(self, mentions, candidate_policy):
+        if candidate_policy is None:
+            bounds = numpy.zeros(len(mentions), dtype=numpy.int64)
+        else:
+            bounds = candidate_policy(mentions)
+
+        set_ids = mentions.codes("annotated_set_id")
+
+        anaphors = []
+
+        for i, mention in enumerate(mentions.mentions):
+            if mention.is_dummy() or \
+                    mention.attributes["annotated_set_id"] is None:
+                continue
+
+            # closest candidates first
+            candidates = numpy.arange(i - 1, max(bounds[i], 1) - 1, -1,
+                                      dtype=numpy.int64)
+            coreferent = set_ids[candidates] == set_ids[i]
+
+            if coreferent.any():
+                anaphors.append((i, candidates, coreferent))
+
+        return anaphors
+
+    def recall(self, corpus, ks, candidate_policy=None):
+        """ Compute the recall of the coarse model at several values of k.
+
+        Recall at k is the fraction of anaphors (mentions coreferent with a
+        preceding candidate antecedent) for which a coreferent antecedent is
+        among the k best-scoring candidates.
+
+        Args:
+            corpus (Corpus): A corpus with system mentions and gold
+                coreference annotation.
+            ks (list(int)): The values of k.
+            candidate_policy (function: MentionArrays -> numpy.array): A
+                policy restricting the candidate antecedents of each mention
+                (see ``cort.coreference.candidates``). Defaults to None, which
+                means that all preceding mentions are candidates.
+
+        Returns:
+            dict(int, float): A mapping of each k to the recall at k.
+        """
+        best_ranks = []
+
+        for doc in corpus:
+            mentions = mention_arrays.MentionArrays(doc.system_mentions)
+            anaphors = self.__anaphor_indices(mentions, candidate_policy)
+
+            if not anaphors:
+                continue
+
+            ranks = self.rank(
+                mentions,
+                numpy.concatenate([
+                    numpy.full(len(candidates), anaphor, dtype=numpy.int64)
+                    for anaphor, candidates, _ in anaphors]),
+                numpy.concatenate([candidates for _, candidates, _
+                                   in anaphors]))
+
+            start = 0
+            for _, candidates, coreferent in anaphors:
+                end = start + len(candidates)
+                best_ranks.append(ranks[start:end][coreferent].min())
+                start = end
+
+        best_ranks = numpy.array(best_ranks)
+
+        return dict((k, float((best_ranks < k).mean()) if len(best_ranks)
+                     else 1.0) for k in ks)
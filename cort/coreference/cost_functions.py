@@ -1,3 +1,23 @@
+""" Cost functions for cost-augmented inference.
+
+A cost function maps an arc (a pair of mentions) to the costs of wrongly
+predicting it. A cost function may provide a vectorized implementation as
+its attribute ``vectorized``, which computes the costs of many arcs of a
+document at once:
+
+    vectorized(mentions, anaphors, antecedents) -> costs
+
+where ``mentions`` is a ``MentionArrays`` object for the system mentions of
+the document, ``anaphors`` and ``antecedents`` are arrays of indices into
+``mentions.mentions``, and ``costs`` is an integer array with the costs of
+each arc. ``InstanceExtractor`` uses the vectorized implementation if it
+exists.
+"""
+
+
+import numpy
+
+
 __author__ = 'martscsn'
 
 
@@ -15,4 +35,18 @@ def cost_based_on_consistency(arc):
 
 
 def null_cost(arc):
-    return 0
\ No newline at end of file
+    return 0
+
+
+def __cost_based_on_consistency_vectorized(mentions, anaphors, antecedents):
+    return numpy.where(mentions.consistency(anaphors, antecedents), 0,
+                       numpy.where(mentions.is_dummy()[antecedents], 2, 1))
+
+
+def __null_cost_vectorized(mentions, anaphors, antecedents):
+    return numpy.zeros(len(anaphors), dtype=numpy.int64)
+
+
+cost_based_on_consistency.vectorized = \
+    __cost_based_on_consistency_vectorized
+null_cost.vectorized = __null_cost_vectorized
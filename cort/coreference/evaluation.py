@@ -0,0 +1,300 @@
+""" Evaluate predicted coreference clusters.
+
+This module implements the metrics MUC (Vilain et al., 1995), B^3 (Bagga and
+Baldwin, 1998) and the entity-based CEAF (Luo, 2005), as well as their
+average, which is the official metric of the CoNLL shared tasks on
+coreference resolution. Mentions are identified by their spans, and scores
+are micro-averaged over the documents of a corpus, as in the reference
+implementation of the metrics (Pradhan et al., 2014).
+
+The metrics are meant for monitoring experiments, such as evaluating a model
+on development data after each epoch of training. Final results should be
+computed with the reference implementation.
+
+References:
+
+    - Marc Vilain, John Burger, John Aberdeen, Dennis Connolly, and Lynette
+      Hirschman. 1995. A model-theoretic coreference scoring scheme. In
+      *Proc. of MUC-6*, pages 45–52.
+    - Amit Bagga and Breck Baldwin. 1998. Algorithms for scoring coreference
+      chains. In *Proc. of the LREC 1998 Workshop on Linguistic Coreference*,
+      pages 563–566.
+    - Xiaoqiang Luo. 2005. On coreference resolution performance metrics. In
+      *Proc. of HLT-EMNLP 2005*, pages 25–32.
+    - Sameer Pradhan, Xiaoqiang Luo, Marta Recasens, Eduard Hovy, Vincent Ng,
+      and Michael Strube. 2014. Scoring coreference partitions of predicted
+      mentions: A reference implementation. In *Proc. of ACL 2014*, pages
+      30–35.
+"""
+
+from collections import defaultdict
+
+
+import numpy
+
+
+__author__ = 'smartschat'
+
+
+def clusters(corpus, mention_entity_mapping):
+    """ Get the gold and the predicted clusters of each document of a corpus.
+
+    Args:
+        corpus (Corpus): A corpus with coreference annotation.
+        mention_entity_mapping (dict(Mention, int)): A mapping of mentions to
+            entity identifiers, as output by a clusterer (see
+            ``cort.coreference.clusterer``). Identifiers are unique within a
+            document.
+
+    Returns:
+        list((list(set(Span)), list(set(Span)))): For each document, its gold
+        clusters (from the annotation in ``doc.coref``) and its predicted
+        clusters.
+    """
+    predicted = defaultdict(lambda: defaultdict(set))
+
+    for mention, entity in mention_entity_mapping.items():
+        predicted[id(mention.document)][entity].add(mention.span)
+
+    result = []
+
+    for doc in corpus:
+        gold = defaultdict(set)
+
+        for span, set_id in doc.coref.items():
+            gold[set_id].add(span)
+
+        result.append((list(gold.values()),
+                       list(predicted[id(doc)].values())))
+
+    return result
+
+
+def muc(key, response):
+    """ Compute the counts of the MUC metric for one document.
+
+    Args:
+        key (list(set)): The gold clusters.
+        response (list(set)): The predicted clusters.
+
+    Returns:
+        A tuple consisting of the numerator and the denominator of recall,
+        and the numerator and the denominator of precision.
+    """
+    def counts(clusters, partitioning):
+        cluster_of = {mention: i for i, cluster in enumerate(partitioning)
+                      for mention in cluster}
+
+        numerator = 0
+        denominator = 0
+
+        for cluster in clusters:
+            # mentions missing from the other partitioning form singletons
+            partitions = set()
+            missing = 0
+
+            for mention in cluster:
+                if mention in cluster_of:
+                    partitions.add(cluster_of[mention])
+                else:
+                    missing += 1
+
+            numerator += len(cluster) - len(partitions) - missing
+            denominator += len(cluster) - 1
+
+        return numerator, denominator
+
+    return counts(key, response) + counts(response, key)
+
+
+def b_cubed(key, response):
+    """ Compute the counts of the B^3 metric for one document.
+
+    Args:
+        key (list(set)): The gold clusters.
+        response (list(set)): The predicted clusters.
+
+    Returns:
+        A tuple consisting of the numerator and the denominator of recall,
+        and the numerator and the denominator of precision.
+    """
+    def counts(clusters, partitioning):
+        cluster_of = {mention: i for i, cluster in enumerate(partitioning)
+                      for mention in cluster}
+
+        numerator = 0
+
+        for cluster in clusters:
+            overlaps = defaultdict(int)
+
+            for mention in cluster:
+                if mention in cluster_of:
+                    overlaps[cluster_of[mention]] += 1
+
+            numerator += sum(overlap**2 for overlap in overlaps.values()) / \
+                len(cluster)
+
+        return numerator, sum(len(cluster) for cluster in clusters)
+
+    return counts(key, response) + counts(response, key)
+
+
+def ceafe(key, response):
+    """ Compute the counts of the entity-based CEAF metric for one document.
+
+    The similarity of a gold and a predicted cluster is
+    ``2 * |K & R| / (|K| + |R|)``, and clusters are aligned such that the
+    sum of the similarities of aligned clusters is maximal.
+
+    Args:
+        key (list(set)): The gold clusters.
+        response (list(set)): The predicted clusters.
+
+    Returns:
+        A tuple consisting of the numerator and the denominator of recall,
+        and the numerator and the denominator of precision.
+    """
+    cluster_of = {mention: i for i, cluster in enumerate(response)
+                  for mention in cluster}
+
+    similarity = numpy.zeros((len(key), len(response)))
+
+    for i, cluster in enumerate(key):
+        for mention in cluster:
+            if mention in cluster_of:
+                similarity[i, cluster_of[mention]] += 1
+
+    for i, j in zip(*numpy.nonzero(similarity)):
+        similarity[i, j] = 2 * similarity[i, j] / (len(key[i]) +
+                                                   len(response[j]))
+
+    # clusters without overlap do not contribute to the alignment
+    rows = numpy.flatnonzero(similarity.any(axis=1))
+    columns = numpy.flatnonzero(similarity.any(axis=0))
+
+    aligned = _max_assignment(similarity[numpy.ix_(rows, columns)])
+
+    return aligned, len(key), aligned, len(response)
+
+
+METRICS = {
+    "muc": muc,
+    "bcub": b_cubed,
+    "ceafe": ceafe,
+}
+
+
+def evaluate(corpus, mention_entity_mapping, metrics=("muc", "bcub",
+                                                      "ceafe")):
+    """ Evaluate predicted clusters against the annotation of a corpus.
+
+    Args:
+        corpus (Corpus): A corpus with coreference annotation.
+        mention_entity_mapping (dict(Mention, int)): A mapping of mentions to
+            entity identifiers (see ``clusters``).
+        metrics (list(str)): The names of the metrics, see ``METRICS``.
+            Defaults to all metrics.
+
+    Returns:
+        dict(str, (float, float, float)): For each metric, recall, precision
+        and F1 score.
+    """
+    totals = {metric: [0, 0, 0, 0] for metric in metrics}
+
+    for key, response in clusters(corpus, mention_entity_mapping):
+        for metric in metrics:
+            for i, count in enumerate(METRICS[metric](key, response)):
+                totals[metric][i] += count
+
+    results = {}
+
+    for metric, (recall_numerator, recall_denominator, precision_numerator,
+                 precision_denominator) in totals.items():
+        recall = _divide(recall_numerator, recall_denominator)
+        precision = _divide(precision_numerator, precision_denominator)
+
+        results[metric] = (recall, precision,
+                           _divide(2 * recall * precision,
+                                   recall + precision))
+
+    return results
+
+
+def conll_score(corpus, mention_entity_mapping):
+    """ Compute the average F1 score of MUC, B^3 and entity-based CEAF.
+
+    Args:
+        corpus (Corpus): A corpus with coreference annotation.
+        mention_entity_mapping (dict(Mention, int)): A mapping of mentions to
+            entity identifiers (see ``clusters``).
+
+    Returns:
+        float: The average of the F1 scores.
+    """
+    results = evaluate(corpus, mention_entity_mapping)
+
+    return sum(f1 for _, _, f1 in results.values()) / len(results)
+
+
+def _divide(numerator, denominator):
+    if denominator == 0:
+        return 0.0
+
+    return numerator / denominator
+
+
+def _max_assignment(similarity):
+    # the maximal sum of similarities of a one-to-one assignment of rows to
+    # columns, computed with the Hungarian algorithm on the costs
+    # -similarity (with potentials, in O(n^2 m) for n <= m)
+    if similarity.shape[0] > similarity.shape[1]:
+        similarity = similarity.T
+
+    n, m = similarity.shape
+
+    if n == 0:
+        return 0.0
+
+    costs = -similarity
+    row_potentials = numpy.zeros(n + 1)
+    column_potentials = numpy.zeros(m + 1)
+
+    # assigned[j]: the row (1-based) assigned to column j, 0 if none
+    assigned = numpy.zeros(m + 1, dtype=int)
+    way = numpy.zeros(m + 1, dtype=int)
+
+    for row in range(1, n + 1):
+        assigned[0] = row
+        column = 0
+        minima = numpy.full(m + 1, numpy.inf)
+        used = numpy.zeros(m + 1, dtype=bool)
+
+        while assigned[column] != 0:
+            used[column] = True
+            current_row = assigned[column]
+
+            reduced = costs[current_row - 1] - \
+                row_potentials[current_row] - column_potentials[1:]
+
+            free = ~used[1:]
+            improved = free & (reduced < minima[1:])
+            minima[1:][improved] = reduced[improved]
+            way[1:][improved] = column
+
+            candidates = numpy.where(free, minima[1:], numpy.inf)
+            next_column = int(numpy.argmin(candidates)) + 1
+            delta = candidates[next_column - 1]
+
+            row_potentials[assigned[used]] += delta
+            column_potentials[used] -= delta
+            minima[1:][free] -= delta
+
+            column = next_column
+
+        while column != 0:
+            previous = way[column]
+            assigned[column] = assigned[previous]
+            column = previous
+
+    return float(sum(similarity[assigned[j] - 1, j - 1]
+                     for j in range(1, m + 1) if assigned[j] != 0))
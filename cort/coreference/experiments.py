@@ -1,18 +1,39 @@
 """ Manage learning from training data and making predictions on test data. """
 
 
+import copy
 import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+
+from cort.coreference import evaluation
+from cort.coreference import feature_templates
+from cort.coreference import models
+from cort.util import multiprocessing as cort_multiprocessing
 
 
 __author__ = 'smartschat'
 
 
-def learn(training_corpus, instance_extractor, perceptron):
+# the data shared with the worker processes of a sweep
+_shared = {}
+
+
+def learn(training_corpus, instance_extractor, perceptron,
+          spill_directory=None, shard_size=None, block_size=1000,
+          removed_features=None, n_parallel_shards=None, dev_corpus=None,
+          dev_instance_extractor=None, coref_extractor=None, patience=None,
+          checkpoints=None):
     """ Learn a model for coreference resolution from training data.
 
     In particular, apply an instance/feature extractor to a training corpus and
     employ a machine learning model to learn a weight vector from these
-    instances.
+    instances. If the instance extractor employs an untrained coarse scorer
+    for pruning candidate antecedents, the coarse scorer is trained first.
 
     Args:
         training_corpus (Corpus): The corpus to learn from.
@@ -21,6 +42,49 @@ def learn(training_corpus, instance_extractor, perceptron):
             extracted during training.
         perceptron (Perceptron): A perceptron (including a decoder) that
             learns from the instances extracted by ``instance_extractor``.
+        spill_directory (str): If given, instances are written to this
+            directory while they are extracted, and the perceptron learns
+            from the memory-mapped instances. Defaults to None, which means
+            that all instances are kept in memory.
+        shard_size (int): If given together with ``spill_directory``, the
+            instances are written to shards of this many documents, and the
+            perceptron is trained out of core via ``Perceptron.fit_shards``.
+            Defaults to None.
+        block_size (int): The number of consecutive substructures visited in
+            order when training on shards (see ``Perceptron.fit_shards``).
+            Defaults to 1000.
+        removed_features (list(str)): Names of features to leave out of
+            training (see ``feature_templates.ablation``). Instances are
+            extracted with all features, which requires
+            ``instance_extractor.store_templates`` to be set, and the
+            features of the removed templates are dropped before fitting.
+            Defaults to None, which means that all features are used.
+        n_parallel_shards (int): If given, the perceptron is trained with
+            this many processes via iterative parameter mixing (see
+            ``Perceptron.fit_parallel``). Not used when training on shards
+            of instances. Defaults to None, which means that the perceptron
+            is trained in a single process.
+        dev_corpus (Corpus): If given, a corpus with coreference annotation
+            to evaluate the averaged model on after each epoch (see
+            ``evaluation.conll_score``). Instances of the corpus are
+            extracted once, before training. Training stops early if the
+            score did not improve for ``patience`` epochs, and the model
+            of the best epoch is returned. Defaults to None.
+        dev_instance_extractor (InstanceExtractor): The instance extractor
+            for ``dev_corpus``, as used for prediction. It must use the same
+            features as ``instance_extractor`` (and store their templates
+            if ``removed_features`` is given). Required if ``dev_corpus`` is
+            given.
+        coref_extractor (function): An extractor for consolidating pairwise
+            predictions on ``dev_corpus`` into coreference clusters.
+            Required if ``dev_corpus`` is given.
+        patience (int): The number of epochs without improvement of the score
+            on ``dev_corpus`` after which training stops. Defaults to None,
+            which means that all epochs are run.
+        checkpoints (Checkpoints): If given, the state of training is saved
+            to these checkpoints after each epoch, and training resumes from
+            the most recent checkpoint if ``checkpoints.resume`` is set (see
+            ``Perceptron.fit``). Defaults to None.
 
     Returns:
         A tuple consisting of
@@ -31,22 +95,197 @@ def learn(training_corpus, instance_extractor, perceptron):
               seen during training (for representing the features we employ
               *feature hashing*). If the graphs employed are not labeled,
               ``l`` is set to "+".
+
+    Raises:
+        ValueError: If ``dev_corpus`` is given without
+            ``dev_instance_extractor`` or ``coref_extractor``.
     """
+    if dev_corpus is not None and (dev_instance_extractor is None or
+                                   coref_extractor is None):
+        raise ValueError("Evaluating on a development corpus requires an "
+                         "instance extractor and a coreference extractor.")
+
     logging.info("Learning.")
 
+    _fit_coarse_scorer(training_corpus, instance_extractor)
+
+    def select(instances):
+        if not removed_features:
+            return instances
+
+        return instances.select_templates(templates)
+
+    if removed_features:
+        templates = feature_templates.ablation(
+            instance_extractor.mention_features,
+            instance_extractor.pairwise_features,
+            removed_features)
+
+        logging.info("\tLeaving out features " + ", ".join(removed_features) +
+                     ".")
+
+    evaluate = None
+
+    if dev_corpus is not None:
+        logging.info("\tExtracting instances of development data.")
+
+        evaluate = _dev_evaluation(
+            dev_corpus, select(dev_instance_extractor.extract_store(
+                dev_corpus)),
+            perceptron, coref_extractor)
+
     logging.info("\tExtracting instances.")
-    substructures, arc_information = instance_extractor.extract(
-        training_corpus)
 
-    logging.info("\tFitting model parameters.")
+    if spill_directory is not None and shard_size is not None:
+        shards = instance_extractor.extract_shards(
+            training_corpus, spill_directory, shard_size)
+        shards = [select(shard) for shard in shards]
+
+        logging.info("\tFitting model parameters on " + str(len(shards)) +
+                     " shards.")
+
+        model = perceptron.fit_shards(shards, block_size,
+                                      evaluate=evaluate, patience=patience,
+                                      checkpoints=checkpoints)
+    else:
+        instances = select(instance_extractor.extract_store(
+            training_corpus, spill_directory))
+        if n_parallel_shards is not None:
+            logging.info("\tFitting model parameters with " +
+                         str(n_parallel_shards) + " parallel shards.")
+
+            model = perceptron.fit_parallel(instances,
+                                            n_shards=n_parallel_shards,
+                                            evaluate=evaluate,
+                                            patience=patience,
+                                            checkpoints=checkpoints)
+        else:
+            logging.info("\tFitting model parameters.")
+
+            model = perceptron.fit(instances, evaluate=evaluate,
+                                   patience=patience,
+                                   checkpoints=checkpoints)
+
+    _report_profile(instance_extractor)
+
+    return model
+
+
+def sweep(training_corpus, instance_extractor, configurations, dev_corpus,
+          dev_instance_extractor, coref_extractor, patience=None,
+          n_processes=None, directory=None):
+    """ Learn models for several configurations of the perceptron, and keep
+    the model that performs best on development data.
+
+    Instances of the training and of the development data are extracted only
+    once. The training instances are written to a directory and are
+    memory-mapped read-only by all processes, hence the memory for the
+    instances is shared. Then the configurations are trained in parallel
+    processes (if worker processes can be forked), each evaluating its model
+    after each epoch on the development data (as in ``learn``).
+
+    Args:
+        training_corpus (Corpus): The corpus to learn from.
+        instance_extractor (InstanceExtracor): The instance extractor that
+            defines the features and the structure of instances that are
+            extracted during training. It must suit the perceptrons of all
+            configurations.
+        configurations (list(dict)): The configurations. Each configuration
+            maps "perceptron" to a perceptron class, and "n_iter", "seed"
+            and "cost_scaling" to the corresponding arguments of the
+            perceptron. Missing arguments take the defaults of the
+            perceptron.
+        dev_corpus (Corpus): A corpus with coreference annotation to
+            evaluate the models on (see ``learn``).
+        dev_instance_extractor (InstanceExtractor): The instance extractor
+            for ``dev_corpus``, as used for prediction.
+        coref_extractor (function): An extractor for consolidating pairwise
+            predictions on ``dev_corpus`` into coreference clusters.
+        patience (int): The number of epochs without improvement of the score
+            on ``dev_corpus`` after which training of a configuration stops.
+            Defaults to None, which means that all epochs are run.
+        n_processes (int): The number of configurations trained in parallel.
+            Defaults to None, which means that the number of CPUs is used.
+        directory (str): A directory in which a temporary directory for the
+            instances and the models of the configurations is created. Only
+            the temporary directory is removed after the sweep. Defaults to
+            None, which means that the default location for temporary files
+            is used.
+
+    Returns:
+        A tuple consisting of
+            - **results** (*list((dict, float, int))*): For each
+              configuration, the configuration, the score of its best model
+              on ``dev_corpus`` and the epoch of this model,
+            - **model** (*tuple*): The priors and weights of the best model
+              of all configurations (as returned by ``learn``).
+    """
+    logging.info("Sweeping over " + str(len(configurations)) +
+                 " configurations.")
+
+    _fit_coarse_scorer(training_corpus, instance_extractor)
+
+    if directory is not None and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    # only the directory created here is removed after the sweep, never the
+    # given directory itself
+    directory = tempfile.mkdtemp(prefix="sweep.", dir=directory)
+
+    if n_processes is None:
+        n_processes = multiprocessing.cpu_count()
+
+    pool = None
+
+    try:
+        logging.info("\tExtracting instances of development data.")
+        _shared["dev"] = (dev_corpus,
+                          dev_instance_extractor.extract_store(dev_corpus),
+                          coref_extractor)
+
+        logging.info("\tExtracting instances.")
+        _shared["instances"] = instance_extractor.extract_store(
+            training_corpus, os.path.join(directory, "instances"))
+        _shared["configurations"] = configurations
+        _shared["patience"] = patience
+        _shared["directory"] = directory
 
-    return perceptron.fit(substructures, arc_information)
+        n_processes = min(n_processes, len(configurations))
+
+        if cort_multiprocessing.supports_fork() and n_processes > 1:
+            pool = multiprocessing.get_context("fork").Pool(n_processes)
+            configuration_map = pool.map
+        else:
+            configuration_map = map
+
+        scores = list(configuration_map(_fit_configuration,
+                                        range(len(configurations))))
+
+        results = [(configuration, score, epoch) for configuration,
+                   (score, epoch) in zip(configurations, scores)]
+
+        best = max(range(len(results)), key=lambda i: results[i][1])
+
+        logging.info("\tBest configuration: " +
+                     _describe(configurations[best]) + " (score " +
+                     str(results[best][1]) + " after epoch " +
+                     str(results[best][2]) + ").")
+
+        return results, models.load(_model_directory(directory, best))
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+        _shared.clear()
+        shutil.rmtree(directory)
 
 
 def predict(testing_corpus,
             instance_extractor,
             perceptron,
-            coref_extractor):
+            coref_extractor,
+            batch_size=None):
     """ According to a learned model, predict coreference information.
 
     Args:
@@ -59,6 +298,11 @@ def predict(testing_corpus,
             coreference structure over a set of structures.
         coref_extractor (function): An extractor for consolidating pairwise
             predictions into coreference clusters.
+        batch_size (int): If given, instances are extracted, predicted and
+            clustered in batches of this many documents, such that memory
+            usage is bounded by the largest batch instead of the size of the
+            corpus. Defaults to None, which means that the whole corpus is
+            extracted at once.
 
     Returns:
         A tuple containing two dicts. The components are
@@ -78,13 +322,221 @@ def predict(testing_corpus,
             mention.attributes["antecedent"] = None
             mention.attributes["set_id"] = None
 
+    if batch_size is not None:
+        logging.info("\tExtracting instances, doing predictions and "
+                     "clustering results in batches of " + str(batch_size) +
+                     " documents.")
+
+        mention_entity_mapping = {}
+        antecedent_mapping = {}
+
+        for instances in instance_extractor.extract_stores(testing_corpus,
+                                                           batch_size):
+            arcs, labels, scores = perceptron.predict(instances)
+
+            batch_entities, batch_antecedents = coref_extractor(
+                arcs, labels, scores,
+                coref_labels=perceptron.get_coref_labels())
+
+            mention_entity_mapping.update(batch_entities)
+            antecedent_mapping.update(batch_antecedents)
+
+        _report_profile(instance_extractor)
+
+        return mention_entity_mapping, antecedent_mapping
+
     logging.info("\tExtracting instances.")
-    substructures, arc_information = instance_extractor.extract(testing_corpus)
+    instances = instance_extractor.extract_store(testing_corpus)
 
     logging.info("\tDoing predictions.")
-    arcs, labels, scores = perceptron.predict(substructures, arc_information)
+    arcs, labels, scores = perceptron.predict(instances)
 
     logging.info("\tClustering results.")
 
-    return coref_extractor(arcs, labels, scores,
-                           coref_labels=instance_extractor.get_coref_labels())
+    clustering = coref_extractor(arcs, labels, scores,
+                                 coref_labels=perceptron.get_coref_labels())
+
+    _report_profile(instance_extractor)
+
+    return clustering
+
+
+def analyze_templates(dev_corpus, instance_extractor, perceptron,
+                      coref_extractor, thresholds):
+    """ Measure the weight mass of each template and the effect of skipping
+    templates with little mass at prediction time.
+
+    Instances of the development data are extracted once with the template
+    of each feature to compute the weight mass of each template (see
+    ``cort.coreference.feature_templates.weight_mass``). Then, for each
+    threshold, the instances are extracted again without the templates whose
+    share of the weight mass is below the threshold, and the model is
+    evaluated on them. The threshold 0 keeps all templates and serves as the
+    baseline.
+
+    Args:
+        dev_corpus (Corpus): A corpus with coreference annotation and system
+            mentions.
+        instance_extractor (InstanceExtractor): The instance extractor used
+            for prediction.
+        perceptron (Perceptron): A learned perceptron.
+        coref_extractor (function): An extractor for consolidating pairwise
+            predictions into coreference clusters.
+        thresholds (list(float)): Shares of the total weight mass.
+
+    Returns:
+        A tuple consisting of the weight mass of each template, the number
+        of occurrences of the features of each template, and a list
+        describing the evaluation for each threshold, including 0. Each
+        evaluation is a dict with the keys "threshold", "skipped" (the names
+        of the skipped templates), "features" (the number of extracted
+        features), "extraction_seconds" (the time spent on extracting the
+        instances), "score" (the average of MUC, B^3 and CEAFe F1) and
+        "score_delta" (the difference to the score of the baseline).
+    """
+    mention_features = instance_extractor.mention_features
+    pairwise_features = instance_extractor.pairwise_features
+
+    logging.info("Computing the weight mass of each template.")
+
+    extractor = copy.copy(instance_extractor)
+    extractor.store_templates = True
+    extractor.dropped_templates = []
+
+    mass, occurrences = feature_templates.weight_mass(
+        extractor.extract_store(dev_corpus), perceptron.weights,
+        mention_features, pairwise_features)
+
+    names = feature_templates.names(mention_features, pairwise_features)
+
+    evaluations = []
+    baseline = None
+
+    for threshold in [0] + sorted(set(thresholds) - {0}):
+        skipped = feature_templates.below_threshold(mass, threshold)
+
+        extractor = copy.copy(instance_extractor)
+        extractor.mention_features, extractor.pairwise_features, \
+            extractor.dropped_templates = feature_templates.prune(
+                mention_features, pairwise_features, skipped)
+        extractor.store_templates = False
+
+        # cached instances would distort the time spent on extraction
+        extractor.feature_cache = None
+
+        start = time.perf_counter()
+        instances = extractor.extract_store(dev_corpus)
+        extraction_seconds = time.perf_counter() - start
+
+        score = _dev_evaluation(dev_corpus, instances, perceptron,
+                                coref_extractor)(perceptron.priors,
+                                                 perceptron.weights)
+
+        if baseline is None:
+            baseline = score
+
+        evaluations.append({
+            "threshold": threshold,
+            "skipped": [names[template] for template in skipped],
+            "features": int(len(instances.features)),
+            "extraction_seconds": extraction_seconds,
+            "score": score,
+            "score_delta": score - baseline,
+        })
+
+        logging.info("\tThreshold " + str(threshold) + ": skipped " +
+                     str(len(skipped)) + " templates, " +
+                     str(len(instances.features)) + " features, extraction " +
+                     "took %.2fs, score %.2f." % (extraction_seconds,
+                                                  100*score))
+
+    return mass, occurrences, evaluations
+
+
+def _fit_coarse_scorer(training_corpus, instance_extractor):
+    # train the coarse scorer of the instance extractor, if it is untrained
+    coarse_scorer = instance_extractor.coarse_scorer
+
+    if coarse_scorer is not None and coarse_scorer.weights is None:
+        logging.info("\tFitting coarse model parameters.")
+        coarse_scorer.fit(training_corpus,
+                          instance_extractor.candidate_policy)
+
+        recall = coarse_scorer.recall(training_corpus, [coarse_scorer.k],
+                                      instance_extractor.candidate_policy)
+        logging.info("\tCoarse model recall at k=" + str(coarse_scorer.k) +
+                     " on training data: " + str(recall[coarse_scorer.k]))
+
+
+def _fit_configuration(i):
+    # train the ith configuration of a sweep on the data in _shared, and
+    # save the model of its best epoch. Returns the score and the epoch of
+    # this model.
+    description = _describe(_shared["configurations"][i])
+    arguments = dict(_shared["configurations"][i])
+    perceptron = arguments.pop("perceptron")(**arguments)
+
+    logging.info("\tFitting model parameters for configuration " +
+                 description + ".")
+
+    dev_corpus, dev_instances, coref_extractor = _shared["dev"]
+    evaluate = _dev_evaluation(dev_corpus, dev_instances, perceptron,
+                               coref_extractor)
+    scores = []
+
+    def evaluate_and_record(priors, weights):
+        scores.append(evaluate(priors, weights))
+        return scores[-1]
+
+    priors, weights = perceptron.fit(_shared["instances"],
+                                     evaluate=evaluate_and_record,
+                                     patience=_shared["patience"])
+
+    models.save(_model_directory(_shared["directory"], i), priors, weights)
+
+    best_score = max(scores)
+    best_epoch = scores.index(best_score) + 1
+
+    logging.info("\tConfiguration " + description + ": score " +
+                 str(best_score) + " after epoch " + str(best_epoch) + ".")
+
+    return best_score, best_epoch
+
+
+def _describe(configuration):
+    return ", ".join(
+        name + "=" + (value.__name__ if name == "perceptron" else str(value))
+        for name, value in sorted(configuration.items()))
+
+
+def _model_directory(directory, i):
+    return os.path.join(directory, "models", str(i))
+
+
+def _dev_evaluation(dev_corpus, instances, perceptron, coref_extractor):
+    # a function scoring a model on development data, for evaluating the
+    # model after each epoch of training
+    def evaluate(priors, weights):
+        model = copy.copy(perceptron)
+        model.priors = priors
+        model.weights = weights
+        model.cost_scaling = 0
+
+        arcs, labels, scores = model.predict(instances)
+
+        mention_entity_mapping, _ = coref_extractor(
+            arcs, labels, scores, coref_labels=model.get_coref_labels())
+
+        return evaluation.conll_score(dev_corpus, mention_entity_mapping)
+
+    return evaluate
+
+
+def _report_profile(instance_extractor):
+    # log the feature profile of the last extraction, if features were
+    # profiled
+    if instance_extractor.profile is None:
+        return
+
+    for line in instance_extractor.profile.report():
+        logging.info(line)
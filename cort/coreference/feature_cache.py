@@ -0,0 +1,252 @@
+""" Cache extracted instances on disk.
+
+Extracting features is often the most expensive part of an experiment, and
+experiments with different learning parameters extract the same features from
+the same corpus over and over again. A ``FeatureCache`` stores the arrays
+extracted from each document (see ``InstanceExtractor._extract_doc``) in a
+directory. Entries are keyed by
+
+    - a hash of the content of the document: its tokens and annotation, its
+      coreference annotation and the spans of its system mentions, and
+    - a fingerprint of the extraction: the extractor function, the mention and
+      pairwise features, the cost function (including their source code and
+      the source of the modules defining them and of the cort modules these
+      import, so that entries are invalidated when the code or the helpers
+      it calls change), the feature hashing scheme, the candidate pruning
+      settings and whether templates of features are stored.
+
+Changes to code or data outside these modules which affect extraction, such as
+the computation of mention attributes, require bumping ``FORMAT_VERSION``.
+
+Cached arrays are memory-mapped when they are loaded. Stores built from single
+documents (see ``InstanceExtractor.extract_stores``) use the memory-mapped
+arrays without reading them into memory.
+"""
+
+import hashlib
+import inspect
+import os
+import pickle
+import shutil
+import tempfile
+import types
+
+
+import numpy
+
+
+__author__ = 'smartschat'
+
+
+# bump when the layout of the extracted arrays changes, or when extraction
+# changes in a way the fingerprint does not capture
+FORMAT_VERSION = "2"
+
+# names and dtypes of the arrays extracted for a document, in the order
+# returned by InstanceExtractor._extract_doc
+FIELDS = [
+    ("anaphors", "uint32"),
+    ("antecedents", "uint32"),
+    ("features", "uint32"),
+    ("costs", "uint32"),
+    ("consistency", "uint8"),
+    ("feature_mapping", numpy.dtype('l')),
+    ("substructures_mapping", numpy.dtype('l')),
+    ("feature_templates", "uint16"),
+    ("pruning_statistics", numpy.dtype('l')),
+]
+
+
+def document_hash(doc):
+    """ Compute a hash of the content of a document relevant for extraction.
+
+    Args:
+        doc (CoNLLDocument): A document.
+
+    Returns:
+        str: A hex digest of the identifier of the document, its table
+        (without the last column, which is overwritten when writing system
+        output), its coreference annotation and the spans of its system
+        mentions.
+    """
+    digest = hashlib.sha1()
+
+    def update(value):
+        digest.update(repr(value).encode("utf-8"))
+        digest.update(b"\0")
+
+    update((doc.folder, doc.id, doc.part))
+
+    for row in doc.document_table:
+        update(row[:-1])
+
+    update(sorted((span.begin, span.end, set_id)
+                  for span, set_id in doc.coref.items()))
+
+    update([(mention.span.begin, mention.span.end)
+            for mention in doc.system_mentions if not mention.is_dummy()])
+
+    return digest.hexdigest()
+
+
+def _module_sources(function):
+    # the source of the module defining a function and of the modules of cort
+    # imported by it, such that changes to helpers and resources used by the
+    # function invalidate entries
+    module = inspect.getmodule(function)
+
+    if module is None:
+        return []
+
+    modules = [module] + sorted(
+        (value for value in vars(module).values()
+         if isinstance(value, types.ModuleType) and
+         value.__name__.startswith("cort.")),
+        key=lambda imported: imported.__name__)
+
+    sources = []
+
+    for imported in modules:
+        try:
+            source = inspect.getsource(imported)
+        except (OSError, TypeError):
+            continue
+
+        sources.append((imported.__name__,
+                        hashlib.sha1(source.encode("utf-8")).hexdigest()))
+
+    return sources
+
+
+def _describe_function(function):
+    description = [getattr(function, "__module__", None),
+                   getattr(function, "__qualname__", repr(function))]
+
+    for implementation in [function, getattr(function, "vectorized", None)]:
+        if implementation is None:
+            continue
+
+        try:
+            description.append(inspect.getsource(implementation))
+        except (OSError, TypeError):
+            pass
+
+        description.append(_module_sources(implementation))
+
+    return description
+
+
+def fingerprint(extractor):
+    """ Compute a fingerprint of the settings of an instance extractor.
+
+    Args:
+        extractor (InstanceExtractor): An instance extractor.
+
+    Returns:
+        str: A hex digest describing the extractor function, the features,
+        the cost function, the feature hashing scheme, the dropped templates
+        and the candidate pruning settings of the extractor.
+    """
+    digest = hashlib.sha1()
+
+    description = [
+        FORMAT_VERSION,
+        _describe_function(extractor.extract_substructures),
+        [_describe_function(feature)
+         for feature in extractor.mention_features],
+        [_describe_function(feature)
+         for feature in extractor.pairwise_features],
+        _describe_function(extractor.cost_function),
+        extractor.feature_hashing,
+        sorted(extractor.blocking_kinds),
+        extractor.store_templates
+    ]
+
+    # only describe dropped templates if there are any, such that entries of
+    # extractors which keep all features remain valid
+    if extractor.dropped_templates:
+        description.append(sorted(extractor.dropped_templates))
+
+    digest.update(repr(description).encode("utf-8"))
+
+    for pruning in [extractor.candidate_policy, extractor.coarse_scorer]:
+        try:
+            digest.update(pickle.dumps(pruning))
+        except (pickle.PicklingError, AttributeError, TypeError):
+            digest.update(repr(pruning).encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """ A directory containing instances extracted from documents.
+
+    Attributes:
+        directory (str): The directory. Each entry is a subdirectory
+            containing one ``.npy`` file per extracted array.
+    """
+    def __init__(self, directory):
+        """ Initialize the cache.
+
+        Args:
+            directory (str): The directory of the cache. It is created if it
+                does not exist.
+        """
+        self.directory = directory
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def __entry(self, doc, extractor_fingerprint):
+        return os.path.join(self.directory,
+                            document_hash(doc) + "-" + extractor_fingerprint)
+
+    def load(self, doc, extractor_fingerprint):
+        """ Load the arrays extracted from a document.
+
+        Args:
+            doc (CoNLLDocument): A document.
+            extractor_fingerprint (str): The fingerprint of the extractor, as
+                computed by ``fingerprint``.
+
+        Returns:
+            list(numpy.array): The memory-mapped arrays in the order of
+            ``FIELDS``, or None if the document is not in the cache.
+        """
+        entry = self.__entry(doc, extractor_fingerprint)
+
+        if not os.path.isdir(entry):
+            return None
+
+        return [numpy.load(os.path.join(entry, name + ".npy"), mmap_mode="r")
+                for name, _ in FIELDS]
+
+    def save(self, doc, extractor_fingerprint, arrays):
+        """ Store the arrays extracted from a document.
+
+        The entry is written to a temporary directory first and then moved,
+        such that concurrent runs never see incomplete entries.
+
+        Args:
+            doc (CoNLLDocument): A document.
+            extractor_fingerprint (str): The fingerprint of the extractor, as
+                computed by ``fingerprint``.
+            arrays (list(array.array or numpy.array)): The extracted arrays,
+                in the order of ``FIELDS``.
+        """
+        entry = self.__entry(doc, extractor_fingerprint)
+
+        if os.path.isdir(entry):
+            return
+
+        temporary = tempfile.mkdtemp(dir=self.directory)
+
+        for (name, dtype), values in zip(FIELDS, arrays):
+            numpy.save(os.path.join(temporary, name + ".npy"),
+                       numpy.frombuffer(values, dtype=dtype))
+
+        try:
+            os.rename(temporary, entry)
+        except OSError:
+            # another process stored the same entry
+            shutil.rmtree(temporary, ignore_errors=True)
@@ -0,0 +1,87 @@
+""" Deterministic integer feature hashing.
+
+Instead of building feature strings such as ``"ana_" + feat`` or
+``feat_1 + "^" + feat_2`` and hashing each of them, every feature string is
+hashed only once. Hashes of prefixed or concatenated features are then
+computed by combining integer hashes:
+
+    - the hash of ``"ana_" + feat`` is ``combine(ANAPHOR, hash_string(feat))``,
+    - the hash of ``"ante_" + feat`` is
+      ``combine(ANTECEDENT, hash_string(feat))``,
+    - the hash of ``feat_1 + "^" + feat_2`` is ``combine(hash_1, hash_2)``.
+
+All operations work on numpy arrays of unsigned 64 bit integers, so that
+features for many pairs can be computed with a few array operations. The
+resulting feature indices differ from the indices obtained by hashing strings,
+hence models must be trained and applied with the same hashing scheme.
+"""
+
+
+import mmh3
+import numpy
+
+
+__author__ = 'smartschat'
+
+
+FEATURE_SPACE_SIZE = 2**24
+
+
+def hash_string(string):
+    """ Hash a string to an unsigned 64 bit integer via MurmurHash3.
+
+    Args:
+        string (str): A string.
+
+    Returns:
+        int: The hash of the string.
+    """
+    return mmh3.hash64(string)[0] % 2**64
+
+
+def combine(first, second):
+    """ Combine hashes elementwise.
+
+    The combination is not symmetric, i.e. ``combine(a, b)`` usually differs
+    from ``combine(b, a)``. Inputs are broadcasted against each other.
+
+    Args:
+        first (numpy.array or int): Hashes (unsigned 64 bit integers).
+        second (numpy.array or int): Hashes (unsigned 64 bit integers).
+
+    Returns:
+        numpy.array: The combined hashes (dtype uint64).
+    """
+    first = numpy.asarray(first, dtype=numpy.uint64)
+    second = numpy.asarray(second, dtype=numpy.uint64)
+
+    with numpy.errstate(over="ignore"):
+        # multiply-add, followed by the MurmurHash3 64 bit finalizer
+        combined = first * numpy.uint64(0x9e3779b97f4a7c15) + second
+        combined ^= combined >> numpy.uint64(33)
+        combined *= numpy.uint64(0xff51afd7ed558ccd)
+        combined ^= combined >> numpy.uint64(33)
+        combined *= numpy.uint64(0xc4ceb9fe1a85ec53)
+        combined ^= combined >> numpy.uint64(33)
+
+    return combined
+
+
+def to_feature_indices(hashes):
+    """ Map hashes to indices in the feature space.
+
+    Args:
+        hashes (numpy.array): Hashes (unsigned 64 bit integers).
+
+    Returns:
+        numpy.array: Indices between 0 and ``FEATURE_SPACE_SIZE - 1``
+        (dtype uint32).
+    """
+    return (hashes & numpy.uint64(FEATURE_SPACE_SIZE - 1)).astype(
+        numpy.uint32)
+
+
+# hash_string("ana_") and hash_string("ante_"), precomputed such that importing
+# this module does not require mmh3
+ANAPHOR = 0x4d564d64dc890461
+ANTECEDENT = 0x6ff18f513e7247e2
@@ -0,0 +1,391 @@
+""" Group extracted features by the templates they stem from.
+
+``InstanceExtractor`` mixes the features of all templates into one array per
+arc. For feature ablations, it can additionally store the template of each
+feature (see the ``store_templates`` argument of ``InstanceExtractor``). A
+store extracted once with all features can then be restricted to a subset of
+the features via ``InstanceStore.select_templates``, instead of extracting
+the instances again for each subset.
+
+Templates are identified by integers. For ``m`` mention features and ``p``
+pairwise features, these are
+
+    - ``0, ..., m-1``: the mention features. The template of a mention
+      feature comprises its "ana_", "ante_" and concatenated variants,
+    - ``m, ..., m+p-1``: the pairwise features,
+    - ``m+p, ..., 2*(m+p)-2``: the conjunction groups. The conjunction group
+      of a template ``t > 0`` comprises the combinations of the first mention
+      feature (usually the fine type) with the features of ``t``.
+
+When there are no mention features, there are no conjunction groups.
+
+Templates also describe where the weights of a model lie. ``weight_mass``
+sums the absolute weights of the features of each template over the arcs of
+a corpus. At prediction time, templates with a negligible share of the mass
+barely change the scores of arcs, but their features are computed and hashed
+nonetheless. ``prune`` computes the features an extractor needs when such
+templates are skipped: features none of whose templates are kept are not
+computed at all, and the features of the remaining skipped templates are
+dropped after extraction (see the ``dropped_templates`` argument of
+``InstanceExtractor``).
+"""
+
+import json
+
+
+import numpy
+
+
+__author__ = 'smartschat'
+
+
+# bump when the layout of a weight mass report changes
+FORMAT_VERSION = "1"
+
+
+def names(mention_features, pairwise_features):
+    """ Get the names of all templates.
+
+    Args:
+        mention_features (list(function: Mention -> str)): The mention
+            features.
+        pairwise_features (list(function: (Mention, Mention) -> str)): The
+            pairwise features.
+
+    Returns:
+        list(str): The name of each template, indexed by template id. Names
+        of conjunction groups are the names of the combined features joined
+        by "^".
+    """
+    base = [feature.__name__ for feature in mention_features] + \
+        [feature.__name__ for feature in pairwise_features]
+
+    if not mention_features:
+        return base
+
+    return base + [base[0] + "^" + name for name in base[1:]]
+
+
+def column_templates(n_mention_features, n_pairwise_features):
+    """ Get the template of each column of the feature layout of an arc.
+
+    Before the features which do not fire are removed, the features of an
+    arc consist of the "ana_", "ante_" and concatenated mention features,
+    the pairwise features and the combinations of the three variants of the
+    first mention feature with all other features (see
+    ``InstanceExtractor._extract_features``).
+
+    Args:
+        n_mention_features (int): The number of mention features.
+        n_pairwise_features (int): The number of pairwise features.
+
+    Returns:
+        numpy.array: The template id of each column (dtype uint16).
+    """
+    n_base = n_mention_features + n_pairwise_features
+
+    base = list(range(n_mention_features))*3 + \
+        list(range(n_mention_features, n_base))
+
+    if n_mention_features == 0:
+        return numpy.array(base, dtype=numpy.uint16)
+
+    others = [base[j] for j in range(len(base))
+              if j not in _first_feature_columns(n_mention_features)]
+
+    conjunctions = [n_base + template - 1 for template in others]*3
+
+    return numpy.array(base + conjunctions, dtype=numpy.uint16)
+
+
+def fired_columns(n_mention_features, pairwise_fired):
+    """ Compute which columns of the feature layout fire for arcs.
+
+    Args:
+        n_mention_features (int): The number of mention features.
+        pairwise_fired (numpy.array): A boolean matrix with one row per arc
+            and one column per pairwise feature, which is True if the
+            pairwise feature fires for the arc.
+
+    Returns:
+        numpy.array: A boolean matrix with one row per arc and one column per
+        column of the feature layout (see ``column_templates``). Mention
+        features always fire, combinations fire if the combined feature
+        fires.
+    """
+    n_arcs = pairwise_fired.shape[0]
+
+    fired = numpy.hstack([
+        numpy.ones((n_arcs, 3*n_mention_features), dtype=bool),
+        pairwise_fired])
+
+    if n_mention_features == 0:
+        return fired
+
+    others = [j for j in range(fired.shape[1])
+              if j not in _first_feature_columns(n_mention_features)]
+
+    return numpy.hstack([fired] + [fired[:, others]]*3)
+
+
+def arc_templates(n_mention_features, n_pairwise_features, fired):
+    """ Compute the templates of the features of arcs.
+
+    Args:
+        n_mention_features (int): The number of mention features.
+        n_pairwise_features (int): The number of pairwise features.
+        fired (numpy.array): Which columns of the feature layout fire for
+            each arc, as computed by ``fired_columns``.
+
+    Returns:
+        numpy.array: The template ids of the features of all arcs, in the
+        order the features are extracted (dtype uint16).
+    """
+    columns = column_templates(n_mention_features, n_pairwise_features)
+
+    return numpy.broadcast_to(columns, fired.shape)[fired]
+
+
+def ablation(mention_features, pairwise_features, removed):
+    """ Compute the templates remaining when removing features.
+
+    A template remains if none of the features it stems from is removed. For
+    all features but the first mention feature, the remaining templates
+    contain exactly the features obtained when extracting without the removed
+    features. Removing the first mention feature also removes all
+    conjunction groups, while extracting without it would combine the next
+    mention feature with the other features.
+
+    Args:
+        mention_features (list(function: Mention -> str)): The mention
+            features the instances were extracted with.
+        pairwise_features (list(function: (Mention, Mention) -> str)): The
+            pairwise features the instances were extracted with.
+        removed (list(str)): Names of the features to remove.
+
+    Returns:
+        list(int): The ids of the remaining templates.
+
+    Raises:
+        ValueError: If a name in ``removed`` is not the name of a feature.
+    """
+    all_names = names(mention_features, pairwise_features)
+    n_base = len(mention_features) + len(pairwise_features)
+
+    unknown = set(removed) - set(all_names[:n_base])
+    if unknown:
+        raise ValueError("Unknown features: " + ", ".join(sorted(unknown)))
+
+    removed_ids = {template for template in range(n_base)
+                   if all_names[template] in removed}
+
+    remaining = [template for template in range(n_base)
+                 if template not in removed_ids]
+
+    if mention_features and 0 not in removed_ids:
+        remaining += [n_base + template - 1 for template in remaining
+                      if template > 0]
+
+    return sorted(remaining)
+
+
+def weight_mass(store, weights, mention_features, pairwise_features):
+    """ Compute the weight mass of each template on a corpus.
+
+    The weight mass of a template is the sum of the absolute weights of its
+    features, over all labels and over all occurrences of the features in
+    the arcs of the corpus. Hence it measures how much the template
+    contributes to the scores of arcs, and templates which rarely fire have
+    little mass even if their weights are large.
+
+    Args:
+        store (InstanceStore): The instances of a corpus, extracted with
+            ``store_templates`` (see ``InstanceExtractor``).
+        weights (dict(str, numpy.array)): A mapping of graph labels to weight
+            vectors.
+        mention_features (list(function: Mention -> str)): The mention
+            features the instances were extracted with.
+        pairwise_features (list(function: (Mention, Mention) -> str)): The
+            pairwise features the instances were extracted with.
+
+    Returns:
+        A tuple consisting of the weight mass and the number of feature
+        occurrences of each template, indexed by template id.
+
+    Raises:
+        ValueError: If the templates of the features were not stored during
+            extraction.
+    """
+    if len(store.feature_templates) != len(store.features):
+        raise ValueError("The templates of the features were not stored "
+                         "during extraction.")
+
+    n_templates = len(names(mention_features, pairwise_features))
+
+    mass = numpy.zeros(n_templates)
+
+    for label in weights:
+        mass += numpy.bincount(
+            store.feature_templates,
+            weights=numpy.abs(numpy.asarray(weights[label]).take(
+                store.features)),
+            minlength=n_templates)
+
+    occurrences = numpy.bincount(store.feature_templates,
+                                 minlength=n_templates)
+
+    return mass, occurrences
+
+
+def below_threshold(mass, threshold):
+    """ Get the templates with a small share of the weight mass.
+
+    Args:
+        mass (numpy.array): The weight mass of each template, as computed by
+            ``weight_mass``.
+        threshold (float): A share of the total weight mass, between 0 and 1.
+
+    Returns:
+        list(int): The ids of the templates whose share of the total weight
+        mass is less than ``threshold``.
+    """
+    total = numpy.sum(mass)
+
+    if total == 0:
+        return []
+
+    return [int(template) for template
+            in numpy.flatnonzero(numpy.asarray(mass) / total < threshold)]
+
+
+def prune(mention_features, pairwise_features, skipped):
+    """ Compute the features to extract when skipping templates.
+
+    A feature is computed if one of its templates is not skipped, where the
+    templates of a feature are the template of the feature and its
+    conjunction group. The first mention feature is always computed, since
+    it defines the conjunction groups. The features of skipped templates
+    which are nevertheless computed are dropped after extraction. Extracting
+    with the returned features and dropped templates yields exactly the
+    features of the templates which are not skipped, with the same hashes.
+
+    Args:
+        mention_features (list(function: Mention -> str)): The mention
+            features.
+        pairwise_features (list(function: (Mention, Mention) -> str)): The
+            pairwise features.
+        skipped (list(int)): The ids of the templates to skip.
+
+    Returns:
+        A tuple consisting of the mention features and pairwise features to
+        compute, and the ids of the templates to drop after extraction, with
+        respect to the features to compute.
+    """
+    skipped = set(skipped)
+
+    n_mention_features = len(mention_features)
+    n_base = n_mention_features + len(pairwise_features)
+
+    def is_computed(template):
+        if template == 0 and n_mention_features > 0:
+            return True
+
+        conjunction_skipped = n_mention_features == 0 or \
+            n_base + template - 1 in skipped
+
+        return template not in skipped or not conjunction_skipped
+
+    computed = [template for template in range(n_base)
+                if is_computed(template)]
+
+    # the id of each computed template with respect to the computed features
+    new_ids = {template: i for i, template in enumerate(computed)}
+
+    dropped = [new_ids[template] for template in computed
+               if template in skipped]
+
+    if n_mention_features > 0:
+        dropped += [len(computed) + new_ids[template] - 1
+                    for template in computed
+                    if template > 0 and n_base + template - 1 in skipped]
+
+    return ([feature for i, feature in enumerate(mention_features)
+             if i in new_ids],
+            [feature for i, feature in enumerate(pairwise_features)
+             if n_mention_features + i in new_ids],
+            sorted(dropped))
+
+
+def save_weight_mass(path, mention_features, pairwise_features, mass,
+                     occurrences, evaluations=None):
+    """ Write the weight mass of each template to a JSON file.
+
+    Args:
+        path (str): The file.
+        mention_features (list(function: Mention -> str)): The mention
+            features.
+        pairwise_features (list(function: (Mention, Mention) -> str)): The
+            pairwise features.
+        mass (numpy.array): The weight mass of each template.
+        occurrences (numpy.array): The number of occurrences of the features
+            of each template.
+        evaluations (list(dict)): Results of predicting while skipping
+            templates, which must be serializable as JSON. Defaults to None,
+            which means that no results are written.
+    """
+    total = float(sum(mass))
+
+    report = {
+        "format_version": FORMAT_VERSION,
+        "total_mass": total,
+        "templates": [
+            {"id": template,
+             "name": name,
+             "mass": float(mass[template]),
+             "share": float(mass[template]) / total if total else 0.0,
+             "occurrences": int(occurrences[template])}
+            for template, name in enumerate(names(mention_features,
+                                                  pairwise_features))],
+        "evaluations": evaluations or [],
+    }
+
+    with open(path, "w") as report_file:
+        json.dump(report, report_file, indent=2, sort_keys=True)
+
+
+def load_weight_mass(path, mention_features, pairwise_features):
+    """ Read the weight mass of each template from a JSON file.
+
+    Args:
+        path (str): A file written by ``save_weight_mass``.
+        mention_features (list(function: Mention -> str)): The mention
+            features instances are extracted with.
+        pairwise_features (list(function: (Mention, Mention) -> str)): The
+            pairwise features instances are extracted with.
+
+    Returns:
+        numpy.array: The weight mass of each template, indexed by template
+        id.
+
+    Raises:
+        ValueError: If the file was written by an incompatible version of
+            this module, or for different features.
+    """
+    with open(path) as report_file:
+        report = json.load(report_file)
+
+    if report["format_version"] != FORMAT_VERSION:
+        raise ValueError("Unsupported weight mass format version: " +
+                         str(report["format_version"]))
+
+    if [template["name"] for template in report["templates"]] != \
+            names(mention_features, pairwise_features):
+        raise ValueError("The weight mass was computed for different "
+                         "features.")
+
+    return numpy.array([template["mass"] for template in report["templates"]])
+
+
+def _first_feature_columns(n_mention_features):
+    return [n_mention_features*i for i in [0, 1, 2]]
+
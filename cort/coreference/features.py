@@ -1,11 +1,32 @@
-""" Contains features for coreference resolution."""
+""" Contains features for coreference resolution.
+
+Pairwise features are functions of a mention pair. Additionally, a pairwise
+feature may provide a vectorized implementation as its attribute
+``vectorized``, which computes the feature for many pairs of a document at
+once. Such an implementation has the signature
+
+    vectorized(mentions, anaphors, antecedents) -> (codes, values)
+
+where ``mentions`` is a ``MentionArrays`` object for the mentions of a
+document, and ``anaphors`` and ``antecedents`` are integer arrays of indices
+into ``mentions.mentions`` describing the pairs. ``values`` is a list of
+feature strings, and ``codes`` is an integer array containing for each pair the
+index of its feature string in ``values``, or -1 if the feature does not fire
+(i.e. if the feature function returns None). Instance extraction uses the
+vectorized implementation if it exists, and falls back to calling the feature
+for each pair otherwise.
+"""
 
 
 import logging
 import re
 
 
+import numpy
+
+
 from cort.core import spans
+from cort.coreference import blocking
 
 
 __author__ = 'smartschat'
@@ -431,3 +452,154 @@ def __get_acronyms(cleaned_tokens):
                     token[0].isupper()]), \
            ".".join([token[0] for token in tokens_without_designator if
                      token[0].isupper()]) + "."
+
+
+def compute_pairwise_features(pairwise_features, mentions, anaphors,
+                              antecedents):
+    """ Compute pairwise features for a list of mention pairs.
+
+    Features with a vectorized implementation are computed for all pairs at
+    once, all other features are computed pair by pair.
+
+    Args:
+        pairwise_features (list(function: (Mention, Mention) -> str)): The
+            features to compute.
+        mentions (MentionArrays): The mentions of a document.
+        anaphors (numpy.array): Indices of the anaphors of the pairs in
+            ``mentions.mentions``.
+        antecedents (numpy.array): Indices of the antecedents of the pairs in
+            ``mentions.mentions``.
+
+    Returns:
+        list((numpy.array, list(str))): For each pairwise feature, a tuple
+        ``(codes, values)``, where ``codes[i]`` is the index of the value of
+        the feature for the ith pair in ``values``, or -1 if the feature does
+        not fire for the pair.
+    """
+    results = []
+
+    for feature in pairwise_features:
+        if hasattr(feature, "vectorized"):
+            results.append(feature.vectorized(mentions, anaphors, antecedents))
+            continue
+
+        value_to_code = {}
+        codes = numpy.full(len(anaphors), -1, dtype=numpy.int64)
+
+        for i, (anaphor, antecedent) in enumerate(zip(anaphors, antecedents)):
+            value = feature(mentions.mentions[anaphor],
+                            mentions.mentions[antecedent])
+            if value:
+                codes[i] = value_to_code.setdefault(value, len(value_to_code))
+
+        results.append((codes, sorted(value_to_code, key=value_to_code.get)))
+
+    return results
+
+
+def __indicator(name, fired):
+    return numpy.where(fired, 0, -1), [name]
+
+
+def __exact_match_vectorized(mentions, anaphors, antecedents):
+    codes = mentions.codes("tokens_as_lowercase_string")
+    return __indicator("exact_match",
+                       codes[anaphors] == codes[antecedents])
+
+
+def __head_match_vectorized(mentions, anaphors, antecedents):
+    codes = mentions.codes("head_as_lowercase_string")
+    return __indicator("head_match", codes[anaphors] == codes[antecedents])
+
+
+def __same_speaker_vectorized(mentions, anaphors, antecedents):
+    codes = mentions.codes("speaker")
+    return __indicator("same_speaker",
+                       codes[anaphors] == codes[antecedents])
+
+
+def __sentence_distance_vectorized(mentions, anaphors, antecedents):
+    sentence_ids = mentions.numbers("sentence_id")
+    distances = numpy.minimum(
+        sentence_ids[anaphors] - sentence_ids[antecedents], 5)
+
+    unique_distances, codes = numpy.unique(distances, return_inverse=True)
+
+    return codes, ["sentence_distance=" + (">=5" if dist >= 5 else str(dist))
+                   for dist in unique_distances.tolist()]
+
+
+def __span_begin(mention):
+    return mention.span.begin
+
+
+def __span_end(mention):
+    return mention.span.end
+
+
+def __embedding_vectorized(mentions, anaphors, antecedents):
+    begins = mentions.numbers(__span_begin)
+    ends = mentions.numbers(__span_end)
+
+    anaphor_embeds = ((begins[anaphors] <= begins[antecedents])
+                      & (ends[anaphors] >= ends[antecedents]))
+    antecedent_embeds = ((begins[antecedents] <= begins[anaphors])
+                         & (ends[antecedents] >= ends[anaphors]))
+
+    return __indicator("embedding", anaphor_embeds | antecedent_embeds)
+
+
+def __modifier_vectorized(mentions, anaphors, antecedents):
+    modifiers = mentions.incidence(__get_modifier)
+
+    # number of modifiers of the anaphor which also modify the antecedent
+    unique_anaphors, rows = numpy.unique(anaphors, return_inverse=True)
+    common = modifiers[unique_anaphors].dot(modifiers.T)[rows, antecedents]
+
+    return __indicator("modifier",
+                       common < modifiers[anaphors].sum(axis=1))
+
+
+def __alias_category(mention):
+    if mention.attributes["type"] != "NAM":
+        return 0
+
+    ner = mention.attributes["ner"][mention.attributes["head_index"]]
+
+    if ner == "PERSON":
+        return 1
+    elif re.match(r"LOC", ner):
+        return 2
+    elif re.match(r"ORG", ner):
+        return 3
+    else:
+        return 0
+
+
+def __alias_vectorized(mentions, anaphors, antecedents):
+    # only names of the same category with different heads can be aliases
+    categories = mentions.numbers(__alias_category)
+    heads = mentions.codes("head_as_lowercase_string")
+
+    candidates = numpy.flatnonzero(
+        (categories[anaphors] > 0)
+        & (categories[anaphors] == categories[antecedents])
+        & (heads[anaphors] != heads[antecedents])
+        & blocking.BlockingIndex.of(mentions).share_key(
+            "alias", anaphors, antecedents))
+
+    fired = numpy.zeros(len(anaphors), dtype=bool)
+    for i in candidates:
+        fired[i] = __are_alias(mentions.mentions[anaphors[i]],
+                               mentions.mentions[antecedents[i]])
+
+    return __indicator("alias", fired)
+
+
+exact_match.vectorized = __exact_match_vectorized
+head_match.vectorized = __head_match_vectorized
+same_speaker.vectorized = __same_speaker_vectorized
+sentence_distance.vectorized = __sentence_distance_vectorized
+embedding.vectorized = __embedding_vectorized
+modifier.vectorized = __modifier_vectorized
+alias.vectorized = __alias_vectorized
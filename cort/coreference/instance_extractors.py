@@ -2,18 +2,63 @@
 
 
 import array
+import collections
+import logging
 import multiprocessing
+import os
+import time
 
 
 import mmh3
 import numpy
 
 
+from cort.core import mention_arrays
+from cort.coreference import candidates
+from cort.coreference import feature_cache
+from cort.coreference import feature_hashing
+from cort.coreference import feature_templates
+from cort.coreference import features
+from cort.coreference import instance_store
+from cort.coreference import profiling
+from cort.util import multiprocessing as cort_multiprocessing
+
+
 __author__ = 'martscsn'
 
 
+# state inherited by forked worker processes, see InstanceExtractor.extract
+_shared = {}
+
+
 def unwrap_extract_doc(arg, **kwarg):
-    return InstanceExtractor._extract_doc(*arg, **kwarg)
+    extractor = arg[0]
+    result = InstanceExtractor._extract_doc(*arg, **kwarg)
+
+    return result, extractor.document_profile
+
+
+def extract_shared_doc(index):
+    """ Extract instances from a document inherited from the parent process.
+
+    Args:
+        index (int): The index of the document in the corpus that is shared
+            with the worker processes.
+
+    Returns:
+        A tuple consisting of
+
+            - a tuple of the document identifier, and the name and layout of
+              the shared memory block containing the extracted arrays (see
+              ``cort_multiprocessing.arrays_to_shared_memory``),
+            - the profile of the extraction (see
+              ``InstanceExtractor.document_profile``).
+    """
+    extractor = _shared["extractor"]
+    result = extractor._extract_doc(_shared["documents"][index])
+
+    return ((result[0],) + cort_multiprocessing.arrays_to_shared_memory(
+        result[1:]), extractor.document_profile)
 
 
 class InstanceExtractor:
@@ -25,19 +70,104 @@ class InstanceExtractor:
              space for a coreference resolution approach. The ith list in the
              nested list contains the search space for the ith substructure.
              The search space is represented as a nested list of mention pairs,
-             which are candidate arcs in the graph to predict.
+             which are candidate arcs in the graph to predict. If the function
+             has the attribute ``accepts_candidates``, it is called with the
+             ``CandidateAntecedents`` of the document as second argument when
+             candidates are restricted, and generates only arcs to these
+             candidates. Otherwise the other arcs are removed after
+             extraction.
         mention_features (list(function: Mention -> str)): A list of features
             for mentions.
         pairwise_features (list(function: (Mention, Mention) -> str)): A list
             of features for mention pairs.
         cost_function (function: (Mention, Mention) -> int): A function
-            assigning costs to mention pairs.
+            assigning costs to mention pairs. If the function has a
+            vectorized implementation (see
+            ``cort.coreference.cost_functions``), the costs of all arcs of a
+            document are computed at once.
+        worker_mode (str): How documents are handed to the worker processes
+            which extract the features. One of
+
+                - "fork": workers inherit the corpus when they are forked
+                  (sharing memory copy-on-write) and only receive document
+                  indices. The extracted arrays are sent back via shared
+                  memory and used without copying them out of it,
+                - "pickle": documents and results are pickled.
+        feature_hashing (str): How features are mapped to integers. One of
+
+                - "string": each feature string (including prefixed and
+                  combined features) is built and hashed,
+                - "integer": each mention feature string is hashed once per
+                  mention, and features of pairs are obtained by combining
+                  the hashes with numpy (see
+                  ``cort.coreference.feature_hashing``). This is much faster,
+                  but models trained with one scheme cannot be applied with
+                  the other.
+        candidate_policy (function: MentionArrays -> numpy.array): A policy
+            restricting the candidate antecedents of each mention (see
+            ``cort.coreference.candidates``), or None if all candidates
+            extracted by ``extract_substructures`` are kept.
+        coarse_scorer (CoarseScorer): A cheap model which selects the best
+            candidate antecedents of each mention before full feature
+            extraction (see ``cort.coreference.coarse_to_fine``), or None.
+        blocking_kinds (list(str)): Kinds of keys of a ``BlockingIndex``
+            (see ``cort.coreference.blocking``). Arcs between mentions
+            sharing a key of one of these kinds are candidates regardless of
+            ``candidate_policy``.
+        feature_cache (FeatureCache): A cache storing the instances extracted
+            from each document on disk (see
+            ``cort.coreference.feature_cache``), or None.
+        store_templates (bool): Whether the template of each feature is
+            extracted and stored (see ``cort.coreference.feature_templates``),
+            such that subsets of the features can be selected from the
+            extracted instances.
+        dropped_templates (list(int)): Ids of templates whose features are
+            removed from the extracted instances (see
+            ``cort.coreference.feature_templates.prune``). With integer
+            feature hashing, they are removed before hashing. Otherwise, the
+            template of each feature is computed and the features are
+            removed after extraction.
+        profile_features (bool): Whether feature extraction is profiled
+            (see ``cort.coreference.profiling``).
+        profile (FeatureProfile): The profile of the last extraction,
+            aggregated over all documents which were not loaded from the
+            feature cache, or None if features are not profiled.
+        document_profile (FeatureProfile): The profile of the document
+            extracted last by this process, or None.
+        pruning_statistics (dict(str, int)): Statistics about the arcs pruned
+            by ``candidate_policy`` and ``coarse_scorer`` during the last
+            extraction:
+
+                - "arcs": the number of candidate arcs before pruning,
+                - "kept_arcs": the number of arcs kept,
+                - "max_arcs_per_document": the maximum number of candidate
+                  arcs before pruning in one document,
+                - "max_kept_arcs_per_document": the maximum number of arcs
+                  kept in one document,
+                - "coreferent_arcs_pruned": the number of pruned arcs which
+                  connect coreferent mentions,
+                - "anaphors_lost": the number of anaphors for which all arcs
+                  to coreferent antecedents were pruned.
+
+            If ``extract_substructures`` generates only the candidate
+            antecedents, the arcs before pruning are all pairs of a mention
+            and a preceding mention. Statistics about coreferent mentions
+            are only computed for documents with gold annotation.
     """
     def __init__(self,
                  extract_substructures,
                  mention_features,
                  pairwise_features,
-                 cost_function):
+                 cost_function,
+                 worker_mode="fork",
+                 feature_hashing="string",
+                 candidate_policy=None,
+                 coarse_scorer=None,
+                 blocking_kinds=None,
+                 feature_cache=None,
+                 store_templates=False,
+                 dropped_templates=None,
+                 profile_features=False):
         """ Initialize instance and feature extraction.
 
         Args:
@@ -54,12 +184,72 @@ class InstanceExtractor:
                 list of features for mention pairs.
             cost_function (function: (Mention, Mention) -> int): A function
                 assigning costs to mention pairs.
+            worker_mode (str): How documents are handed to the worker
+                processes, either "fork" or "pickle" (see the class
+                documentation). Defaults to "fork". If the platform does not
+                support forking or shared memory, "pickle" is used.
+            feature_hashing (str): How features are mapped to integers,
+                either "string" or "integer" (see the class documentation).
+                Defaults to "string".
+            candidate_policy (function: MentionArrays -> numpy.array): A
+                policy restricting the candidate antecedents of each mention
+                (see ``cort.coreference.candidates``). Defaults to None,
+                which means that no candidates are pruned.
+            coarse_scorer (CoarseScorer): A trained model which selects the
+                best candidate antecedents of each mention after applying
+                ``candidate_policy`` (see
+                ``cort.coreference.coarse_to_fine``). Defaults to None, which
+                means that no candidates are pruned.
+            blocking_kinds (list(str)): Kinds of keys (see
+                ``cort.coreference.blocking``) such that arcs between mentions
+                sharing a key are exempt from ``candidate_policy``. Defaults
+                to None, which is interpreted as an empty list.
+            feature_cache (FeatureCache): A cache for extracted instances.
+                Documents found in the cache are not extracted again.
+                Defaults to None, which means that nothing is cached.
+            store_templates (bool): Whether to store the template of each
+                feature. Defaults to False.
+            dropped_templates (list(int)): Ids of templates whose features
+                are removed after extraction. Defaults to None, which is
+                interpreted as an empty list.
+            profile_features (bool): Whether to record the time spent on
+                each feature, how often features fire and how many features
+                collide when hashing them. Defaults to False.
         """
         self.extract_substructures = extract_substructures
         self.mention_features = mention_features
         self.pairwise_features = pairwise_features
         self.cost_function = cost_function
 
+        if worker_mode not in ["fork", "pickle"]:
+            raise ValueError("Unknown worker mode: " + str(worker_mode))
+
+        self.worker_mode = worker_mode
+
+        if feature_hashing not in ["string", "integer"]:
+            raise ValueError("Unknown feature hashing scheme: " +
+                             str(feature_hashing))
+
+        self.feature_hashing = feature_hashing
+        self.candidate_policy = candidate_policy
+        self.coarse_scorer = coarse_scorer
+        self.blocking_kinds = blocking_kinds or []
+        self.feature_cache = feature_cache
+        self.store_templates = store_templates
+        self.dropped_templates = dropped_templates or []
+        self.profile_features = profile_features
+        self.profile = None
+        self.document_profile = None
+        self.pruning_statistics = {}
+
+    def __getstate__(self):
+        # worker processes record their own profiles, hence the aggregated
+        # profile is not sent to them
+        state = self.__dict__.copy()
+        state["profile"] = None
+
+        return state
+
     def extract(self, corpus):
         """ Extract instances and features from a corpus.
 
@@ -67,82 +257,294 @@ class InstanceExtractor:
             corpus (Corpus): The corpus to extract instances and features from.
 
         Returns:
-            A 6-tuple which describes the extracted instances and their
-            features. The individual components are:
-
-                - **arcs** (*list((Mention, Mention))*): A list of coreference
-                  arcs.
-                - **features** (*numpy.array*): An array of features. The features
-                  are represented as integers via feature hashing.
-                - **substructures_mapping** (*numpy.array*): A list of indices
-                  that encodes which arcs in the list of arcs correspond to the
-                  same substructure. For example, if
-                  ``substructres_mapping[3] = 20`` and
-                  ``substructures_mapping[4] = 100``, then ``arcs[20:100]``
-                  correspond to the same substructure.
-                - **arcs_mapping** (*numpy.array*): A list of indices that encodes
-                  which features in the list of features correspond to the
-                  same arc (following the same principle as
-                  ``substructures_mapping``).
-                - **coreferent** (*numpy.array*): A boolean array of size
-                  len(arcs) containing the information whether the two mentions
-                  in the arc are coreferent.
-                - **costs** (*numpy.array*): An array of size len(arcs)
-                  containing the costs of wrongly predicting an arc.
+            A tuple consisting of
+
+                - **substructures** (*list(list((Mention, Mention)))*): The
+                  search space for the substructures, defined by a nested
+                  list. The ith list contains the search space for the ith
+                  substructure.
+                - **arc_information** (*dict((Mention, Mention),
+                  (numpy.array, int, bool))*): A mapping of arcs (= mention
+                  pairs) to information about these arcs. The information
+                  consists of the features (represented as an int array via
+                  feature hashing), the costs for the arc, and whether
+                  predicting the arc to be coreferent is consistent with the
+                  gold annotation.
+        """
+        return self.extract_store(corpus).to_arc_information()
+
+    def extract_store(self, corpus, directory=None):
+        """ Extract instances and features from a corpus into flat arrays.
+
+        In contrast to ``extract``, no Python objects are created for
+        individual arcs, which saves both time and memory for large corpora.
+
+        Args:
+            corpus (Corpus): The corpus to extract instances and features from.
+            directory (str): If given, the instances are written to this
+                directory while they are extracted (see
+                ``InstanceStoreWriter``), and the returned store is
+                memory-mapped. Then only the instances of a few documents are
+                held in memory at once. Defaults to None, which means that the
+                store is built in memory.
+
+        Returns:
+            InstanceStore: The extracted instances. The ith substructure of the
+            store corresponds to the ith substructure extracted by
+            ``extract``.
+        """
+        statistics = []
+
+        if directory is None:
+            results = []
+
+            for doc, result in self.__document_results(corpus.documents):
+                results.append(result[:-1])
+                statistics.append(result[-1])
+
+            store = instance_store.InstanceStore.from_document_results(
+                corpus.documents, results)
+        else:
+            writer = instance_store.InstanceStoreWriter(directory)
+
+            for doc, result in self.__document_results(corpus.documents):
+                writer.append(doc, result[:-1])
+                statistics.append(result[-1])
+
+            store = writer.close()
+
+        self.__collect_pruning_statistics(statistics)
+
+        return store
+
+    def extract_shards(self, corpus, directory, shard_size):
+        """ Extract instances and features from a corpus into shards on disk.
+
+        Each shard contains the instances of ``shard_size`` consecutive
+        documents, and is written to a subdirectory of ``directory`` while
+        the instances are extracted (see ``InstanceStoreWriter``). Shards can
+        be used for training with ``Perceptron.fit_shards``.
+
+        Args:
+            corpus (Corpus): The corpus to extract instances and features from.
+            directory (str): The directory the shards are written to.
+            shard_size (int): The number of documents per shard.
+
+        Returns:
+            list(InstanceStore): The memory-mapped shards.
+        """
+        shards = []
+        statistics = []
+        writer = None
+
+        for doc, result in self.__document_results(corpus.documents):
+            if writer is None:
+                writer = instance_store.InstanceStoreWriter(os.path.join(
+                    directory, "shard-%05d" % len(shards)))
+
+            writer.append(doc, result[:-1])
+            statistics.append(result[-1])
+
+            if len(writer.documents) == shard_size:
+                shards.append(writer.close())
+                writer = None
+
+        if writer is not None:
+            shards.append(writer.close())
+
+        self.__collect_pruning_statistics(statistics)
+
+        return shards
+
+    def extract_stores(self, corpus, batch_size=1):
+        """ Extract instances and features from a corpus batch by batch.
+
+        Documents are extracted in the background while the stores of
+        preceding batches are processed, and only a bounded number of
+        extracted documents is held in memory at once. Pruning statistics are
+        collected when all batches have been extracted.
+
+        Args:
+            corpus (Corpus): The corpus to extract instances and features from.
+            batch_size (int): The number of documents per batch. Defaults to
+                1.
+
+        Returns:
+            A generator yielding an ``InstanceStore`` for each batch of
+            consecutive documents of the corpus.
         """
+        statistics = []
+        documents = []
+        results = []
+
+        for doc, result in self.__document_results(corpus.documents):
+            documents.append(doc)
+            results.append(result[:-1])
+            statistics.append(result[-1])
+
+            if len(documents) == batch_size:
+                yield instance_store.InstanceStore.from_document_results(
+                    documents, results)
+                documents = []
+                results = []
+
+        if documents:
+            yield instance_store.InstanceStore.from_document_results(
+                documents, results)
+
+        self.__collect_pruning_statistics(statistics)
+
+    def __document_results(self, documents):
+        # yields each document together with the arrays extracted from it,
+        # taking documents from the feature cache if possible
+        if self.profile_features:
+            self.profile = profiling.FeatureProfile()
+
+        if self.feature_cache is not None:
+            extractor_fingerprint = feature_cache.fingerprint(self)
+            cached = [self.feature_cache.load(doc, extractor_fingerprint)
+                      for doc in documents]
+
+            logging.info("\tLoaded " +
+                         str(sum(result is not None for result in cached)) +
+                         "/" + str(len(cached)) +
+                         " documents from the feature cache.")
+        else:
+            cached = [None] * len(documents)
+
+        extracted = self._extract_documents(
+            [doc for doc, result in zip(documents, cached) if result is None])
+
+        for doc, result in zip(documents, cached):
+            if result is None:
+                result = next(extracted)[1:]
+
+                if self.feature_cache is not None:
+                    self.feature_cache.save(doc, extractor_fingerprint,
+                                            result)
+
+            yield doc, result
+
+        # let the workers shut down
+        for _ in extracted:
+            pass
+
+    def __collect_pruning_statistics(self, document_statistics):
+        self.pruning_statistics = {
+            "arcs": sum(stats[0] for stats in document_statistics),
+            "kept_arcs": sum(stats[1] for stats in document_statistics),
+            "max_arcs_per_document": max(
+                [stats[0] for stats in document_statistics] or [0]),
+            "max_kept_arcs_per_document": max(
+                [stats[1] for stats in document_statistics] or [0]),
+            "coreferent_arcs_pruned": sum(stats[2] for stats
+                                          in document_statistics),
+            "anaphors_lost": sum(stats[3] for stats in document_statistics)
+        }
+
+        if self.candidate_policy is None and self.coarse_scorer is None:
+            return
+
+        stats = self.pruning_statistics
+
+        logging.info("\tKept " + str(stats["kept_arcs"]) + "/" +
+                     str(stats["arcs"]) + " candidate arcs (at most " +
+                     str(stats["max_kept_arcs_per_document"]) + "/" +
+                     str(stats["max_arcs_per_document"]) + " per document).")
+        logging.info("\tPruned " + str(stats["coreferent_arcs_pruned"]) +
+                     " arcs between coreferent mentions, " +
+                     str(stats["anaphors_lost"]) +
+                     " anaphors lost all coreferent candidates.")
+
+    def _extract_documents(self, documents):
+        """ Extract instances from documents with a pool of worker processes.
 
-        pool = multiprocessing.Pool(maxtasksperchild=1)
-        results = pool.map(unwrap_extract_doc,
-                           zip([self]*len(corpus.documents), corpus.documents))
+        Args:
+            documents (list(CoNLLDocument)): The documents.
+
+        Returns:
+            A generator yielding the result of ``_extract_doc`` for each
+            document, in the order of ``documents``. At most two documents per
+            worker are extracted ahead of the document yielded last.
+        """
+        if not documents:
+            return
+
+        forked = (self.worker_mode == "fork" and
+                  cort_multiprocessing.supports_fork())
+
+        if forked:
+            from multiprocessing import resource_tracker
 
-        pool.close()
-        pool.join()
+            # workers register their shared memory with the tracker of this
+            # process, which must hence be running before forking
+            resource_tracker.ensure_running()
 
-        all_substructures = []
-        arc_information = {}
+            _shared["extractor"] = self
+            _shared["documents"] = documents
 
-        id_to_doc_mapping = {}
-        for doc in corpus:
-            id_to_doc_mapping[(doc.folder, doc.id, doc.part)] = doc
+            pool = multiprocessing.get_context("fork").Pool()
+            tasks = [(extract_shared_doc, (i,))
+                     for i in range(len(documents))]
+        else:
+            pool = multiprocessing.Pool(maxtasksperchild=1)
+            tasks = [(unwrap_extract_doc, ((self, doc),))
+                     for doc in documents]
 
-        for result in results:
-            doc_identifier, anaphors, antecedents, features, costs, \
-                consistency, feature_mapping, substructures_mapping = result
+        lookahead = 2 * multiprocessing.cpu_count()
+        pending = collections.deque()
 
-            doc = id_to_doc_mapping[doc_identifier]
+        def receive():
+            result, profile = pending.popleft().get()
 
-            for i in range(0, len(substructures_mapping)-1):
-                struct = []
-                begin = substructures_mapping[i]
-                end = substructures_mapping[i+1]
+            if forked:
+                doc_identifier, name, layout = result
+                result = (doc_identifier,) + tuple(
+                    cort_multiprocessing.arrays_from_shared_memory(
+                        name, layout))
 
-                for pair_index in range(begin, end):
-                    arc = (doc.system_mentions[anaphors[pair_index]],
-                           doc.system_mentions[antecedents[pair_index]])
+            if profile is not None and self.profile is not None:
+                self.profile.merge(profile)
 
-                    struct.append(arc)
+            return result
 
-                    features_start = feature_mapping[pair_index]
-                    features_end = feature_mapping[pair_index+1]
+        try:
+            for task, args in tasks:
+                pending.append(pool.apply_async(task, args))
 
-                    arc_information[arc] = \
-                        (numpy.array(features[features_start:features_end]),
-                         costs[pair_index],
-                         consistency[pair_index])
+                if len(pending) >= lookahead:
+                    yield receive()
 
-                all_substructures.append(struct)
+            while pending:
+                yield receive()
 
-        return all_substructures, arc_information
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+            if forked:
+                _shared.clear()
 
     def _extract_doc(self, doc):
-        cache = {}
-        substructures = self.extract_substructures(doc)
+        if self.profile_features:
+            self.document_profile = profiling.FeatureProfile()
+            self.document_profile.documents = 1
+        else:
+            self.document_profile = None
 
         mentions_to_ids = {}
 
         for i, mention in enumerate(doc.system_mentions):
             mentions_to_ids[mention] = i
 
+        mentions = mention_arrays.MentionArrays(doc.system_mentions)
+
+        substructures, pruning_statistics = self.__extract_substructures(
+            doc, mentions, mentions_to_ids)
+
         anaphors = array.array('I')
         antecedents = array.array('I')
         costs = array.array('I')
@@ -150,10 +552,13 @@ class InstanceExtractor:
         feature_mapping = array.array('l')
         substructures_mapping = array.array('l')
         features = array.array('I')
+        templates = array.array('H')
 
         feature_mapping.append(0)
         substructures_mapping.append(0)
 
+        arcs = []
+
         for struct in substructures:
             # skip empty
             if not struct:
@@ -162,15 +567,60 @@ class InstanceExtractor:
             for arc in struct:
                 anaphors.append(mentions_to_ids[arc[0]])
                 antecedents.append(mentions_to_ids[arc[1]])
-                costs.append(self.cost_function(arc))
-                consistency.append(arc[0].decision_is_consistent(arc[1]))
+                arcs.append(arc)
+
+            substructures_mapping.append(substructures_mapping[-1] +
+                                         len(struct))
 
-                arc_features = self._extract_features(arc, cache)
+        pair_indices = (numpy.frombuffer(anaphors, dtype=numpy.uint32),
+                        numpy.frombuffer(antecedents, dtype=numpy.uint32))
+
+        consistency.frombytes(
+            mentions.consistency(*pair_indices).astype(numpy.uint8).tobytes())
+
+        if hasattr(self.cost_function, "vectorized"):
+            costs.frombytes(self.cost_function.vectorized(
+                mentions, *pair_indices).astype(numpy.uint32).tobytes())
+        else:
+            costs.extend(self.cost_function(arc) for arc in arcs)
+
+        if self.feature_hashing == "integer":
+            features, feature_mapping, templates = \
+                self._extract_hashed_features(arcs, mentions, *pair_indices)
+        else:
+            cache = {}
+            strings = [] if self.document_profile is not None else None
+
+            pairwise = [None]*len(arcs)
+
+            for indices, chunk_pairwise in self.__pairwise_chunks(
+                    arcs, mentions, *pair_indices):
+                for i, index in enumerate(indices):
+                    pairwise[index] = [
+                        values[codes[i]] for codes, values in chunk_pairwise
+                        if codes[i] >= 0]
+
+                if self.__records_templates():
+                    templates.frombytes(self.__templates(
+                        feature_templates.fired_columns(
+                            len(self.mention_features),
+                            _pairwise_fired(chunk_pairwise, len(indices)))))
+
+            for arc, arc_pairwise in zip(arcs, pairwise):
+                arc_features = self._extract_features(arc, cache,
+                                                      arc_pairwise, strings)
                 features.extend(arc_features)
                 feature_mapping.append(feature_mapping[-1] + len(arc_features))
 
-            substructures_mapping.append(substructures_mapping[-1] +
-                                         len(struct))
+            if strings is not None:
+                self.__record_features(templates, strings, features)
+
+            if self.dropped_templates:
+                features, feature_mapping, templates = self.__drop_templates(
+                    features, feature_mapping, templates)
+
+        if not self.store_templates:
+            templates = array.array('H')
 
         return ((doc.folder, doc.id, doc.part),
                 anaphors,
@@ -179,9 +629,106 @@ class InstanceExtractor:
                 costs,
                 consistency,
                 feature_mapping,
-                substructures_mapping)
-
-    def _extract_features(self, arc, cache):
+                substructures_mapping,
+                templates,
+                pruning_statistics)
+
+    def __extract_substructures(self, doc, mentions, mentions_to_ids):
+        if self.candidate_policy is None and self.coarse_scorer is None:
+            substructures = self.extract_substructures(doc)
+            n_arcs = sum(len(struct) for struct in substructures)
+
+            return substructures, array.array('l', [n_arcs, n_arcs, 0, 0])
+
+        candidate_antecedents = None
+        generated = False
+
+        if self.candidate_policy is not None:
+            candidate_antecedents = candidates.CandidateAntecedents(
+                mentions, self.candidate_policy, self.blocking_kinds)
+
+        if candidate_antecedents is not None and getattr(
+                self.extract_substructures, "accepts_candidates", False):
+            # arcs to mentions which are not candidates are never built
+            substructures = self.extract_substructures(doc,
+                                                       candidate_antecedents)
+            generated = True
+        else:
+            substructures = self.extract_substructures(doc)
+
+        arcs = [arc for struct in substructures for arc in struct]
+
+        anaphors = numpy.array([mentions_to_ids[arc[0]] for arc in arcs],
+                               dtype=numpy.int64)
+        antecedents = numpy.array([mentions_to_ids[arc[1]] for arc in arcs],
+                                  dtype=numpy.int64)
+        is_dummy = mentions.is_dummy()[antecedents]
+
+        keep = numpy.ones(len(arcs), dtype=bool)
+
+        if candidate_antecedents is not None and not generated:
+            keep &= candidate_antecedents.allows(anaphors, antecedents)
+
+        if self.coarse_scorer is not None:
+            candidate_arcs = numpy.flatnonzero(keep & ~is_dummy)
+            keep[candidate_arcs] = self.coarse_scorer.prune(
+                mentions, anaphors[candidate_arcs],
+                antecedents[candidate_arcs])
+
+        keep |= is_dummy
+
+        if not keep.all():
+            pruned_substructures = []
+            start = 0
+            for struct in substructures:
+                pruned_substructures.append(
+                    [arc for arc, kept
+                     in zip(struct, keep[start:start + len(struct)]) if kept])
+                start += len(struct)
+
+            substructures = pruned_substructures
+
+        if generated:
+            # statistics refer to all pairs of a mention and a preceding
+            # mention, since the other arcs were never built
+            n_arcs = candidate_antecedents.n_pairs()
+        else:
+            n_arcs = len(arcs)
+
+        set_ids = mentions.gold_set_ids()
+
+        # statistics about coreferent arcs need gold annotation
+        if not (set_ids >= 0).any():
+            return substructures, array.array(
+                'l', [n_arcs, int(keep.sum()), 0, 0])
+
+        coreferent = ((set_ids[anaphors] >= 0)
+                      & (set_ids[anaphors] == set_ids[antecedents]))
+
+        coreferent_arcs_pruned = int((coreferent & ~keep).sum())
+
+        if generated:
+            coreferent_arcs_pruned += \
+                candidate_antecedents.coreferent_pairs_pruned()
+
+            # all mentions which have a preceding coreferent mention
+            annotated = numpy.flatnonzero(set_ids >= 0)
+            _, first = numpy.unique(set_ids[annotated], return_index=True)
+            with_antecedent = set(annotated.tolist()) - \
+                set(annotated[first].tolist())
+        else:
+            with_antecedent = set(anaphors[coreferent].tolist())
+
+        anaphors_lost = with_antecedent - set(
+            anaphors[coreferent & keep].tolist())
+
+        return substructures, array.array('l', [
+            n_arcs,
+            int(keep.sum()),
+            coreferent_arcs_pruned,
+            len(anaphors_lost)])
+
+    def _extract_features(self, arc, cache, pairwise=None, strings=None):
         anaphor, antecedent = arc
         inst_feats = []
 
@@ -189,8 +736,7 @@ class InstanceExtractor:
             # mention features
             for mention in [anaphor, antecedent]:
                 if mention not in cache:
-                    cache[mention] = [feature(mention) for feature
-                                      in self.mention_features]
+                    cache[mention] = self.__mention_values(mention)
 
             inst_feats += ["ana_" + feat for feat in cache[anaphor]]
             inst_feats += ["ante_" + feat for feat in cache[antecedent]]
@@ -201,14 +747,21 @@ class InstanceExtractor:
                            zip(cache[anaphor], cache[antecedent])]
 
             # pairwise features
-            inst_feats += [feature(anaphor, antecedent) for feature
-                           in self.pairwise_features
-                           if feature(anaphor, antecedent)]
+            if pairwise is None:
+                pairwise = [value for value in
+                            [feature(anaphor, antecedent) for feature
+                             in self.pairwise_features]
+                            if value]
+
+            inst_feats += pairwise
 
             # feature combinations
             fine_type_indices = [len(self.mention_features)*i for i
                                  in [0, 1, 2]]
 
+            if self.document_profile is not None:
+                start = time.perf_counter()
+
             to_add = []
 
             for i in fine_type_indices:
@@ -218,8 +771,251 @@ class InstanceExtractor:
 
             inst_feats += to_add
 
+            if self.document_profile is not None:
+                self.document_profile.record("[combinations]",
+                                             time.perf_counter() - start)
+
+        if strings is not None:
+            strings.extend(inst_feats)
+
+        if self.document_profile is not None:
+            start = time.perf_counter()
+
         # to hash
         all_feats = array.array('I', [mmh3.hash(word) & 2**24-1 for word
                                       in inst_feats])
 
+        if self.document_profile is not None:
+            self.document_profile.record("[hashing]",
+                                         time.perf_counter() - start)
+
         return all_feats
+
+    def __mention_values(self, mention):
+        profile = self.document_profile
+
+        if profile is None:
+            return [feature(mention) for feature in self.mention_features]
+
+        values = []
+
+        for feature in self.mention_features:
+            start = time.perf_counter()
+            value = feature(mention)
+            profile.record(feature.__name__, time.perf_counter() - start,
+                           fired=int(bool(value)))
+            values.append(value)
+
+        return values
+
+    def __records_templates(self):
+        # with integer hashing, dropped templates are masked before hashing
+        return self.store_templates or self.document_profile is not None or \
+            (bool(self.dropped_templates) and
+             self.feature_hashing != "integer")
+
+    def __drop_templates(self, features, feature_mapping, templates):
+        # remove the features of the dropped templates from the features of
+        # a document, analogously to InstanceStore.select_templates
+        keep = ~numpy.isin(numpy.frombuffer(templates, dtype=numpy.uint16),
+                           self.dropped_templates)
+
+        # the number of features kept before each position
+        kept_before = numpy.concatenate([[0], numpy.cumsum(keep)])
+
+        kept_features = array.array('I')
+        kept_features.frombytes(
+            numpy.frombuffer(features, dtype=numpy.uint32)[keep].tobytes())
+
+        kept_mapping = array.array('l')
+        kept_mapping.frombytes(kept_before[numpy.frombuffer(
+            feature_mapping, dtype=numpy.dtype('l'))].astype(
+            numpy.dtype('l')).tobytes())
+
+        kept_templates = array.array('H')
+        kept_templates.frombytes(
+            numpy.frombuffer(templates, dtype=numpy.uint16)[keep].tobytes())
+
+        return kept_features, kept_mapping, kept_templates
+
+    def __record_features(self, templates, identities, features):
+        # record the extracted features of a document and their templates in
+        # the profile of the document
+        self.document_profile.record_features(
+            feature_templates.names(self.mention_features,
+                                    self.pairwise_features),
+            numpy.frombuffer(templates, dtype=numpy.uint16),
+            identities,
+            numpy.frombuffer(features, dtype=numpy.uint32))
+
+    def __pairwise_chunks(self, arcs, mentions, anaphors, antecedents,
+                          chunk_size=10000):
+        # arcs with the dummy mention as antecedent do not have features
+        non_dummy = numpy.flatnonzero(
+            [not arc[1].is_dummy() for arc in arcs])
+
+        # bound the size of intermediate arrays for long documents
+        for start in range(0, len(non_dummy), chunk_size):
+            indices = non_dummy[start:start + chunk_size]
+
+            if self.document_profile is None:
+                yield indices, features.compute_pairwise_features(
+                    self.pairwise_features, mentions, anaphors[indices],
+                    antecedents[indices])
+                continue
+
+            chunk_pairwise = []
+
+            for feature in self.pairwise_features:
+                start = time.perf_counter()
+                chunk_pairwise += features.compute_pairwise_features(
+                    [feature], mentions, anaphors[indices],
+                    antecedents[indices])
+                self.document_profile.record(
+                    feature.__name__, time.perf_counter() - start,
+                    calls=len(indices),
+                    fired=int((chunk_pairwise[-1][0] >= 0).sum()))
+
+            yield indices, chunk_pairwise
+
+    def _extract_hashed_features(self, arcs, mentions, anaphors, antecedents):
+        hash_cache = {}
+
+        def hash_feature(feature):
+            if feature not in hash_cache:
+                hash_cache[feature] = feature_hashing.hash_string(feature)
+            return hash_cache[feature]
+
+        # hash mention features once per mention
+        mentions_to_rows = {}
+        mention_hashes = []
+        for arc in arcs:
+            for mention in arc:
+                if mention not in mentions_to_rows and not mention.is_dummy():
+                    mentions_to_rows[mention] = len(mention_hashes)
+                    mention_hashes.append(
+                        [hash_feature(value) for value
+                         in self.__mention_values(mention)])
+
+        mention_hashes = numpy.array(mention_hashes, dtype=numpy.uint64)
+        mention_hashes.shape = (len(mentions_to_rows),
+                                len(self.mention_features))
+
+        ana_hashes = feature_hashing.combine(feature_hashing.ANAPHOR,
+                                             mention_hashes)
+        ante_hashes = feature_hashing.combine(feature_hashing.ANTECEDENT,
+                                              mention_hashes)
+
+        features = array.array('I')
+        templates = array.array('H')
+        identities = []
+        lengths = numpy.zeros(len(arcs), dtype=numpy.dtype('l'))
+
+        kept_columns = ~numpy.isin(
+            feature_templates.column_templates(len(self.mention_features),
+                                               len(self.pairwise_features)),
+            self.dropped_templates)
+
+        for indices, pairwise in self.__pairwise_chunks(
+                arcs, mentions, anaphors, antecedents):
+            chunk = [arcs[i] for i in indices]
+
+            chunk_hashes, chunk_fired = self.__hash_arcs(
+                ana_hashes[[mentions_to_rows[arc[0]] for arc in chunk]],
+                ante_hashes[[mentions_to_rows[arc[1]] for arc in chunk]],
+                pairwise,
+                hash_feature)
+
+            if self.dropped_templates:
+                # features of dropped templates are masked before hashing,
+                # without recording the template of each feature
+                chunk_fired &= kept_columns
+
+            if self.document_profile is not None:
+                start = time.perf_counter()
+
+            features.frombytes(feature_hashing.to_feature_indices(
+                chunk_hashes[chunk_fired]).tobytes())
+            lengths[indices] = chunk_fired.sum(axis=1)
+
+            if self.document_profile is not None:
+                self.document_profile.record("[hashing]",
+                                             time.perf_counter() - start)
+                identities.append(chunk_hashes[chunk_fired])
+
+            if self.__records_templates():
+                templates.frombytes(self.__templates(chunk_fired))
+
+        feature_mapping = array.array('l', [0])
+        feature_mapping.frombytes(numpy.cumsum(lengths).astype(
+            numpy.dtype('l')).tobytes())
+
+        if self.document_profile is not None:
+            self.__record_features(
+                templates,
+                numpy.concatenate([numpy.zeros(0, dtype=numpy.uint64)] +
+                                  identities),
+                features)
+
+        return features, feature_mapping, templates
+
+    def __templates(self, fired):
+        # the template ids of the features of arcs as bytes, where fired
+        # describes the fired columns of the arcs (see feature_templates)
+        return feature_templates.arc_templates(
+            len(self.mention_features), len(self.pairwise_features),
+            fired).tobytes()
+
+    def __hash_arcs(self, ana, ante, pairwise, hash_feature):
+        n_arcs = len(ana)
+        n_mention_features = len(self.mention_features)
+
+        # pairwise features
+        pairwise_hashes = numpy.zeros((n_arcs, len(self.pairwise_features)),
+                                      dtype=numpy.uint64)
+
+        for j, (codes, values) in enumerate(pairwise):
+            fired = codes >= 0
+            value_hashes = numpy.array([hash_feature(value) for value
+                                        in values], dtype=numpy.uint64)
+
+            pairwise_hashes[fired, j] = value_hashes[codes[fired]]
+
+        # ana_, ante_ and concatenated features, followed by pairwise features
+        hashes = numpy.hstack([ana, ante, feature_hashing.combine(ana, ante),
+                               pairwise_hashes])
+        fired = feature_templates.fired_columns(
+            n_mention_features, _pairwise_fired(pairwise, n_arcs))
+
+        # feature combinations
+        if n_mention_features == 0:
+            return hashes, fired
+
+        fine_type_indices = [n_mention_features*i for i in [0, 1, 2]]
+        other_indices = [j for j in range(hashes.shape[1])
+                         if j not in fine_type_indices]
+
+        if self.document_profile is not None:
+            start = time.perf_counter()
+
+        combinations = feature_hashing.combine(
+            hashes[:, fine_type_indices][:, :, numpy.newaxis],
+            hashes[:, other_indices][:, numpy.newaxis, :])
+
+        if self.document_profile is not None:
+            self.document_profile.record("[combinations]",
+                                         time.perf_counter() - start)
+
+        return (numpy.hstack([hashes, combinations.reshape(n_arcs, -1)]),
+                fired)
+
+
+def _pairwise_fired(pairwise, n_arcs):
+    # a boolean matrix which is True where the pairwise features, computed by
+    # features.compute_pairwise_features, fire
+    fired = numpy.zeros((n_arcs, len(pairwise)), dtype=bool)
+
+    for j, (codes, _) in enumerate(pairwise):
+        fired[:, j] = codes >= 0
+
+    return fired
@@ -0,0 +1,539 @@
+""" Store extracted instances in flat arrays. """
+
+import os
+
+
+import numpy
+
+
+__author__ = 'smartschat'
+
+
+# names and dtypes of the arrays of a store
+FIELDS = [
+    ("features", "uint32"),
+    ("arc_offsets", "int64"),
+    ("substructure_offsets", "int64"),
+    ("document_offsets", "int64"),
+    ("anaphors", "uint32"),
+    ("antecedents", "uint32"),
+    ("costs", "int32"),
+    ("consistency", "bool"),
+    ("feature_templates", "uint16"),
+]
+
+
+# the fields containing offsets, which start with 0
+_OFFSETS = ["arc_offsets", "substructure_offsets", "document_offsets"]
+
+
+# the number of arcs whose features are gathered at once in sum_weights
+_SUM_CHUNK_SIZE = 2**16
+
+
+class InstanceStore:
+    """ Store instances extracted from a corpus in a compressed sparse row
+    (CSR) layout.
+
+    Arcs are identified by their index in the store. The features of the ith
+    arc are ``features[arc_offsets[i]:arc_offsets[i+1]]``, and the ith
+    substructure consists of the arcs
+    ``substructure_offsets[i], ..., substructure_offsets[i+1] - 1``.
+
+    The store can be used in place of the ``arc_information`` dict expected by
+    ``Perceptron``: ``store[i]`` returns the features, costs and consistency
+    information of the ith arc, and ``store.substructures`` contains the
+    search space for each substructure as a range of arc indices.
+
+    Attributes:
+        documents (list(CoNLLDocument)): The documents the instances were
+            extracted from.
+        features (numpy.array): The features of all arcs, represented as
+            integers via feature hashing (dtype uint32).
+        arc_offsets (numpy.array): Offsets of the features of each arc in
+            ``features`` (length: number of arcs + 1).
+        substructure_offsets (numpy.array): Offsets of the arcs of each
+            substructure (length: number of substructures + 1).
+        document_offsets (numpy.array): Offsets of the arcs of each document
+            (length: number of documents + 1).
+        anaphors (numpy.array): For each arc, the index of the anaphor in the
+            ``system_mentions`` of its document.
+        antecedents (numpy.array): For each arc, the index of the antecedent
+            in the ``system_mentions`` of its document.
+        costs (numpy.array): For each arc, the costs of wrongly predicting
+            the arc.
+        consistency (numpy.array): For each arc, whether predicting it is
+            consistent with the gold annotation (dtype bool).
+        feature_templates (numpy.array): For each feature in ``features``,
+            the id of its template (see ``cort.coreference.feature_templates``,
+            dtype uint16). Empty if the templates were not stored during
+            extraction.
+        substructures (SubstructureView): The search space for each
+            substructure, as a sequence of ranges of arc indices.
+    """
+    def __init__(self,
+                 documents,
+                 features,
+                 arc_offsets,
+                 substructure_offsets,
+                 document_offsets,
+                 anaphors,
+                 antecedents,
+                 costs,
+                 consistency,
+                 feature_templates=None):
+        """ Initialize the store from arrays.
+
+        Args:
+            documents (list(CoNLLDocument)): The documents the instances were
+                extracted from.
+            features (numpy.array): The features of all arcs.
+            arc_offsets (numpy.array): Offsets of the features of each arc.
+            substructure_offsets (numpy.array): Offsets of the arcs of each
+                substructure.
+            document_offsets (numpy.array): Offsets of the arcs of each
+                document.
+            anaphors (numpy.array): Indices of the anaphors in the system
+                mentions of their documents.
+            antecedents (numpy.array): Indices of the antecedents in the
+                system mentions of their documents.
+            costs (numpy.array): The costs of the arcs.
+            consistency (numpy.array): Whether the arcs are consistent with
+                the gold annotation.
+            feature_templates (numpy.array): The template ids of the
+                features. Defaults to None, which means that no templates are
+                stored.
+        """
+        self.documents = documents
+        self.features = features
+        self.arc_offsets = arc_offsets
+        self.substructure_offsets = substructure_offsets
+        self.document_offsets = document_offsets
+        self.anaphors = anaphors
+        self.antecedents = antecedents
+        self.costs = costs
+        self.consistency = consistency
+
+        if feature_templates is None:
+            feature_templates = numpy.zeros(0, dtype=numpy.uint16)
+
+        self.feature_templates = feature_templates
+        self.substructures = SubstructureView(substructure_offsets)
+
+    @staticmethod
+    def from_document_results(documents, results):
+        """ Build a store from instances extracted from individual documents.
+
+        Args:
+            documents (list(CoNLLDocument)): The documents, in the order of
+                ``results``.
+            results (list(tuple)): For each document, the tuple
+                ``(anaphors, antecedents, features, costs, consistency,
+                feature_mapping, substructures_mapping, feature_templates)``
+                of arrays computed by ``InstanceExtractor``. Offsets are
+                relative to the document.
+
+        Returns:
+            InstanceStore: A store containing all instances.
+        """
+        parts = [_document_arrays(result) for result in results]
+
+        if len(parts) == 1:
+            # use the arrays of the document without copying them, such that
+            # arrays memory-mapped from a feature cache stay on disk
+            return InstanceStore(documents, **parts[0])
+
+        # offsets of a document are shifted by the features or arcs of the
+        # preceding documents
+        feature_shifts = numpy.cumsum(
+            [0] + [len(part["features"]) for part in parts[:-1]])
+        arc_shifts = numpy.cumsum(
+            [0] + [len(part["anaphors"]) for part in parts[:-1]])
+
+        arrays = {}
+
+        for name, dtype in FIELDS:
+            if name not in _OFFSETS:
+                arrays[name] = numpy.concatenate(
+                    [numpy.zeros(0, dtype=dtype)] +
+                    [part[name] for part in parts], dtype=dtype)
+                continue
+
+            shifts = feature_shifts if name == "arc_offsets" else arc_shifts
+
+            # copy each document into the result at once, dropping the
+            # leading zero of its offsets
+            offsets = numpy.zeros(
+                1 + sum(len(part[name]) - 1 for part in parts), dtype=dtype)
+            position = 1
+
+            for part, shift in zip(parts, shifts):
+                numpy.add(part[name][1:], shift,
+                          out=offsets[position:position + len(part[name]) - 1])
+                position += len(part[name]) - 1
+
+            arrays[name] = offsets
+
+        return InstanceStore(documents, **arrays)
+
+    @staticmethod
+    def load(directory, documents):
+        """ Load a store written by ``InstanceStoreWriter``.
+
+        The arrays are memory-mapped read-only, hence the store may be much
+        larger than the available memory.
+
+        Args:
+            directory (str): The directory the store was written to.
+            documents (list(CoNLLDocument)): The documents the instances were
+                extracted from, in the order they were written.
+
+        Returns:
+            InstanceStore: The store.
+        """
+        arrays = {}
+
+        for name, dtype in FIELDS:
+            path = os.path.join(directory, name + ".bin")
+
+            if os.path.getsize(path) == 0:
+                arrays[name] = numpy.zeros(0, dtype=dtype)
+            else:
+                arrays[name] = numpy.memmap(path, dtype=dtype, mode="r")
+
+        return InstanceStore(documents, **arrays)
+
+    def __len__(self):
+        """ Return the number of arcs in the store. """
+        return len(self.anaphors)
+
+    def __getitem__(self, arc):
+        """ Get information about an arc.
+
+        Args:
+            arc (int): The index of an arc.
+
+        Returns:
+            A 3-tuple consisting of the features of the arc (a numpy array),
+            its costs and whether predicting the arc is consistent with the
+            gold annotation.
+        """
+        return (self.features[self.arc_offsets[arc]:self.arc_offsets[arc+1]],
+                self.costs[arc],
+                self.consistency[arc])
+
+    def mention_pair(self, arc):
+        """ Get the mentions connected by an arc.
+
+        Args:
+            arc (int): The index of an arc.
+
+        Returns:
+            (Mention, Mention): The anaphor and the antecedent of the arc.
+        """
+        doc = self.documents[
+            numpy.searchsorted(self.document_offsets, arc, side="right") - 1]
+
+        return (doc.system_mentions[self.anaphors[arc]],
+                doc.system_mentions[self.antecedents[arc]])
+
+    def mention_pairs(self, arcs):
+        """ Replace arc indices in a nested list by mention pairs.
+
+        Args:
+            arcs (list(list(int))): A nested list of arc indices, as for
+                example output by ``Perceptron.predict``.
+
+        Returns:
+            list(list((Mention, Mention))): The nested list with each arc index
+            replaced by the corresponding (anaphor, antecedent) pair.
+        """
+        flat = numpy.array([arc for substructure in arcs
+                            for arc in substructure], dtype=numpy.int64)
+        docs = numpy.searchsorted(self.document_offsets, flat,
+                                  side="right") - 1
+
+        pairs = iter([
+            (self.documents[doc].system_mentions[anaphor],
+             self.documents[doc].system_mentions[antecedent])
+            for doc, anaphor, antecedent in zip(
+                docs.tolist(), self.anaphors[flat].tolist(),
+                self.antecedents[flat].tolist())])
+
+        return [[next(pairs) for _ in substructure] for substructure in arcs]
+
+    def arc_features(self, arcs):
+        """ Get the features of several arcs.
+
+        Args:
+            arcs (numpy.array): The indices of the arcs.
+
+        Returns:
+            A tuple consisting of the features of the arcs in one array, and
+            the offsets of the features of each arc in this array (length:
+            ``len(arcs) + 1``).
+        """
+        arcs = numpy.asarray(arcs, dtype=numpy.int64)
+        starts = self.arc_offsets[arcs]
+        lengths = self.arc_offsets[arcs + 1] - starts
+
+        offsets = numpy.zeros(len(arcs) + 1, dtype=numpy.int64)
+        numpy.cumsum(lengths, out=offsets[1:])
+
+        positions = numpy.arange(offsets[-1]) + \
+            numpy.repeat(starts - offsets[:-1], lengths)
+
+        return self.features[positions], offsets
+
+    def sum_weights(self, weights, arcs=None):
+        """ Sum weights over the features of arcs.
+
+        Arcs with the same number of features are summed as the rows of one
+        matrix. Hence the sum for each arc is computed in the same way (and
+        yields the same floating point number) as
+        ``weights.take(self[arc][0]).sum()``.
+
+        Args:
+            weights (numpy.array): A weight for each feature, or a matrix
+                with one row of weights for each label (see
+                ``LabelWeights``).
+            arcs (numpy.array): The indices of the arcs. Defaults to None,
+                which means that all arcs in the store are considered.
+
+        Returns:
+            numpy.array: For each arc in ``arcs``, the sum of the weights of
+            its features. Features occurring several times in an arc are
+            counted several times. For a matrix of weights, a matrix with
+            the sums for each row of ``weights``.
+        """
+        if arcs is None:
+            arcs = numpy.arange(len(self), dtype=numpy.int64)
+
+        sums = numpy.zeros(weights.shape[:-1] + (len(arcs),),
+                           dtype=weights.dtype)
+
+        for chunk in range(0, len(arcs), _SUM_CHUNK_SIZE):
+            chunk_arcs = numpy.asarray(arcs[chunk:chunk + _SUM_CHUNK_SIZE],
+                                       dtype=numpy.int64)
+            starts = self.arc_offsets[chunk_arcs]
+            lengths = self.arc_offsets[chunk_arcs + 1] - starts
+
+            by_length = numpy.argsort(lengths, kind="stable")
+            sorted_lengths = lengths[by_length]
+            boundaries = numpy.flatnonzero(numpy.diff(sorted_lengths)) + 1
+
+            for group in numpy.split(by_length, boundaries):
+                length = lengths[group[0]]
+
+                if length == 0:
+                    continue
+
+                positions = starts[group, numpy.newaxis] + numpy.arange(length)
+                sums[..., chunk + group] = weights.take(
+                    self.features[positions], axis=-1).sum(axis=-1)
+
+        return sums
+
+    def select_templates(self, templates):
+        """ Restrict the features of all arcs to a subset of the templates.
+
+        Args:
+            templates (list(int)): The ids of the templates to keep (see
+                ``cort.coreference.feature_templates``).
+
+        Returns:
+            InstanceStore: A store with the same arcs and substructures, but
+            only containing the features of ``templates``. The arrays
+            describing the arcs are shared with this store.
+
+        Raises:
+            ValueError: If the templates of the features were not stored
+                during extraction.
+        """
+        if len(self.feature_templates) != len(self.features):
+            raise ValueError("The templates of the features were not stored "
+                             "during extraction.")
+
+        keep = numpy.isin(self.feature_templates, templates)
+
+        # the number of features kept before each position
+        kept_before = numpy.concatenate([[0], numpy.cumsum(keep)])
+
+        return InstanceStore(self.documents,
+                             self.features[keep],
+                             kept_before[self.arc_offsets],
+                             self.substructure_offsets,
+                             self.document_offsets,
+                             self.anaphors,
+                             self.antecedents,
+                             self.costs,
+                             self.consistency,
+                             self.feature_templates[keep])
+
+    def to_arc_information(self):
+        """ Convert the store to the representation via nested lists and a
+        dict.
+
+        Returns:
+            A tuple consisting of
+
+                - **substructures** (*list(list((Mention, Mention)))*): The
+                  search space for the substructures, defined by a nested
+                  list.
+                - **arc_information** (*dict((Mention, Mention),
+                  (numpy.array, int, bool))*): A mapping of arcs to their
+                  features, costs and consistency information.
+        """
+        substructures = []
+        arc_information = {}
+
+        for substructure in self.substructures:
+            struct = []
+
+            for arc in substructure:
+                pair = self.mention_pair(arc)
+                struct.append(pair)
+
+                features, costs, consistency = self[arc]
+                arc_information[pair] = (features.copy(), int(costs),
+                                         bool(consistency))
+
+            substructures.append(struct)
+
+        return substructures, arc_information
+
+
+class InstanceStoreWriter:
+    """ Write instances extracted from individual documents to disk.
+
+    The arrays of the store are appended to one file each, hence only the
+    instances of one document need to be kept in memory during extraction.
+    After closing the writer, the instances are accessed via a memory-mapped
+    ``InstanceStore``.
+
+    Attributes:
+        directory (str): The directory the arrays are written to.
+        documents (list(CoNLLDocument)): The documents written so far.
+    """
+    def __init__(self, directory):
+        """ Initialize the writer.
+
+        Args:
+            directory (str): The directory the arrays are written to. It is
+                created if it does not exist. Existing stores in the
+                directory are overwritten.
+        """
+        self.directory = directory
+        self.documents = []
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.__files = {name: open(os.path.join(directory, name + ".bin"),
+                                   "wb")
+                        for name, _ in FIELDS}
+
+        for name in _OFFSETS:
+            numpy.zeros(1, dtype=numpy.int64).tofile(self.__files[name])
+
+        self.__feature_offset = 0
+        self.__arc_offset = 0
+
+    def append(self, document, result):
+        """ Write the instances extracted from a document.
+
+        Args:
+            document (CoNLLDocument): The document.
+            result (tuple): The tuple ``(anaphors, antecedents, features,
+                costs, consistency, feature_mapping, substructures_mapping,
+                feature_templates)`` of arrays computed by
+                ``InstanceExtractor``.
+        """
+        arrays = _document_arrays(result)
+
+        for name, dtype in FIELDS:
+            values = arrays[name]
+
+            if name == "arc_offsets":
+                values = values[1:] + self.__feature_offset
+            elif name in _OFFSETS:
+                values = values[1:] + self.__arc_offset
+
+            values.astype(dtype, copy=False).tofile(self.__files[name])
+
+        self.__feature_offset += len(arrays["features"])
+        self.__arc_offset += len(arrays["anaphors"])
+        self.documents.append(document)
+
+    def close(self):
+        """ Finish writing.
+
+        Returns:
+            InstanceStore: The memory-mapped store containing all instances
+            written.
+        """
+        for written in self.__files.values():
+            written.close()
+
+        return InstanceStore.load(self.directory, self.documents)
+
+
+def _document_arrays(result):
+    # the arrays of a store for the instances of one document, as views of the
+    # extracted arrays
+    (anaphors, antecedents, features, costs, consistency,
+     feature_mapping, substructures_mapping, feature_templates) = result
+
+    anaphors = numpy.frombuffer(anaphors, dtype=numpy.uint32)
+
+    return {
+        "features": numpy.frombuffer(features, dtype=numpy.uint32),
+        "arc_offsets": numpy.frombuffer(
+            feature_mapping, dtype=numpy.dtype('l')).astype(numpy.int64,
+                                                            copy=False),
+        "substructure_offsets": numpy.frombuffer(
+            substructures_mapping, dtype=numpy.dtype('l')).astype(
+                numpy.int64, copy=False),
+        "document_offsets": numpy.array([0, len(anaphors)],
+                                        dtype=numpy.int64),
+        "anaphors": anaphors,
+        "antecedents": numpy.frombuffer(antecedents, dtype=numpy.uint32),
+        "costs": numpy.frombuffer(costs, dtype=numpy.uint32).view(
+            numpy.int32),
+        "consistency": numpy.frombuffer(consistency, dtype=numpy.uint8).view(
+            bool),
+        "feature_templates": numpy.frombuffer(feature_templates,
+                                              dtype=numpy.uint16),
+    }
+
+
+class SubstructureView:
+    """ A read-only sequence of substructures, each represented as a range of
+    arc indices.
+
+    Attributes:
+        offsets (numpy.array): Offsets of the arcs of each substructure.
+    """
+    def __init__(self, offsets):
+        """ Initialize the view from substructure offsets.
+
+        Args:
+            offsets (numpy.array): Offsets of the arcs of each substructure.
+        """
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+
+        if not 0 <= i < len(self):
+            raise IndexError("substructure index out of range")
+
+        return range(int(self.offsets[i]), int(self.offsets[i+1]))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,129 @@
+""" Store the weight vectors of all labels of a perceptron in one matrix.
+
+A ``Perceptron`` has a weight vector over the space of hashed features for
+each label of the arcs in its graphs (see ``Perceptron.get_labels``).
+Keeping these vectors in a dict of separate arrays means that scoring an arc
+under every label needs a separate gather and sum for each label.
+
+``LabelWeights`` stores the weight vectors as the rows of one matrix, with
+one row per label. Hence the weights of the features of an arc (or of a
+batch of arcs) under all labels are gathered and summed in one operation.
+For compatibility, ``LabelWeights`` behaves like the dict mapping labels to
+weight vectors: ``weights[label]`` is a view of the row of the label, hence
+updates such as ``weights[label][features] += 1`` change the matrix.
+"""
+
+from collections.abc import MutableMapping
+
+
+import numpy
+
+
+__author__ = 'smartschat'
+
+
+class LabelWeights(MutableMapping):
+    """ A matrix of weights, with one row for each label.
+
+    Attributes:
+        labels (list(str)): The labels, in the order of the rows.
+        matrix (numpy.array): The weights, with one row for each label and
+            one column for each feature.
+    """
+    def __init__(self, labels, n_features=2**24, matrix=None):
+        """ Initialize the weights.
+
+        Args:
+            labels (list(str)): The labels.
+            n_features (int): The number of features. Defaults to 2^24.
+            matrix (numpy.array): The weights, one row for each label.
+                Defaults to None, which means that all weights are 0.
+        """
+        self.labels = list(labels)
+
+        if matrix is None:
+            matrix = numpy.zeros((len(self.labels), n_features), dtype=float)
+
+        self.matrix = matrix
+
+        self.__rows = {label: i for i, label in enumerate(self.labels)}
+
+    @staticmethod
+    def from_dict(weights):
+        """ Stack weight vectors into a matrix.
+
+        Args:
+            weights (dict(str, numpy.array)): A mapping of labels to weight
+                vectors of the same size.
+
+        Returns:
+            LabelWeights: The weights, with the labels in the order of
+            ``weights``.
+        """
+        labels = list(weights)
+
+        return LabelWeights(labels, matrix=numpy.array(
+            [weights[label] for label in labels], dtype=float))
+
+    def rows(self, labels):
+        """ Get the rows of labels.
+
+        Args:
+            labels (list(str)): The labels.
+
+        Returns:
+            numpy.array: The index of the row of each label.
+        """
+        return numpy.array([self.__rows[label] for label in labels],
+                           dtype=numpy.int64)
+
+    def sum(self, features, labels=None):
+        """ Sum the weights of features under several labels.
+
+        For each label, the sum is the same floating point number as
+        ``self[label].take(features).sum()``.
+
+        Args:
+            features (numpy.array): The features.
+            labels (list(str)): The labels. Defaults to None, which means
+                that all labels are considered, in the order of
+                ``self.labels``.
+
+        Returns:
+            numpy.array: For each label, the sum of the weights of the
+            features.
+        """
+        # the gathered weights must be contiguous for each label to sum them
+        # in the same order as a single weight vector
+        if labels is None or labels == self.labels:
+            return self.matrix.take(features, axis=1).sum(axis=1)
+
+        return numpy.ascontiguousarray(
+            self.matrix[numpy.ix_(self.rows(labels), features)]).sum(axis=1)
+
+    def __getitem__(self, label):
+        return self.matrix[self.__rows[label]]
+
+    def __setitem__(self, label, weights):
+        if label not in self.__rows:
+            self.__rows[label] = len(self.labels)
+            self.labels.append(label)
+            self.matrix = numpy.vstack([self.matrix, [weights]])
+        else:
+            self.matrix[self.__rows[label]] = weights
+
+    def __delitem__(self, label):
+        row = self.__rows[label]
+
+        self.matrix = numpy.delete(self.matrix, row, axis=0)
+        del self.labels[row]
+        self.__rows = {label: i for i, label in enumerate(self.labels)}
+
+    def __iter__(self):
+        return iter(self.labels)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, label):
+        return label in self.__rows
@@ -0,0 +1,150 @@
+""" Save and load learned models.
+
+A model learned by a ``Perceptron`` consists of a prior for each label and a
+weight vector for each label over the space of hashed features (see
+``Perceptron.fit``). ``cort-train`` used to pickle the tuple
+``(priors, weights)``, which stores all 2^24 weights per label although most
+of them are zero, and needs to be read completely before predicting.
+
+This module stores a model as a directory instead. The file ``model.json``
+contains the labels, the priors, the size of the weight vectors and the
+layout of the weights, which is one of
+
+    - "dense": for each label, the weight vector is stored as a ``.npy`` file,
+      which is memory-mapped when the model is loaded. Hence loading is
+      near-instant, and processes predicting with the same model share the
+      weights via the page cache,
+    - "sparse": for each label, only the indices and values of the nonzero
+      weights are stored. This is much smaller on disk, and the weight
+      vectors are filled when the model is loaded.
+
+Weights may be stored as 32 bit floats to halve the size of the model.
+Pickled models are still read by ``load``.
+"""
+
+import json
+import os
+import pickle
+
+
+import numpy
+
+
+from cort.coreference import label_weights
+
+
+__author__ = 'smartschat'
+
+
+# bump when the layout of a model directory changes
+FORMAT_VERSION = "1"
+
+LAYOUTS = ["dense", "sparse"]
+
+
+def save(path, priors, weights, layout="sparse", dtype="float64"):
+    """ Save a model to a directory.
+
+    Args:
+        path (str): The directory. It is created if it does not exist.
+        priors (dict(str, float)): A mapping of graph labels to priors.
+        weights (dict(str, numpy.array)): A mapping of graph labels to weight
+            vectors.
+        layout (str): How weights are stored, either "dense" or "sparse"
+            (see the module documentation). Defaults to "sparse".
+        dtype (str): The type of the stored weights, either "float64" or
+            "float32". Defaults to "float64".
+
+    Raises:
+        ValueError: If ``layout`` or ``dtype`` is not supported.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError("Unknown layout: " + str(layout))
+
+    if dtype not in ["float64", "float32"]:
+        raise ValueError("Unknown type of weights: " + str(dtype))
+
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    labels = sorted(weights)
+
+    for i, label in enumerate(labels):
+        label_weights = numpy.asarray(weights[label])
+
+        if layout == "dense":
+            numpy.save(os.path.join(path, "weights." + str(i) + ".npy"),
+                       label_weights.astype(dtype, copy=False))
+        else:
+            indices = numpy.flatnonzero(label_weights)
+            numpy.save(os.path.join(path, "indices." + str(i) + ".npy"),
+                       indices.astype(numpy.uint32))
+            numpy.save(os.path.join(path, "values." + str(i) + ".npy"),
+                       label_weights[indices].astype(dtype))
+
+    description = {
+        "format_version": FORMAT_VERSION,
+        "layout": layout,
+        "dtype": dtype,
+        "size": int(len(weights[labels[0]])) if labels else 0,
+        "labels": labels,
+        "priors": {label: float(priors[label]) for label in priors},
+    }
+
+    with open(os.path.join(path, "model.json"), "w") as model_file:
+        json.dump(description, model_file, indent=2, sort_keys=True)
+
+
+def load(path):
+    """ Load a model.
+
+    Args:
+        path (str): A directory written by ``save``, or a file containing a
+            pickled tuple ``(priors, weights)``.
+
+    Returns:
+        A tuple consisting of the priors (a ``defaultdict`` mapping graph
+        labels to priors) and the weights (a mapping of graph labels to
+        weight vectors) of the model. Dense weights are memory-mapped
+        copy-on-write, hence modifying them does not change the model on
+        disk. Sparse weights are filled into a ``LabelWeights`` matrix.
+
+    Raises:
+        ValueError: If the model directory was written by an incompatible
+            version of this module.
+    """
+    from collections import defaultdict
+
+    if not os.path.isdir(path):
+        with open(path, "rb") as model_file:
+            return pickle.load(model_file)
+
+    with open(os.path.join(path, "model.json")) as model_file:
+        description = json.load(model_file)
+
+    if description["format_version"] != FORMAT_VERSION:
+        raise ValueError("Unsupported model format version: " +
+                         str(description["format_version"]))
+
+    priors = defaultdict(float)
+    priors.update(description["priors"])
+
+    labels = description["labels"]
+
+    if description["layout"] == "dense":
+        weights = {}
+
+        for i, label in enumerate(labels):
+            weights[label] = numpy.load(
+                os.path.join(path, "weights." + str(i) + ".npy"),
+                mmap_mode="c")
+    else:
+        weights = label_weights.LabelWeights(labels, matrix=numpy.zeros(
+            (len(labels), description["size"]), dtype=description["dtype"]))
+
+        for i, label in enumerate(labels):
+            weights[label][numpy.load(
+                os.path.join(path, "indices." + str(i) + ".npy"))] = \
+                numpy.load(os.path.join(path, "values." + str(i) + ".npy"))
+
+    return priors, weights
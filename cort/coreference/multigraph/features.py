@@ -3,6 +3,8 @@ import re
 from cort.core import external_data
 from cort.core import spans
 from cort.core import util
+from cort.coreference import blocking
+from cort.coreference import speakers
 
 
 __author__ = 'smartschat'
@@ -71,6 +73,11 @@ def lexical(anaphor, antecedent):
         or (anaphor.attributes["type"] == "NOM"
             and anaphor.attributes["fine_type"] == "DEF"
             and antecedent.attributes["type"] in ["NAM", "NOM"])):
+        index = blocking.lookup(anaphor, antecedent)
+
+        if index is not None:
+            return index.match("lexical", anaphor, antecedent)
+
         return lexical_data.look_up(anaphor, antecedent)
 
 
@@ -79,6 +86,11 @@ def non_pronominal_string_match(anaphor, antecedent):
         return False
     elif antecedent.attributes["type"] in ["PRO", "DEM", "VRB"]:
         return False
+
+    index = blocking.lookup(anaphor, antecedent)
+
+    if index is not None:
+        return index.match("cleaned", anaphor, antecedent)
     else:
         return (" ".join(util.clean_via_pos(anaphor.attributes["tokens"],
                                             anaphor.attributes["pos"])).lower()
@@ -95,10 +107,16 @@ def head_match(anaphor, antecedent):
     elif (anaphor.attributes["semantic_class"] == "NUMERIC" or
           antecedent.attributes["semantic_class"] == "NUMERIC"):
         return False
+    elif anaphor.attributes["head"] == ["and"]:
+        return False
+
+    index = blocking.lookup(anaphor, antecedent)
+
+    if index is not None:
+        return index.match("head", anaphor, antecedent)
     else:
-        return (anaphor.attributes["head"] != ["and"] and
-                (" ".join(anaphor.attributes["head"]).lower()
-                 == " ".join(antecedent.attributes["head"]).lower()))
+        return (" ".join(anaphor.attributes["head"]).lower() ==
+                " ".join(antecedent.attributes["head"]).lower())
 
 
 def substring(anaphor, antecedent):
@@ -149,14 +167,28 @@ def speaker(anaphor, antecedent):
               or antecedent.attributes["type"] == "PRO"):
             if (anaphor.attributes["type"] == "PRO"
                     and anaphor.attributes["citation_form"] == "i"):
-                return (speaker_anaphor.replace("_", " ").lower() in
-                        [" ".join(antecedent.attributes["tokens"]).lower(),
-                         " ".join(antecedent.attributes["head"]).lower()])
+                return __is_speaker(antecedent, anaphor)
             elif (antecedent.attributes["type"] == "PRO"
                     and antecedent.attributes["citation_form"] == "i"):
-                return (speaker_antecedent.replace("_", " ").lower() in
-                        [" ".join(anaphor.attributes["tokens"]).lower(),
-                         " ".join(anaphor.attributes["head"]).lower()])
+                return __is_speaker(anaphor, antecedent)
+
+
+def __is_speaker(mention, pronoun):
+    # whether the string or the head of mention is the speaker of pronoun
+    if pronoun.document:
+        normalized = speakers.for_document(pronoun.document).normalize(
+            pronoun.attributes["speaker"])
+    else:
+        normalized = pronoun.attributes["speaker"].replace("_", " ").lower()
+
+    attributes = mention.attributes
+
+    if "tokens_as_lowercase_string" in attributes:
+        return normalized in [attributes["tokens_as_lowercase_string"],
+                              attributes["head_as_lowercase_string"]]
+
+    return normalized in [" ".join(attributes["tokens"]).lower(),
+                          " ".join(attributes["head"]).lower()]
 
 
 def nothing_between(anaphor, antecedent):
@@ -170,14 +202,8 @@ def nothing_between(anaphor, antecedent):
         start = antecedent.span.begin
         end = anaphor.span.end
 
-    speakers = anaphor.document.speakers[start:end+1]
-
-    allowed_speakers = [speakers[0], speakers[-1]]
-    for particular_speaker in speakers:
-        if particular_speaker not in allowed_speakers:
-            return False
-
-    return True
+    return speakers.for_document(anaphor.document).only_two_speakers(start,
+                                                                     end)
 
 
 def not_anaphoric(anaphor, antecedent):
@@ -284,6 +310,11 @@ def alias(anaphor, antecedent):
     elif (" ".join(anaphor.attributes["head"]).lower()
           == " ".join(antecedent.attributes["head"]).lower()):
         return False
+
+    index = blocking.lookup(anaphor, antecedent)
+
+    if index is not None and not index.match("alias", anaphor, antecedent):
+        return False
     else:
         anaphor_cleaned_tokens = anaphor.attributes["head"]
         antecedent_cleaned_tokens = antecedent.attributes["head"]
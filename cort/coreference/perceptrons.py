@@ -6,14 +6,132 @@ from __future__ import division
 
 from collections import defaultdict
 import logging
+import multiprocessing
 
 
 import numpy
 
 
+from cort.coreference import label_weights
+from cort.util import multiprocessing as cort_multiprocessing
+
+
 __author__ = 'smartschat'
 
 
+# state inherited by forked worker processes, see Perceptron.fit_parallel
+_shared = {}
+
+
+def _fit_shard(task):
+    """ Train on one shard of the data for one round of iterative parameter
+    mixing.
+
+    The perceptron, the data and the mixed weights are taken from
+    ``_shared``. The worker trains on a private copy of the mixed weights.
+
+    Args:
+        task (tuple): The indices of the substructures of the shard, in the
+            order they are visited, and the mixed priors.
+
+    Returns:
+        A tuple consisting of the number of updates, the number of
+        substructures visited, the priors after training, the accumulated
+        updates of the priors, and for each label a tuple of
+
+            - the indices of the weights changed by training,
+            - the change of these weights,
+            - the accumulated updates of these weights (see ``Perceptron``).
+    """
+    indices, priors = task
+
+    perceptron = _shared["perceptron"]
+    substructures, arc_information = _shared["data"]
+    mixed = _shared["weights"]
+
+    # allocated once per worker process
+    if "local_weights" not in _shared:
+        _shared["local_weights"] = label_weights.LabelWeights(
+            mixed.labels, matrix=numpy.empty_like(mixed.matrix))
+        _shared["local_cached_weights"] = {
+            label: numpy.empty_like(mixed[label]) for label in mixed}
+
+    weights = _shared["local_weights"]
+    cached_weights = _shared["local_cached_weights"]
+
+    for label in mixed:
+        numpy.copyto(weights[label], mixed[label])
+        cached_weights[label].fill(0)
+
+    perceptron.weights = weights
+    perceptron.priors = defaultdict(float, priors)
+    cached_priors = defaultdict(float)
+
+    incorrect, visited = perceptron._fit_substructures(
+        indices, substructures, arc_information, 0, cached_priors,
+        cached_weights)
+
+    changes = {}
+
+    for label in mixed:
+        changed = numpy.flatnonzero((weights[label] != mixed[label]) |
+                                    (cached_weights[label] != 0))
+        changes[label] = (changed,
+                          weights[label][changed] - mixed[label][changed],
+                          cached_weights[label][changed])
+
+    return (incorrect, visited, dict(perceptron.priors), dict(cached_priors),
+            changes)
+
+
+class _BestEpoch:
+    """ Keep track of the best model seen after an epoch of training.
+
+    Attributes:
+        evaluate (function): A function scoring a model given by its priors
+            and weights, or None if models are not evaluated.
+        patience (int): The number of epochs without improvement after which
+            training stops, or None.
+        epoch (int): The epoch of the best model.
+        score (float): The score of the best model.
+        priors (dict(str, float)): The priors of the best model.
+        weights (dict(str, numpy.array)): The weights of the best model.
+    """
+    def __init__(self, evaluate, patience):
+        self.evaluate = evaluate
+        self.patience = patience
+        self.epoch = None
+        self.score = None
+        self.priors = None
+        self.weights = None
+
+    def update(self, epoch, priors, weights):
+        """ Evaluate the model after an epoch.
+
+        Args:
+            epoch (int): The epoch.
+            priors (dict(str, float)): The priors of the model.
+            weights (dict(str, numpy.array)): The weights of the model.
+
+        Returns:
+            bool: Whether training should stop.
+        """
+        score = self.evaluate(priors, weights)
+
+        if self.score is None or score > self.score:
+            self.epoch = epoch
+            self.score = score
+            self.priors = priors
+            self.weights = weights
+
+        logging.info("\tScore: " + str(score) + " (best: " +
+                     str(self.score) + " after epoch " + str(self.epoch) +
+                     ")")
+
+        return (self.patience is not None and
+                epoch - self.epoch >= self.patience)
+
+
 class Perceptron:
     """ Provide a latent structured perceptron.
 
@@ -74,29 +192,53 @@ class Perceptron:
             self.priors = priors
 
         if weights is None:
-            self.weights = {}
-
-            for label in labels:
-                self.weights[label] = numpy.zeros(2**24, dtype=float)
+            self.weights = label_weights.LabelWeights(labels, 2**24)
         else:
             self.weights = weights
 
-    def fit(self, substructures, arc_information):
+    def fit(self, substructures, arc_information=None, evaluate=None,
+            patience=None, checkpoints=None):
         """Learn weights from data.
 
         Besides returning the learned model, also
         set the corresponding attributes ``self.priors``and ``self.weights``.
 
+        If ``evaluate`` is given, the averaged model after each epoch is
+        evaluated, for example on development data. Training stops early if
+        the score did not improve for ``patience`` epochs, and the model of
+        the epoch with the best score is kept.
+
+        If ``checkpoints`` is given, the state of training is saved after
+        each epoch, and training resumes from the most recent checkpoint if
+        ``checkpoints.resume`` is set. Resumed training yields the same model
+        as uninterrupted training. To continue training an existing model
+        (for example on additional data), initialize the perceptron with
+        the priors and weights of the model.
+
         Args:
-            substructures (list(list((Mention, Mention)))): The search space
-                for the substructures, defined by a nested list. The ith list
-                contains the search space for the ith substructure.
+            substructures (list(list((Mention, Mention))) or InstanceStore):
+                The search space for the substructures, defined by a nested
+                list. The ith list contains the search space for the ith
+                substructure. If an ``InstanceStore`` is given,
+                ``arc_information`` is taken from the store.
             arc_information (dict((Mention, Mention), (numpy.array, int,
                 bool)): A mapping of arcs (= mention pairs) to information
                 about these arcs. The information consists of the features
                 (represented as an int array via feature hashing), the costs
                 for the arc, and whether predicting the arc to be coreferent is
-                consistent with the gold annotation).
+                consistent with the gold annotation). Defaults to None, which
+                is only allowed if ``substructures`` is an ``InstanceStore``.
+            evaluate (function: (dict(str, float), dict(str, numpy.array)) ->
+                float): A function scoring a model given by its priors and
+                weights. Higher scores are better. Defaults to None, which
+                means that the model after the last epoch is kept.
+            patience (int): The number of epochs without improvement of the
+                score after which training stops. Defaults to None, which
+                means that all ``self.n_iter`` epochs are run.
+            checkpoints (Checkpoints): The checkpoints to save the state of
+                training to after each epoch (see
+                ``cort.coreference.checkpoints``). Defaults to None, which
+                means that no checkpoints are saved.
 
         Returns:
             A tuple describing the learned model, consisting of
@@ -110,49 +252,327 @@ class Perceptron:
                   If the graphs employed are not labeled, ``l`` is set to "+".
         """
 
+        if arc_information is None:
+            substructures, arc_information = \
+                substructures.substructures, substructures
+
         indices = list(range(0, len(substructures)))
         numpy.random.seed(self.random_seed)
 
+        def epoch_order():
+            numpy.random.shuffle(indices)
+
+            yield indices, substructures, arc_information
+
+        return self.__fit(epoch_order, _BestEpoch(evaluate, patience),
+                          checkpoints, [indices],
+                          {"method": "fit",
+                           "seed": self.random_seed,
+                           "substructures": len(substructures)})
+
+    def fit_shards(self, shards, block_size=1000, evaluate=None,
+                   patience=None, checkpoints=None):
+        """Learn weights from instances stored in several shards.
+
+        In contrast to ``fit``, substructures are not visited in a random
+        order over the whole data. Instead, in each epoch, the order of the
+        shards is shuffled, each shard is split into blocks of consecutive
+        substructures, and the order of the blocks in the shard is shuffled.
+        The substructures in a block are visited in order. If the shards are
+        memory-mapped (see ``InstanceExtractor.extract_shards``), they are
+        hence read almost sequentially, and training data larger than the
+        available memory can be used.
+
+        Besides returning the learned model, also
+        set the corresponding attributes ``self.priors``and ``self.weights``.
+
+        Args:
+            shards (list(InstanceStore)): The shards.
+            block_size (int): The number of consecutive substructures visited
+                in order. Defaults to 1000.
+            evaluate (function): A function scoring the model after each
+                epoch (see ``fit``). Defaults to None.
+            patience (int): The number of epochs without improvement after
+                which training stops (see ``fit``). Defaults to None.
+            checkpoints (Checkpoints): The checkpoints to save the state of
+                training to after each epoch (see ``fit``). Defaults to None.
+
+        Returns:
+            A tuple describing the learned model, as returned by ``fit``.
+        """
+        shard_order = list(range(len(shards)))
+        blocks = [list(range(0, len(shard.substructures), block_size))
+                  for shard in shards]
+        numpy.random.seed(self.random_seed)
+
+        def epoch_order():
+            numpy.random.shuffle(shard_order)
+
+            for shard in shard_order:
+                substructures = shards[shard].substructures
+                numpy.random.shuffle(blocks[shard])
+
+                for begin in blocks[shard]:
+                    yield (range(begin, min(begin + block_size,
+                                            len(substructures))),
+                           substructures,
+                           shards[shard])
+
+        return self.__fit(epoch_order, _BestEpoch(evaluate, patience),
+                          checkpoints, [shard_order] + blocks,
+                          {"method": "fit_shards",
+                           "seed": self.random_seed,
+                           "substructures": [len(shard.substructures)
+                                             for shard in shards],
+                           "block_size": block_size})
+
+    def fit_parallel(self, substructures, arc_information=None,
+                     n_shards=None, evaluate=None, patience=None,
+                     checkpoints=None):
+        """Learn weights from data with several processes.
+
+        This implements iterative parameter mixing (McDonald et al., 2010).
+        In each epoch, the substructures are shuffled as in ``fit`` and split
+        into ``n_shards`` shards of consecutive substructures. For each
+        shard, a worker process trains on the shard for one epoch, starting
+        from the current weights. Then the weights of the workers are
+        mixed: the new weights are the average of the workers' weights,
+        weighted by the sizes of the shards. The current weights are kept in
+        shared memory, such that the worker processes only send back the
+        weights they changed.
+
+        The learned model is the average of the weights after each
+        substructure visited by any worker. For a given seed and number of
+        shards, learning is deterministic. With one shard, the model is the
+        model learned by ``fit`` (up to rounding).
+
+        Besides returning the learned model, also
+        set the corresponding attributes ``self.priors``and ``self.weights``.
+
+        Args:
+            substructures (list(list((Mention, Mention))) or InstanceStore):
+                The search space for the substructures (see ``fit``).
+            arc_information (dict((Mention, Mention), (numpy.array, int,
+                bool)): Information about the arcs (see ``fit``). Defaults
+                to None, which is only allowed if ``substructures`` is an
+                ``InstanceStore``.
+            n_shards (int): The number of shards trained in parallel.
+                Defaults to None, which means that the number of CPUs is
+                used.
+            evaluate (function): A function scoring the model after each
+                epoch (see ``fit``). Defaults to None.
+            patience (int): The number of epochs without improvement after
+                which training stops (see ``fit``). Defaults to None.
+            checkpoints (Checkpoints): The checkpoints to save the state of
+                training to after each epoch (see ``fit``). Defaults to None.
+
+        Returns:
+            A tuple describing the learned model, as returned by ``fit``.
+
+        Reference:
+
+            - Ryan McDonald, Keith Hall, and Gideon Mann. 2010. Distributed
+              training strategies for the structured perceptron. In *Proc.
+              of NAACL-HLT 2010*, pages 456–464.
+              http://www.aclweb.org/anthology/N10-1069
+        """
+        if arc_information is None:
+            substructures, arc_information = \
+                substructures.substructures, substructures
+
+        if n_shards is None:
+            n_shards = multiprocessing.cpu_count()
+
+        forked = cort_multiprocessing.supports_fork() and n_shards > 1
+
+        block = None
+
+        if forked:
+            from multiprocessing import shared_memory
+
+            block = shared_memory.SharedMemory(
+                create=True,
+                size=sum(self.weights[label].nbytes for label in self.priors))
+
+        try:
+            labels = list(self.priors)
+            shape = (len(labels), len(self.weights[labels[0]]))
+
+            if forked:
+                matrix = numpy.ndarray(shape, dtype=float, buffer=block.buf)
+            else:
+                matrix = numpy.empty(shape, dtype=float)
+
+            mixed = label_weights.LabelWeights(labels, matrix=matrix)
+
+            for label in labels:
+                mixed[label] = self.weights[label]
+
+            _shared["perceptron"] = self
+            _shared["data"] = (substructures, arc_information)
+            _shared["weights"] = mixed
+
+            if forked:
+                pool = multiprocessing.get_context("fork").Pool(
+                    min(n_shards, multiprocessing.cpu_count()))
+                shard_map = pool.map
+            else:
+                pool = None
+                shard_map = map
+
+            try:
+                self.__fit_mixed(substructures, mixed, n_shards, shard_map,
+                                 _BestEpoch(evaluate, patience),
+                                 checkpoints)
+            finally:
+                if pool is not None:
+                    pool.terminate()
+                    pool.join()
+        finally:
+            _shared.clear()
+            mixed = None
+
+            if block is not None:
+                block.close()
+                block.unlink()
+
+        return self.priors, self.weights
+
+    def __fit_mixed(self, substructures, mixed, n_shards, shard_map,
+                    best_epoch, checkpoints):
+        priors = dict(self.priors)
+
+        # for averaging: the sum of the weights after each substructure is
+        # counter * (final weights) + cached
+        cached_priors = defaultdict(float)
+        cached_weights = {label: numpy.zeros(mixed[label].shape, float)
+                          for label in mixed}
+        indices = list(range(0, len(substructures)))
+        numpy.random.seed(self.random_seed)
+
+        checkpoint_state = (priors, mixed, cached_priors, cached_weights,
+                            [indices], best_epoch,
+                            {"method": "fit_parallel",
+                             "seed": self.random_seed,
+                             "substructures": len(substructures),
+                             "shards": n_shards})
+
+        resumed_epoch, counter, last_epoch = self.__load_checkpoint(
+            checkpoints, *checkpoint_state)
+
+        for epoch in range(resumed_epoch + 1, last_epoch + 1):
+            numpy.random.shuffle(indices)
+
+            results = list(shard_map(
+                _fit_shard,
+                [(shard, priors) for shard in
+                 numpy.array_split(numpy.array(indices, dtype=numpy.int64),
+                                   n_shards)]))
+
+            visited = sum(result[1] for result in results)
+
+            if visited == 0:
+                continue
+
+            counter += visited
+
+            # the sum of the weights after each substructure of a shard is
+            # the number of substructures times the weights after training,
+            # minus the accumulated updates. Mixing changes the weights for
+            # all substructures visited so far.
+            for label in mixed:
+                prior = priors[label]
+
+                for _, shard_visited, shard_priors, shard_cached_priors, \
+                        changes in results:
+                    changed, difference, shard_cached = changes[label]
+                    share = shard_visited / visited
+
+                    priors[label] += share * (shard_priors[label] - prior)
+                    cached_priors[label] += \
+                        (shard_visited - counter * share) * \
+                        (shard_priors[label] - prior) - \
+                        shard_cached_priors.get(label, 0)
+
+                    mixed[label][changed] += share * difference
+                    cached_weights[label][changed] += \
+                        (shard_visited - counter * share) * difference - \
+                        shard_cached
+
+            logging.info("Finished epoch " + str(epoch))
+            logging.info("\tIncorrect predictions: " +
+                         str(sum(result[0] for result in results)) + "/" +
+                         str(visited))
+
+            stop = best_epoch.evaluate is not None and best_epoch.update(
+                epoch, *self.__averaged(priors, mixed, cached_priors,
+                                        cached_weights, counter, 1))
+
+            self.__save_checkpoint(checkpoints, epoch, counter, stop,
+                                   *checkpoint_state)
+
+            if stop:
+                break
+
+        self.priors = defaultdict(float)
+
+        if best_epoch.evaluate is not None:
+            self.__keep_best(best_epoch)
+        else:
+            averaged_priors, self.weights = self.__averaged(
+                priors, mixed, cached_priors, cached_weights, counter, 1)
+            self.priors.update(averaged_priors)
+
+    def __fit(self, epoch_order, best_epoch, checkpoints, order,
+              description):
+        # epoch_order is called once per epoch and yields segments of the
+        # data: indices of substructures to visit in order, together with
+        # the substructures and the arc information for their arcs. order
+        # contains the lists shuffled by epoch_order, and description
+        # identifies the setup of training in checkpoints.
         cached_priors = defaultdict(float)
         cached_weights = {}
 
         for label in self.priors:
-            cached_weights[label] = numpy.zeros(2**24, float)
+            cached_weights[label] = numpy.zeros(self.weights[label].shape,
+                                                float)
 
-        counter = 0
+        checkpoint_state = (self.priors, self.weights, cached_priors,
+                            cached_weights, order, best_epoch, description)
 
-        for epoch in range(1, self.n_iter+1):
-            numpy.random.shuffle(indices)
+        resumed_epoch, counter, last_epoch = self.__load_checkpoint(
+            checkpoints, *checkpoint_state)
 
+        for epoch in range(resumed_epoch + 1, last_epoch + 1):
             incorrect = 0
+            visited = 0
 
-            for i in indices:
-                substructure = substructures[i]
-
-                (arcs,
-                 arcs_labels,
-                 arcs_scores,
-                 cons_arcs,
-                 cons_labels,
-                 cons_scores,
-                 is_consistent) = self.argmax(substructure, arc_information)
-
-                if not is_consistent:
-                    self.__update(cons_arcs,
-                                  arcs,
-                                  cons_labels,
-                                  arcs_labels,
-                                  arc_information,
-                                  counter,
-                                  cached_priors,
-                                  cached_weights)
-                    incorrect += 1
-
-                counter += 1
+            for indices, substructures, arc_information in epoch_order():
+                segment_incorrect, counter = self._fit_substructures(
+                    indices, substructures, arc_information, counter,
+                    cached_priors, cached_weights)
+
+                incorrect += segment_incorrect
+                visited += len(indices)
 
             logging.info("Finished epoch " + str(epoch))
             logging.info("\tIncorrect predictions: " + str(incorrect) + "/" +
-                         str(len(indices)))
+                         str(visited))
+
+            stop = best_epoch.evaluate is not None and best_epoch.update(
+                epoch, *self.__averaged(self.priors, self.weights,
+                                        cached_priors, cached_weights,
+                                        counter, -1))
+
+            self.__save_checkpoint(checkpoints, epoch, counter, stop,
+                                   *checkpoint_state)
+
+            if stop:
+                break
+
+        if best_epoch.evaluate is not None:
+            self.__keep_best(best_epoch)
+            return self.priors, self.weights
 
         # averaging
         for label in self.priors:
@@ -161,20 +581,198 @@ class Perceptron:
 
         return self.priors, self.weights
 
-    def predict(self, substructures, arc_information):
+    @staticmethod
+    def __averaged(priors, weights, cached_priors, cached_weights, counter,
+                   sign):
+        # the averaged model is the current model plus (sign = 1) or minus
+        # (sign = -1) the accumulated updates divided by the counter
+        averaged_priors = {}
+        averaged_weights = label_weights.LabelWeights.from_dict(weights)
+
+        for label in weights:
+            averaged_priors[label] = priors[label]
+
+            if counter:
+                averaged_priors[label] += \
+                    sign*(1/counter)*cached_priors[label]
+                row = averaged_weights[label]
+                row += sign*(1/counter)*cached_weights[label]
+
+        return averaged_priors, averaged_weights
+
+    @staticmethod
+    def __save_checkpoint(checkpoints, epoch, counter, stopped, priors,
+                          weights, cached_priors, cached_weights, order,
+                          best_epoch, description):
+        if checkpoints is None:
+            return
+
+        random_state = numpy.random.get_state()
+
+        values = {
+            "description": description,
+            "counter": counter,
+            "stopped": stopped,
+            "priors": {label: float(priors[label]) for label in weights},
+            "cached_priors": {label: float(cached_priors[label])
+                              for label in weights},
+            "random_state": [random_state[0]] + [
+                value.item() if hasattr(value, "item") else value
+                for value in random_state[2:]],
+            "best_epoch": best_epoch.epoch,
+            "best_score": best_epoch.score,
+        }
+
+        arrays = {"random_keys": random_state[1]}
+
+        for i, indices in enumerate(order):
+            arrays["order." + str(i)] = numpy.array(indices,
+                                                    dtype=numpy.int64)
+
+        for label in weights:
+            arrays["weights." + label] = weights[label]
+            arrays["cached_weights." + label] = cached_weights[label]
+
+        if best_epoch.priors is not None:
+            values["best_priors"] = {label: float(best_epoch.priors[label])
+                                     for label in best_epoch.priors}
+
+            for label in best_epoch.weights:
+                arrays["best_weights." + label] = best_epoch.weights[label]
+
+        checkpoints.save(epoch, values, arrays)
+
+        logging.info("\tSaved checkpoint of epoch " + str(epoch) + ".")
+
+    def __load_checkpoint(self, checkpoints, priors, weights, cached_priors,
+                          cached_weights, order, best_epoch, description):
+        # restore the state of training in place from the most recent
+        # checkpoint. Returns the epoch of the checkpoint, the counter for
+        # averaging and the last epoch to train.
+        if checkpoints is None or not checkpoints.resume:
+            return 0, 0, self.n_iter
+
+        checkpoint = checkpoints.load()
+
+        if checkpoint is None:
+            return 0, 0, self.n_iter
+
+        epoch, values, arrays = checkpoint
+
+        if values["description"] != description or \
+                sorted(values["priors"]) != sorted(weights):
+            raise ValueError("The checkpoint in " + checkpoints.directory +
+                             " does not match the training setup.")
+
+        for label in weights:
+            priors[label] = values["priors"][label]
+            cached_priors[label] = values["cached_priors"][label]
+            weights[label][:] = arrays["weights." + label]
+            cached_weights[label][:] = arrays["cached_weights." + label]
+
+        for i, indices in enumerate(order):
+            indices[:] = arrays["order." + str(i)].tolist()
+
+        random_state = values["random_state"]
+        numpy.random.set_state((random_state[0], arrays["random_keys"]) +
+                               tuple(random_state[1:]))
+
+        best_epoch.epoch = values["best_epoch"]
+        best_epoch.score = values["best_score"]
+
+        if "best_priors" in values:
+            best_epoch.priors = values["best_priors"]
+            best_epoch.weights = label_weights.LabelWeights.from_dict(
+                {label: arrays["best_weights." + label]
+                 for label in values["best_priors"]})
+
+        logging.info("Resuming training after epoch " + str(epoch) + ".")
+
+        if values["stopped"]:
+            return epoch, values["counter"], epoch
+
+        return epoch, values["counter"], self.n_iter
+
+    def __keep_best(self, best_epoch):
+        logging.info("Keeping the model of epoch " + str(best_epoch.epoch) +
+                     " (score " + str(best_epoch.score) + ").")
+
+        for label in best_epoch.priors:
+            self.priors[label] = best_epoch.priors[label]
+
+        self.weights = best_epoch.weights
+
+    def _fit_substructures(self, indices, substructures, arc_information,
+                           counter, cached_priors, cached_weights):
+        """ Perform perceptron updates for a sequence of substructures.
+
+        Subclasses may override this method to provide faster training for
+        the substructures of an approach. The result of the updates must be
+        the same as when visiting the substructures one after another.
+
+        Args:
+            indices (list(int) or range): The indices of the substructures,
+                in the order they are visited.
+            substructures (list(list((Mention, Mention))) or
+                SubstructureView): The search space for all substructures.
+            arc_information (dict((Mention, Mention), (numpy.array, int,
+                bool)) or InstanceStore): Information about the arcs.
+            counter (int): The number of substructures visited before.
+            cached_priors (dict(str, float)): The accumulated updates of the
+                priors, weighted by ``counter``, for averaging.
+            cached_weights (dict(str, numpy.array)): The accumulated updates
+                of the weights, weighted by ``counter``, for averaging.
+
+        Returns:
+            A tuple consisting of the number of substructures for which an
+            update was performed, and the value of ``counter`` after visiting
+            the substructures.
+        """
+        incorrect = 0
+
+        for i in indices:
+            (arcs,
+             arcs_labels,
+             arcs_scores,
+             cons_arcs,
+             cons_labels,
+             cons_scores,
+             is_consistent) = self.argmax(substructures[i], arc_information)
+
+            if not is_consistent:
+                self.__update(cons_arcs,
+                              arcs,
+                              cons_labels,
+                              arcs_labels,
+                              arc_information,
+                              counter,
+                              cached_priors,
+                              cached_weights)
+                incorrect += 1
+
+            counter += 1
+
+        return incorrect, counter
+
+    def predict(self, substructures, arc_information=None):
         """
         Predict coreference information according to a learned model.
 
         Args:
-            substructures (list(list((Mention, Mention)))): The search space
-                for the substructures, defined by a nested list. The ith list
-                contains the search space for the ith substructure.
+            substructures (list(list((Mention, Mention))) or InstanceStore):
+                The search space for the substructures, defined by a nested
+                list. The ith list contains the search space for the ith
+                substructure. If an ``InstanceStore`` is given,
+                ``arc_information`` is taken from the store.
             arc_information (dict((Mention, Mention), (numpy.array, int,
                 bool)): A mapping of arcs (= mention pairs) to information
                 about these arcs. The information consists of the features
                 (represented as an int array via feature hashing). In contrast
                 to training, we do not need to access costs or consistency
-                information.
+                information. Defaults to None, which is only allowed if
+                ``substructures`` is an ``InstanceStore``. For an
+                ``InstanceStore``, approaches may decode all substructures at
+                once (see ``_predict_store``).
 
         Returns:
             Three nested lists describing the output. In particular, these
@@ -186,6 +784,20 @@ class Perceptron:
                 - labels (list(list(str))): Labels of the predicted arcs.
                 - arcs (list(list(float))): Scores for the predicted arcs.
         """
+        store = None
+
+        if arc_information is None:
+            store = substructures
+            substructures, arc_information = store.substructures, store
+
+        if store is not None:
+            batched = self._predict_store(store)
+
+            if batched is not None:
+                arcs, labels, scores = batched
+
+                return store.mention_pairs(arcs), labels, scores
+
         arcs = []
         labels = []
         scores = []
@@ -199,8 +811,100 @@ class Perceptron:
             labels.append(substructure_arcs_labels)
             scores.append(substructure_arcs_scores)
 
+        # map arc indices back to mention pairs
+        if store is not None:
+            arcs = store.mention_pairs(arcs)
+
         return arcs, labels, scores
 
+    def _predict_store(self, store):
+        """ Predict coreference information for all instances of a store at
+        once.
+
+        Subclasses may override this method to decode all substructures
+        with array operations, for example using ``score_arcs``. The output
+        must be the same as when calling ``argmax`` for each substructure.
+
+        Args:
+            store (InstanceStore): The instances.
+
+        Returns:
+            None if batched prediction is not supported, which is the
+            default. Otherwise, the output of ``predict``, where arcs are
+            represented by their index in ``store``.
+        """
+        return None
+
+    def score_arcs(self, store, label="+"):
+        """ Score all arcs of a store according to priors, weights and
+        costs.
+
+        Args:
+            store (InstanceStore): The instances.
+            label (str): The label of the arcs. Defaults to "+".
+
+        Returns:
+            numpy.array: For each arc in ``store``, the score computed by
+            ``score_arc``.
+        """
+        return self.priors[label] \
+            + store.sum_weights(self.weights[label]) \
+            + self.cost_scaling * store.costs
+
+    def score_arcs_by_label(self, store, labels=None):
+        """ Score all arcs of a store under several labels.
+
+        If the weights are a ``LabelWeights`` matrix, the weights of all
+        labels are gathered and summed at once.
+
+        Args:
+            store (InstanceStore): The instances.
+            labels (list(str)): The labels. Defaults to None, which means
+                that the labels of ``get_labels`` are used.
+
+        Returns:
+            numpy.array: A matrix with one row for each label, containing for
+            each arc in ``store`` the score computed by ``score_arc``.
+        """
+        if labels is None:
+            labels = self.get_labels()
+
+        if isinstance(self.weights, label_weights.LabelWeights) and \
+                list(labels) == self.weights.labels:
+            sums = store.sum_weights(self.weights.matrix)
+        else:
+            sums = numpy.array([store.sum_weights(self.weights[label])
+                                for label in labels])
+
+        return numpy.array([self.priors[label] for label in labels])[
+            :, numpy.newaxis] + sums + self.cost_scaling * store.costs
+
+    def score_arc_by_label(self, features, costs, labels=None):
+        """ Score an arc (described by features) under several labels.
+
+        Args:
+            features (numpy.array): An array containing integer features.
+            costs (int): The costs of predicting the arc described by
+                ``features``.
+            labels (list(str)): The labels. Defaults to None, which means
+                that the labels of ``get_labels`` are used.
+
+        Returns:
+            list(float): For each label, the score computed by
+            ``score_arc``.
+        """
+        if labels is None:
+            labels = self.get_labels()
+
+        if isinstance(self.weights, label_weights.LabelWeights):
+            sums = self.weights.sum(features, labels).tolist()
+        else:
+            sums = [self.weights[label].take(features).sum()
+                    for label in labels]
+
+        return [self.priors[label] + label_sum + self.cost_scaling * costs
+                for label, label_sum in zip(labels, sums)]
+
     def score_arc(self, features, costs, label="+"):
         """ Score an arc (described by features) according to priors, weights
         and costs.
@@ -316,3 +1020,13 @@ class Perceptron:
 
     def get_labels(self):
         return ["+"]
+
+    def get_coref_labels(self):
+        """ Get the labels of arcs which indicate that the mentions connected
+        by the arc are coreferent.
+
+        Returns:
+            list(str): The labels indicating coreference. Defaults to
+            ``["+"]``.
+        """
+        return ["+"]
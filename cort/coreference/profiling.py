@@ -0,0 +1,155 @@
+""" Profile feature extraction.
+
+A ``FeatureProfile`` records, for each feature function, the time spent
+computing it, how often it was called and how often it fired (i.e. returned
+a non-empty value). Stages of the extraction which are not tied to a single
+feature, such as building feature combinations and hashing, are recorded in
+the same way.
+
+The profile also records the distinct features of each template (see
+``cort.coreference.feature_templates``) together with the index they were
+hashed to. A collision occurs when distinct features are mapped to the same
+index, and hence share a weight.
+
+Profiles are recorded per document in the worker processes and merged in
+the parent process (see ``InstanceExtractor``).
+"""
+
+import collections
+
+
+__author__ = 'smartschat'
+
+
+class FeatureProfile:
+    """ Timings, call counts and hashing statistics of feature extraction.
+
+    Attributes:
+        documents (int): The number of documents profiled.
+        times (dict(str, float)): For each feature or stage, the cumulative
+            time in seconds.
+        calls (dict(str, int)): For each feature or stage, the number of
+            calls. For pairwise features, this is the number of pairs the
+            feature was computed for.
+        fired (dict(str, int)): For each feature, the number of calls which
+            returned a non-empty value.
+        features (dict(str, dict)): For each template name, a mapping of the
+            distinct features of the template to the indices they were
+            hashed to. Features are represented by their string, or by their
+            64 bit hash for integer feature hashing.
+    """
+    def __init__(self):
+        """ Initialize an empty profile. """
+        self.documents = 0
+        self.times = collections.defaultdict(float)
+        self.calls = collections.defaultdict(int)
+        self.fired = collections.defaultdict(int)
+        self.features = collections.defaultdict(dict)
+
+    def record(self, name, seconds, calls=1, fired=None):
+        """ Record calls of a feature or stage.
+
+        Args:
+            name (str): The name of the feature or stage.
+            seconds (float): The time spent.
+            calls (int): The number of calls. Defaults to 1.
+            fired (int): The number of calls returning a non-empty value.
+                Defaults to None, which means that firing is not recorded.
+        """
+        self.times[name] += seconds
+        self.calls[name] += calls
+
+        if fired is not None:
+            self.fired[name] += fired
+
+    def record_features(self, template_names, templates, features, indices):
+        """ Record extracted features.
+
+        Args:
+            template_names (list(str)): The names of the templates, indexed
+                by template id.
+            templates (numpy.array): The template id of each feature.
+            features (list or numpy.array): The features, as strings or 64
+                bit hashes.
+            indices (numpy.array): The indices the features were hashed to.
+        """
+        templates = templates.tolist()
+        indices = indices.tolist()
+
+        if not isinstance(features, list):
+            features = features.tolist()
+
+        for template, feature, index in zip(templates, features, indices):
+            self.features[template_names[template]][feature] = index
+
+    def merge(self, other):
+        """ Add the records of another profile to this profile.
+
+        Args:
+            other (FeatureProfile): Another profile.
+        """
+        self.documents += other.documents
+
+        for name in other.times:
+            self.times[name] += other.times[name]
+            self.calls[name] += other.calls[name]
+
+        for name in other.fired:
+            self.fired[name] += other.fired[name]
+
+        for template, features in other.features.items():
+            self.features[template].update(features)
+
+    def collisions(self):
+        """ Compute hashing statistics.
+
+        Returns:
+            dict(str, (int, int)): For each template and for the key "all",
+            which contains the features of all templates, the number of
+            distinct features and the number of collisions, i.e. the number
+            of distinct features minus the number of distinct indices.
+        """
+        statistics = {}
+        all_features = {}
+
+        for template, features in self.features.items():
+            statistics[template] = (
+                len(features), len(features) - len(set(features.values())))
+            all_features.update(features)
+
+        statistics["all"] = (
+            len(all_features),
+            len(all_features) - len(set(all_features.values())))
+
+        return statistics
+
+    def report(self):
+        """ Describe the profile.
+
+        Returns:
+            list(str): Lines describing the time, calls and fire rate of each
+            feature and stage, sorted by decreasing time, followed by the
+            hashing statistics of each template.
+        """
+        lines = ["Feature profile of " + str(self.documents) + " documents:"]
+
+        for name in sorted(self.times, key=self.times.get, reverse=True):
+            line = "\t%-40s %10.3fs %12d calls" % (name, self.times[name],
+                                                   self.calls[name])
+
+            if name in self.fired and self.calls[name]:
+                line += " %7.2f%% fired" % (
+                    100 * self.fired[name] / self.calls[name])
+
+            lines.append(line)
+
+        lines.append("Hashing statistics:")
+
+        collisions = self.collisions()
+
+        for template in sorted(collisions,
+                               key=lambda t: (t == "all", t)):
+            lines.append("\t%-40s %10d distinct %10d collisions" %
+                         ((template,) + collisions[template]))
+
+        return lines
@@ -0,0 +1,116 @@
+""" A per-document index of speaker turns.
+
+Features for conversational data compare the speakers of mentions, and check
+whether only the speakers of two mentions speak between them (see
+``cort.coreference.multigraph.features.nothing_between``). Instead of
+scanning the speakers of all tokens between two mentions, a ``SpeakerTurns``
+index splits the tokens of a document into turns, i.e. maximal sequences of
+tokens uttered by the same speaker, once per document. Then these checks only
+compare a few integers.
+"""
+
+
+__author__ = 'smartschat'
+
+
+class SpeakerTurns:
+    """ An index of the speaker turns of a document.
+
+    Attributes:
+        turns (list(int)): For each token, the index of its turn.
+        turn_speakers (list(str)): For each turn, its speaker. Consecutive
+            turns have different speakers.
+    """
+    def __init__(self, speakers):
+        """ Initialize the index.
+
+        Args:
+            speakers (list(str)): For each token of a document, its speaker.
+        """
+        self.turns = []
+        self.turn_speakers = []
+
+        for token_speaker in speakers:
+            if not self.turn_speakers or \
+                    token_speaker != self.turn_speakers[-1]:
+                self.turn_speakers.append(token_speaker)
+
+            self.turns.append(len(self.turn_speakers) - 1)
+
+        # for each turn t, the number of turns u <= t whose speaker differs
+        # from the speaker two turns before u. As consecutive turns have
+        # different speakers, two speakers alternate between turns a and b
+        # iff no such turn lies in a+2, ..., b.
+        self.__changes = []
+        changes = 0
+
+        for t, turn_speaker in enumerate(self.turn_speakers):
+            if t >= 2 and turn_speaker != self.turn_speakers[t - 2]:
+                changes += 1
+
+            self.__changes.append(changes)
+
+        self.__normalized = {turn_speaker: _normalize(turn_speaker)
+                             for turn_speaker in set(self.turn_speakers)}
+
+    def only_two_speakers(self, start, end):
+        """ Compute whether all tokens between two tokens are uttered by the
+        speakers of these tokens.
+
+        Args:
+            start (int): The index of the first token.
+            end (int): The index of the last token, not smaller than
+                ``start``.
+
+        Returns:
+            bool: True if the speaker of every token in ``start, ..., end``
+            is the speaker of ``start`` or the speaker of ``end``.
+        """
+        first = self.turns[start]
+        last = self.turns[end]
+
+        if first == last:
+            return True
+
+        # for an even number of turn changes, the turns in between alternate
+        # between the speaker of start and a third speaker
+        if (last - first) % 2 == 0:
+            return False
+
+        return self.__changes[last] == self.__changes[first + 1]
+
+    def normalize(self, speaker):
+        """ Normalize a speaker name for comparison with mention strings.
+
+        Args:
+            speaker (str): A speaker, such as ``"Barack_Obama"``.
+
+        Returns:
+            str: The speaker in lowercase, with underscores replaced by
+            spaces.
+        """
+        if speaker not in self.__normalized:
+            return _normalize(speaker)
+
+        return self.__normalized[speaker]
+
+
+def for_document(document):
+    """ Get the speaker turn index for a document.
+
+    Args:
+        document (CoNLLDocument): A document.
+
+    Returns:
+        SpeakerTurns: The index for ``document.speakers``, which is built once
+        per document.
+    """
+    return document.derived(_turns)
+
+
+def _turns(document):
+    return SpeakerTurns(document.speakers)
+
+
+def _normalize(speaker):
+    return speaker.replace("_", " ").lower()
@@ -188,6 +188,23 @@ bn/abc/00/abc_0030      0       28      .       .       *))     -       -
         self.assertEqual(expected, self.real_document.get_embedding_sentence(
             Span(23, 24)))
 
+    def test_derived(self):
+        calls = []
+
+        def mention_count(document):
+            calls.append(document)
+            return len(document.system_mentions)
+
+        self.assertEqual(0, self.real_document.derived(mention_count))
+        self.assertEqual(0, self.real_document.derived(mention_count))
+        self.assertEqual(1, len(calls))
+
+        self.real_document.system_mentions = \
+            self.real_document.annotated_mentions
+        self.assertEqual(len(self.real_document.annotated_mentions),
+                         self.real_document.derived(mention_count))
+        self.assertEqual(2, len(calls))
+
     def test_get_parse(self):
         expected = "(TOP (S (NP (JJ Local) (NNS police)) (VP (VBP say) " \
                    "(SBAR (S (NP (PRP it)) (VP (VBZ 's) (RB not) " \
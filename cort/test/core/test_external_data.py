@@ -1,4 +1,11 @@
+import os
+import shutil
+import tempfile
+
+from cort.core.external_data import CompactPairMap
+from cort.core.external_data import CompactStringMap
 from cort.core.external_data import GenderData
+from cort.core.external_data import LexicalData
 
 __author__ = 'smartschat'
 
@@ -23,5 +30,83 @@ class TestGenderData(unittest.TestCase):
                              "tokens": ["Footballer", "Zidane"],
                              "head": ["Zidane"]}))
 
+
+class TestLexicalData(unittest.TestCase):
+    def setUp(self):
+        self.lexical_data = LexicalData.get_instance()
+
+    def test_pairs(self):
+        self.assertTrue(("force", "police department")
+                        in self.lexical_data.pairs)
+        self.assertFalse(("police department", "force")
+                         in self.lexical_data.pairs)
+
+    def test_partners(self):
+        self.assertEqual(
+            [(0, 2), (2, 0)],
+            sorted(self.lexical_data.partners(
+                ["police department", "snafu", "force"])))
+
+
+class TestCompactStringMap(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_mapping(self):
+        compact = CompactStringMap.from_mapping(
+            {"he": "MALE", "she": "FEMALE", "it": "NEUTRAL"},
+            ["MALE", "FEMALE", "NEUTRAL"])
+
+        self.assertEqual(3, len(compact))
+        self.assertEqual("FEMALE", compact["she"])
+        self.assertTrue("it" in compact)
+        self.assertFalse("they" in compact)
+        self.assertEqual(None, compact.get("they"))
+        self.assertRaises(KeyError, lambda: compact["they"])
+
+    def test_set(self):
+        compact = CompactStringMap.from_mapping({("a", "b"), ("c", "d")})
+
+        self.assertTrue(("a", "b") in compact)
+        self.assertFalse(("b", "a") in compact)
+        self.assertRaises(KeyError, lambda: compact[("a", "b")])
+
+    def test_save_and_load(self):
+        prefix = os.path.join(self.directory, "counts")
+        CompactStringMap.from_mapping({"um": 30, "uh": 2}).save(prefix)
+
+        loaded = CompactStringMap.load(prefix)
+
+        self.assertEqual(30, loaded["um"])
+        self.assertEqual(2, loaded["uh"])
+        self.assertFalse("hm" in loaded)
+
+
+class TestCompactPairMap(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_partners(self):
+        compact = CompactPairMap.from_pairs({("a", "b"), ("a", "c")})
+
+        self.assertEqual([(0, 1), (1, 0), (1, 2), (1, 3), (2, 1), (3, 1)],
+                         sorted(compact.partners(["b", "a", "c", "c", "d"])))
+        self.assertEqual([], compact.partners(["b", "c"]))
+
+    def test_save_and_load(self):
+        prefix = os.path.join(self.directory, "pairs")
+        CompactPairMap.from_pairs({("a", "b")}).save(prefix)
+
+        loaded = CompactPairMap.load(prefix)
+
+        self.assertTrue(isinstance(loaded, CompactPairMap))
+        self.assertEqual([(0, 1), (1, 0)], sorted(loaded.partners(["a", "b"])))
+
 if __name__ == '__main__':
     unittest.main()
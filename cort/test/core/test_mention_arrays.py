@@ -0,0 +1,73 @@
+import unittest
+
+import numpy
+
+from cort.core import mention_arrays
+from cort.core import mentions
+from cort.core import spans
+
+
+__author__ = 'smartschat'
+
+
+class TestMentionArrays(unittest.TestCase):
+    def setUp(self):
+        self.mentions = [
+            mentions.Mention.dummy_from_document(None),
+            mentions.Mention(None, spans.Span(0, 1),
+                             {"head": ["Obama"], "sentence_id": 0,
+                              "modifiers": {"president", "barack"},
+                              "annotated_set_id": 3,
+                              "first_in_gold_entity": True}),
+            mentions.Mention(None, spans.Span(3, 3),
+                             {"head": ["he"], "sentence_id": 1,
+                              "modifiers": set(),
+                              "annotated_set_id": None,
+                              "first_in_gold_entity": False}),
+            mentions.Mention(None, spans.Span(5, 6),
+                             {"head": ["Obama"], "sentence_id": 4,
+                              "modifiers": {"barack"},
+                              "annotated_set_id": 3,
+                              "first_in_gold_entity": False}),
+        ]
+
+        self.arrays = mention_arrays.MentionArrays(self.mentions)
+
+    def test_codes(self):
+        self.assertEqual([-1, 0, 1, 0], list(self.arrays.codes("head")))
+        self.assertEqual([-1, 0, 1, 2],
+                         list(self.arrays.codes(lambda m: m.span)))
+
+    def test_numbers(self):
+        self.assertEqual([-1, 0, 1, 4],
+                         list(self.arrays.numbers("sentence_id")))
+
+    def test_incidence(self):
+        incidence = self.arrays.incidence("modifiers")
+
+        self.assertEqual((4, 2), incidence.shape)
+        self.assertEqual([0, 2, 0, 1], list(incidence.sum(axis=1)))
+        self.assertEqual(1, incidence[1].dot(incidence[3]))
+
+    def test_gold_set_ids(self):
+        self.assertEqual([-1, 0, -1, 0], list(self.arrays.gold_set_ids()))
+        self.assertEqual([True, False, False, False],
+                         list(self.arrays.is_dummy()))
+
+    def test_consistency(self):
+        anaphors, antecedents = numpy.meshgrid(numpy.arange(4),
+                                               numpy.arange(4))
+        anaphors = anaphors.ravel()
+        antecedents = antecedents.ravel()
+
+        self.assertEqual(
+            [self.mentions[i].decision_is_consistent(self.mentions[j])
+             for i, j in zip(anaphors, antecedents)],
+            list(self.arrays.consistency(anaphors, antecedents)))
+
+    def test_cache(self):
+        self.assertTrue(self.arrays.codes("head") is
+                        self.arrays.codes("head"))
+
+if __name__ == '__main__':
+    unittest.main()
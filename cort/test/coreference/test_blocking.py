@@ -0,0 +1,154 @@
+import os
+import unittest
+from unittest import mock
+
+from cort.core import corpora
+from cort.core import mention_arrays
+from cort.core import mention_extractor
+from cort.coreference import blocking
+from cort.coreference import candidates
+from cort.coreference import cost_functions
+from cort.coreference import features
+from cort.coreference import instance_extractors
+from cort.coreference.approaches import mention_pairs
+from cort.coreference.multigraph import features as multigraph_features
+
+
+__author__ = 'smartschat'
+
+
+class TestBlockingIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        directory = os.path.dirname(os.path.realpath(__file__)) + \
+            "/../core/resources/"
+        corpus = corpora.Corpus.from_file(
+            "test", open(directory + "input.conll", "r"))
+        corpus.documents = corpus.documents[:2]
+
+        for doc in corpus:
+            doc.system_mentions = \
+                mention_extractor.extract_system_mentions(doc)
+
+        cls.corpus = corpus
+        cls.mentions = mention_arrays.MentionArrays(
+            corpus.documents[0].system_mentions)
+        cls.index = blocking.BlockingIndex.of(cls.mentions)
+
+    def all_pairs(self):
+        return [(i, j) for i in range(1, len(self.mentions))
+                for j in range(1, i)]
+
+    def shared(self, kind):
+        pairs = self.all_pairs()
+        found = self.index.share_key(kind,
+                                     [i for i, _ in pairs],
+                                     [j for _, j in pairs])
+
+        return {pair for pair, is_shared in zip(pairs, found) if is_shared}
+
+    def test_index_is_cached(self):
+        self.assertTrue(self.index is blocking.BlockingIndex.of(self.mentions))
+
+    def test_single_keys(self):
+        system_mentions = self.mentions.mentions
+
+        def is_pronominal(i):
+            return system_mentions[i].attributes["type"] in ["PRO", "DEM",
+                                                             "VRB"]
+
+        def lowercase(i):
+            return system_mentions[i].attributes["tokens_as_lowercase_string"]
+
+        self.assertEqual(
+            {(i, j) for i, j in self.all_pairs()
+             if not is_pronominal(i) and not is_pronominal(j)
+             and lowercase(i) == lowercase(j)},
+            self.shared("string"))
+
+        self.assertEqual(-1, self.index.codes("head")[0])
+
+    def test_pairs_are_symmetric(self):
+        n = len(self.mentions)
+
+        for kind in ["head", "alias"]:
+            codes = set(self.index.pairs(kind).tolist())
+            self.assertTrue(codes)
+            self.assertEqual(codes, {(code % n) * n + code // n
+                                     for code in codes})
+
+    def test_unknown_kind(self):
+        self.assertRaises(ValueError, self.index.pairs, "soundex")
+
+    def test_alias_keys_cover_aliases(self):
+        system_mentions = self.mentions.mentions
+
+        aliases = {(i, j) for i, j in self.all_pairs()
+                   if multigraph_features.alias(system_mentions[i],
+                                                system_mentions[j])}
+
+        self.assertTrue(aliases)
+        self.assertTrue(aliases <= self.shared("alias"))
+
+    def test_match_agrees_with_share_key(self):
+        system_mentions = self.mentions.mentions
+
+        for kind in blocking.KINDS:
+            self.assertEqual(
+                self.shared(kind),
+                {(i, j) for i, j in self.all_pairs()
+                 if self.index.match(kind, system_mentions[i],
+                                     system_mentions[j])})
+
+    def test_multigraph_features(self):
+        system_mentions = self.corpus.documents[1].system_mentions
+
+        self.assertTrue(blocking.lookup(system_mentions[2],
+                                        system_mentions[1]) is not None)
+
+        multigraph = [multigraph_features.alias,
+                      multigraph_features.lexical,
+                      multigraph_features.head_match,
+                      multigraph_features.non_pronominal_string_match]
+
+        def compute():
+            return [[bool(feature(system_mentions[i], system_mentions[j]))
+                     for feature in multigraph]
+                    for i in range(1, len(system_mentions))
+                    for j in range(1, i)]
+
+        with mock.patch.object(blocking, "lookup", return_value=None):
+            expected = compute()
+
+        self.assertEqual(expected, compute())
+
+    def test_blocked_extraction(self):
+        policy = candidates.MentionDistance(3)
+
+        extractor = instance_extractors.InstanceExtractor(
+            mention_pairs.extract_testing_substructures,
+            [features.fine_type],
+            [features.exact_match],
+            cost_functions.null_cost,
+            candidate_policy=policy,
+            blocking_kinds=["head"]
+        )
+
+        substructures, _ = extractor.extract(self.corpus)
+
+        system_mentions = self.mentions.mentions
+        ids = {mention: i for i, mention in enumerate(system_mentions)}
+        heads = self.index.codes("head")
+
+        kept = {(ids[anaphor], ids[antecedent])
+                for struct in substructures
+                for anaphor, antecedent in struct
+                if anaphor in ids and not antecedent.is_dummy()}
+
+        self.assertEqual(
+            {(i, j) for i, j in self.all_pairs()
+             if i - j <= 3 or (heads[i] == heads[j] and heads[i] >= 0)},
+            kept)
+
+if __name__ == '__main__':
+    unittest.main()
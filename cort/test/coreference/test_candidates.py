@@ -0,0 +1,168 @@
+import os
+import unittest
+
+from cort.core import corpora
+from cort.core import mention_arrays
+from cort.core import mention_extractor
+from cort.coreference import candidates
+from cort.coreference import cost_functions
+from cort.coreference import features
+from cort.coreference import instance_extractors
+from cort.coreference.approaches import mention_pairs
+
+
+__author__ = 'smartschat'
+
+
+class TestCandidates(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        directory = os.path.dirname(os.path.realpath(__file__)) + \
+            "/../core/resources/"
+        corpus = corpora.Corpus.from_file(
+            "test", open(directory + "input.conll", "r"))
+        corpus.documents = corpus.documents[:2]
+
+        for doc in corpus:
+            doc.system_mentions = \
+                mention_extractor.extract_system_mentions(doc)
+
+        cls.corpus = corpus
+        cls.mentions = mention_arrays.MentionArrays(
+            corpus.documents[0].system_mentions)
+
+    def allowed(self, policy):
+        bounds = policy(self.mentions)
+
+        return [(i, j) for i in range(1, len(self.mentions))
+                for j in range(1, i) if j >= bounds[i]]
+
+    def test_mention_distance(self):
+        self.assertEqual(
+            [(i, j) for i in range(1, len(self.mentions))
+             for j in range(1, i) if i - j <= 3],
+            self.allowed(candidates.MentionDistance(3)))
+
+    def test_sentence_distance(self):
+        system_mentions = self.mentions.mentions
+
+        def distance(i, j):
+            return (system_mentions[i].attributes["sentence_id"] -
+                    system_mentions[j].attributes["sentence_id"])
+
+        def max_distance(i):
+            if system_mentions[i].attributes["type"] == "PRO":
+                return 1
+            else:
+                return 4
+
+        self.assertEqual(
+            [(i, j) for i in range(1, len(self.mentions))
+             for j in range(1, i) if distance(i, j) <= max_distance(i)],
+            self.allowed(candidates.SentenceDistance(4, {"PRO": 1})))
+
+    def test_intersection(self):
+        self.assertEqual(
+            set(self.allowed(candidates.MentionDistance(10))) &
+            set(self.allowed(candidates.SentenceDistance(1))),
+            set(self.allowed(candidates.Intersection([
+                candidates.MentionDistance(10),
+                candidates.SentenceDistance(1)]))))
+
+    def test_from_arguments(self):
+        self.assertEqual(None, candidates.from_arguments())
+        self.assertTrue(isinstance(
+            candidates.from_arguments(max_sentence_distance_by_type=["PRO:2"]),
+            candidates.SentenceDistance))
+        self.assertTrue(isinstance(
+            candidates.from_arguments("5", "3"), candidates.Intersection))
+
+    def test_pruned_extraction(self):
+        extractor = instance_extractors.InstanceExtractor(
+            mention_pairs.extract_testing_substructures,
+            [features.fine_type],
+            [features.exact_match],
+            cost_functions.null_cost,
+            candidate_policy=candidates.SentenceDistance(2)
+        )
+
+        substructures, _ = extractor.extract(self.corpus)
+
+        for struct in substructures:
+            for anaphor, antecedent in struct:
+                self.assertTrue(anaphor.attributes["sentence_id"] -
+                                antecedent.attributes["sentence_id"] <= 2)
+
+        stats = extractor.pruning_statistics
+
+        self.assertEqual(len(substructures), stats["kept_arcs"])
+        self.assertEqual(
+            sum(len(mention_pairs.extract_testing_substructures(doc))
+                for doc in self.corpus),
+            stats["arcs"])
+        self.assertTrue(stats["kept_arcs"] < stats["arcs"])
+        self.assertTrue(stats["coreferent_arcs_pruned"] > 0)
+
+    def test_generated_candidates(self):
+        # pruning the complete search space after extraction yields the same
+        # arcs as generating only the candidates
+        def pruned_after_extraction(extract_substructures):
+            return lambda doc: extract_substructures(doc)
+
+        policy = candidates.SentenceDistance(1)
+
+        for extract_substructures in [
+                mention_pairs.extract_training_substructures,
+                mention_pairs.extract_testing_substructures]:
+            stores = []
+            statistics = []
+
+            for function in [extract_substructures,
+                             pruned_after_extraction(extract_substructures)]:
+                extractor = instance_extractors.InstanceExtractor(
+                    function,
+                    [features.fine_type],
+                    [features.exact_match],
+                    cost_functions.null_cost,
+                    candidate_policy=policy,
+                    blocking_kinds=["head", "alias"]
+                )
+
+                stores.append(extractor.extract_store(self.corpus))
+                statistics.append(extractor.pruning_statistics)
+
+            for name in ["anaphors", "antecedents", "features",
+                         "arc_offsets"]:
+                self.assertEqual(getattr(stores[0], name).tolist(),
+                                 getattr(stores[1], name).tolist())
+
+            self.assertEqual(statistics[0]["kept_arcs"],
+                             statistics[1]["kept_arcs"])
+
+        # for the complete search space, the statistics agree as well
+        self.assertEqual(statistics[0], statistics[1])
+
+    def test_candidate_antecedents(self):
+        candidate_antecedents = candidates.CandidateAntecedents(
+            self.mentions, candidates.MentionDistance(2), ["head"])
+
+        heads = self.mentions.codes("head_as_lowercase_string")
+
+        for i in range(1, len(self.mentions)):
+            expected = [j for j in range(i - 1, -1, -1)
+                        if j == 0 or i - j <= 2 or
+                        (heads[i] == heads[j] and
+                         self.mentions.mentions[i].attributes["type"]
+                         not in ["PRO", "DEM", "VRB"] and
+                         self.mentions.mentions[j].attributes["type"]
+                         not in ["PRO", "DEM", "VRB"] and
+                         self.mentions.mentions[i].attributes[
+                             "semantic_class"] != "NUMERIC" and
+                         self.mentions.mentions[j].attributes[
+                             "semantic_class"] != "NUMERIC")]
+
+            self.assertEqual(expected,
+                             candidate_antecedents.antecedents(i))
+
+if __name__ == '__main__':
+    unittest.main()
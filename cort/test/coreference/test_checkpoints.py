@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from cort.core import corpora
+from cort.core import mention_extractor
+from cort.coreference import checkpoints
+from cort.coreference import cost_functions
+from cort.coreference import features
+from cort.coreference import instance_extractors
+from cort.coreference.approaches import mention_pairs
+
+
+__author__ = 'smartschat'
+
+
+class TestCheckpoints(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        directory = os.path.dirname(os.path.realpath(__file__)) + \
+            "/../core/resources/"
+        corpus = corpora.Corpus.from_file(
+            "test", open(directory + "input.conll", "r"))
+        corpus.documents = corpus.documents[:2]
+
+        for doc in corpus:
+            doc.system_mentions = \
+                mention_extractor.extract_system_mentions(doc)
+
+        cls.corpus = corpus
+
+        cls.extractor = instance_extractors.InstanceExtractor(
+            mention_pairs.extract_training_substructures,
+            [features.fine_type, features.gender, features.head],
+            [features.exact_match, features.sentence_distance],
+            cost_functions.cost_based_on_consistency
+        )
+
+        cls.store = cls.extractor.extract_store(corpus)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_save_and_load(self):
+        saved = checkpoints.Checkpoints(self.directory, keep=2)
+
+        self.assertIsNone(saved.load())
+
+        for epoch in range(1, 4):
+            saved.save(epoch, {"epoch": epoch},
+                       {"weights": numpy.arange(epoch, dtype=float)})
+
+        self.assertEqual([2, 3], saved.epochs())
+
+        epoch, values, arrays = saved.load()
+
+        self.assertEqual(3, epoch)
+        self.assertEqual({"epoch": 3}, values)
+        self.assertTrue(numpy.array_equal([0, 1, 2], arrays["weights"]))
+
+    def assert_resumed_training_equal(self, fit):
+        directory = tempfile.mkdtemp(dir=self.directory)
+
+        priors, weights = fit(mention_pairs.MentionPairsPerceptron(n_iter=3),
+                              None)
+
+        fit(mention_pairs.MentionPairsPerceptron(n_iter=1),
+            checkpoints.Checkpoints(directory))
+
+        resumed_priors, resumed_weights = fit(
+            mention_pairs.MentionPairsPerceptron(n_iter=3),
+            checkpoints.Checkpoints(directory, resume=True))
+
+        self.assertEqual([3], checkpoints.Checkpoints(directory).epochs())
+        self.assertEqual(dict(priors), dict(resumed_priors))
+        for label in weights:
+            self.assertTrue(numpy.array_equal(weights[label],
+                                              resumed_weights[label]))
+
+    def test_resume_fit(self):
+        self.assert_resumed_training_equal(
+            lambda perceptron, saved: perceptron.fit(
+                self.store, checkpoints=saved))
+
+    def test_resume_fit_parallel(self):
+        self.assert_resumed_training_equal(
+            lambda perceptron, saved: perceptron.fit_parallel(
+                self.store, n_shards=2, checkpoints=saved))
+
+    def test_resume_fit_shards(self):
+        shards = self.extractor.extract_shards(
+            self.corpus, os.path.join(self.directory, "shards"), 1)
+
+        self.assert_resumed_training_equal(
+            lambda perceptron, saved: perceptron.fit_shards(
+                shards, block_size=10, checkpoints=saved))
+
+    def test_resume_after_early_stopping(self):
+        saved = checkpoints.Checkpoints(self.directory)
+        scores = iter([2, 1, 1])
+
+        stopped = mention_pairs.MentionPairsPerceptron(n_iter=5)
+        priors, weights = stopped.fit(
+            self.store, evaluate=lambda *model: next(scores), patience=2,
+            checkpoints=saved)
+
+        # training does not continue, and the model of the best epoch is
+        # restored
+        saved.resume = True
+        resumed = mention_pairs.MentionPairsPerceptron(n_iter=5)
+        resumed_priors, resumed_weights = resumed.fit(
+            self.store, evaluate=lambda *model: self.fail(), patience=2,
+            checkpoints=saved)
+
+        self.assertEqual([3], saved.epochs())
+        self.assertEqual(dict(priors), dict(resumed_priors))
+        for label in weights:
+            self.assertTrue(numpy.array_equal(weights[label],
+                                              resumed_weights[label]))
+
+    def test_resume_with_different_setup(self):
+        saved = checkpoints.Checkpoints(self.directory)
+        mention_pairs.MentionPairsPerceptron(n_iter=1).fit(
+            self.store, checkpoints=saved)
+
+        saved.resume = True
+        self.assertRaises(
+            ValueError,
+            mention_pairs.MentionPairsPerceptron(n_iter=2, seed=5).fit,
+            self.store, checkpoints=saved)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import collections
+import os
+import unittest
+
+import numpy
+
+from cort.core import corpora
+from cort.core import mention_arrays
+from cort.core import mention_extractor
+from cort.coreference import candidates
+from cort.coreference import coarse_to_fine
+from cort.coreference import cost_functions
+from cort.coreference import experiments
+from cort.coreference import features
+from cort.coreference import instance_extractors
+from cort.coreference.approaches import mention_pairs
+
+
+__author__ = 'smartschat'
+
+
+class TestCoarseScorer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        directory = os.path.dirname(os.path.realpath(__file__)) + \
+            "/../core/resources/"
+        corpus = corpora.Corpus.from_file(
+            "test", open(directory + "input.conll", "r"))
+        corpus.documents = corpus.documents[:2]
+
+        for doc in corpus:
+            doc.system_mentions = \
+                mention_extractor.extract_system_mentions(doc)
+
+        cls.corpus = corpus
+
+        cls.scorer = coarse_to_fine.CoarseScorer(k=3, n_iter=2)
+        cls.scorer.fit(corpus)
+
+    def test_recall(self):
+        recall = self.scorer.recall(self.corpus, [1, 3, 10, 10000])
+
+        self.assertTrue(0 < recall[1] <= recall[3] <= recall[10])
+        self.assertEqual(1.0, recall[10000])
+
+        policy = candidates.MentionDistance(5)
+        self.assertEqual(
+            1.0, self.scorer.recall(self.corpus, [5], policy)[5])
+
+    def test_prune(self):
+        mentions = mention_arrays.MentionArrays(
+            self.corpus.documents[0].system_mentions)
+
+        anaphors = numpy.array([i for i in range(2, len(mentions))
+                                for j in range(1, i)])
+        antecedents = numpy.array([j for i in range(2, len(mentions))
+                                   for j in range(1, i)])
+
+        keep = self.scorer.prune(mentions, anaphors, antecedents)
+        kept_per_anaphor = collections.Counter(anaphors[keep])
+
+        for i in range(2, len(mentions)):
+            self.assertEqual(min(i - 1, 3), kept_per_anaphor[i])
+
+        ranks = self.scorer.rank(mentions, anaphors, antecedents)
+        scores = self.scorer.score(mentions, anaphors, antecedents)
+
+        best = (anaphors == 10) & (ranks == 0)
+        self.assertEqual(scores[anaphors == 10].max(), scores[best][0])
+
+    def test_pruned_extraction(self):
+        extractor = instance_extractors.InstanceExtractor(
+            mention_pairs.extract_testing_substructures,
+            [features.fine_type],
+            [features.exact_match],
+            cost_functions.null_cost,
+            coarse_scorer=self.scorer
+        )
+
+        substructures, _ = extractor.extract(self.corpus)
+
+        kept_per_anaphor = collections.Counter(
+            struct[0][0] for struct in substructures)
+
+        self.assertEqual(3, max(kept_per_anaphor.values()))
+        self.assertEqual(len(substructures),
+                         extractor.pruning_statistics["kept_arcs"])
+
+    def test_learn(self):
+        extractor = instance_extractors.InstanceExtractor(
+            mention_pairs.extract_training_substructures,
+            [features.fine_type],
+            [features.exact_match],
+            cost_functions.null_cost,
+            coarse_scorer=coarse_to_fine.CoarseScorer(k=3, n_iter=1)
+        )
+
+        experiments.learn(self.corpus, extractor,
+                          mention_pairs.MentionPairsPerceptron(n_iter=1))
+
+        self.assertTrue(extractor.coarse_scorer.weights is not None)
+        self.assertTrue(extractor.pruning_statistics["kept_arcs"] <
+                        extractor.pruning_statistics["arcs"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import itertools
+import random
+import unittest
+
+import numpy
+
+from cort.coreference import evaluation
+
+
+__author__ = 'smartschat'
+
+
+class TestEvaluation(unittest.TestCase):
+    def setUp(self):
+        # the example of Pradhan et al. (2014), Figure 1
+        self.key = [{"a", "b", "c"}, {"d", "e", "f", "g"}]
+        self.response = [{"a", "b"}, {"c", "d"}, {"f", "g", "h", "i"}]
+
+    def assert_scores_equal(self, expected, counts):
+        recall_numerator, recall_denominator, precision_numerator, \
+            precision_denominator = counts
+
+        self.assertAlmostEqual(expected[0],
+                               recall_numerator / recall_denominator)
+        self.assertAlmostEqual(expected[1],
+                               precision_numerator / precision_denominator)
+
+    def test_muc(self):
+        self.assert_scores_equal(
+            (0.4, 0.4), evaluation.muc(self.key, self.response))
+
+    def test_b_cubed(self):
+        self.assert_scores_equal(
+            (5/12, 1/2), evaluation.b_cubed(self.key, self.response))
+
+    def test_ceafe(self):
+        self.assert_scores_equal(
+            (0.65, 0.65/1.5), evaluation.ceafe(self.key, self.response))
+
+    def test_perfect_response(self):
+        for metric in evaluation.METRICS.values():
+            self.assert_scores_equal((1, 1), metric(self.key, self.key))
+
+    def test_max_assignment_agrees_with_brute_force(self):
+        rng = numpy.random.RandomState(3)
+
+        for _ in range(50):
+            rows, columns = rng.randint(1, 6, 2)
+            similarity = rng.rand(rows, columns) * (rng.rand(rows, columns) >
+                                                    0.3)
+
+            self.assertAlmostEqual(_brute_force_assignment(similarity),
+                                   evaluation._max_assignment(similarity))
+
+    def test_ceafe_agrees_with_brute_force(self):
+        rng = random.Random(7)
+
+        for _ in range(30):
+            key = _random_partition(rng, range(8))
+            response = _random_partition(rng, range(2, 10))
+
+            similarity = numpy.array(
+                [[2 * len(key_cluster & response_cluster) /
+                  (len(key_cluster) + len(response_cluster))
+                  for response_cluster in response] for key_cluster in key])
+
+            self.assertEqual(
+                (_brute_force_assignment(similarity), len(key),
+                 _brute_force_assignment(similarity), len(response)),
+                tuple(round(count, 10) if isinstance(count, float) else count
+                      for count in evaluation.ceafe(key, response)))
+
+
+def _brute_force_assignment(similarity):
+    if similarity.shape[0] > similarity.shape[1]:
+        similarity = similarity.T
+
+    return round(max(
+        sum(similarity[i, j] for i, j in enumerate(permutation))
+        for permutation in itertools.permutations(
+            range(similarity.shape[1]), similarity.shape[0])), 10)
+
+
+def _random_partition(rng, mentions):
+    clusters = {}
+
+    for mention in mentions:
+        clusters.setdefault(rng.randint(0, 3), set()).add(mention)
+
+    return list(clusters.values())
+
+if __name__ == '__main__':
+    unittest.main()
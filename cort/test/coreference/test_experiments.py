@@ -0,0 +1,163 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from cort.core import corpora
+from cort.core import mention_extractor
+from cort.coreference import clusterer
+from cort.coreference import cost_functions
+from cort.coreference import evaluation
+from cort.coreference import experiments
+from cort.coreference import features
+from cort.coreference import instance_extractors
+from cort.coreference.approaches import mention_pairs
+
+
+__author__ = 'smartschat'
+
+
+class TestExperiments(unittest.TestCase):
+    def setUp(self):
+        directory = os.path.dirname(os.path.realpath(__file__)) + \
+            "/../core/resources/"
+        self.corpus = corpora.Corpus.from_file(
+            "test", open(directory + "input.conll", "r"))
+        self.corpus.documents = self.corpus.documents[:1]
+
+        for doc in self.corpus:
+            doc.system_mentions = \
+                mention_extractor.extract_system_mentions(doc)
+
+        mention_features = [features.fine_type, features.gender,
+                            features.head]
+        pairwise_features = [features.exact_match,
+                             features.sentence_distance]
+
+        self.extractor = instance_extractors.InstanceExtractor(
+            mention_pairs.extract_training_substructures,
+            mention_features,
+            pairwise_features,
+            cost_functions.cost_based_on_consistency
+        )
+
+        self.dev_extractor = instance_extractors.InstanceExtractor(
+            mention_pairs.extract_testing_substructures,
+            mention_features,
+            pairwise_features,
+            cost_functions.null_cost
+        )
+
+    def test_sweep(self):
+        configurations = [
+            {"perceptron": mention_pairs.MentionPairsPerceptron,
+             "n_iter": 2, "seed": seed}
+            for seed in [1, 2, 3]]
+
+        results, (priors, weights) = experiments.sweep(
+            self.corpus, self.extractor, configurations, self.corpus,
+            self.dev_extractor, clusterer.best_first, n_processes=2)
+
+        self.assertEqual(configurations,
+                         [configuration for configuration, _, _ in results])
+
+        best = max(results, key=lambda result: result[1])
+
+        # the best model is the model learned by learn for the best
+        # configuration
+        arguments = dict(best[0])
+        perceptron = arguments.pop("perceptron")(**arguments)
+        expected_priors, expected_weights = experiments.learn(
+            self.corpus, self.extractor, perceptron,
+            dev_corpus=self.corpus, dev_instance_extractor=self.dev_extractor,
+            coref_extractor=clusterer.best_first)
+
+        self.assertEqual(dict(expected_priors), dict(priors))
+        for label in expected_weights:
+            self.assertTrue(numpy.array_equal(expected_weights[label],
+                                              weights[label]))
+
+    def test_sweep_keeps_given_directory(self):
+        directory = tempfile.mkdtemp()
+
+        try:
+            with open(os.path.join(directory, "notes.txt"), "w") as notes:
+                notes.write("keep me")
+
+            experiments.sweep(
+                self.corpus, self.extractor,
+                [{"perceptron": mention_pairs.MentionPairsPerceptron,
+                  "n_iter": 1}],
+                self.corpus, self.dev_extractor, clusterer.best_first,
+                n_processes=1, directory=directory)
+
+            self.assertEqual(["notes.txt"], os.listdir(directory))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_learn_requires_dev_extractors(self):
+        perceptron = mention_pairs.MentionPairsPerceptron(n_iter=1)
+
+        self.assertRaises(ValueError, experiments.learn, self.corpus,
+                          self.extractor, perceptron, dev_corpus=self.corpus,
+                          coref_extractor=clusterer.best_first)
+        self.assertRaises(ValueError, experiments.learn, self.corpus,
+                          self.extractor, perceptron, dev_corpus=self.corpus,
+                          dev_instance_extractor=self.dev_extractor)
+
+    def test_predict_in_batches(self):
+        directory = os.path.dirname(os.path.realpath(__file__)) + \
+            "/../core/resources/"
+        corpus = corpora.Corpus.from_file(
+            "test", open(directory + "input.conll", "r"))
+
+        for doc in corpus:
+            doc.system_mentions = \
+                mention_extractor.extract_system_mentions(doc)
+
+        perceptron = mention_pairs.MentionPairsPerceptron(n_iter=2)
+        perceptron.priors, perceptron.weights = experiments.learn(
+            corpus, self.extractor, perceptron)
+
+        expected = experiments.predict(corpus, self.dev_extractor,
+                                       perceptron, clusterer.best_first)
+
+        for batch_size in [1, 2]:
+            self.assertEqual(
+                expected,
+                experiments.predict(corpus, self.dev_extractor, perceptron,
+                                    clusterer.best_first,
+                                    batch_size=batch_size))
+
+    def test_analyze_templates(self):
+        perceptron = mention_pairs.MentionPairsPerceptron(n_iter=2)
+        perceptron.priors, perceptron.weights = experiments.learn(
+            self.corpus, self.extractor, perceptron)
+
+        mass, occurrences, evaluations = experiments.analyze_templates(
+            self.corpus, self.dev_extractor, perceptron,
+            clusterer.best_first, [0.01, 1.1])
+
+        self.assertEqual(9, len(mass))
+        self.assertEqual([0, 0.01, 1.1],
+                         [evaluation["threshold"]
+                          for evaluation in evaluations])
+
+        # skipping no templates reproduces the predictions of the model
+        mention_entity_mapping, _ = experiments.predict(
+            self.corpus, self.dev_extractor, perceptron,
+            clusterer.best_first)
+        self.assertEqual(
+            evaluation.conll_score(self.corpus, mention_entity_mapping),
+            evaluations[0]["score"])
+        self.assertEqual([], evaluations[0]["skipped"])
+        self.assertEqual(0.0, evaluations[0]["score_delta"])
+
+        # skipping all templates
+        self.assertEqual(9, len(evaluations[-1]["skipped"]))
+        self.assertEqual(0, evaluations[-1]["features"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from cort.core import corpora
+from cort.core import mention_extractor
+from cort.coreference import candidates
+from cort.coreference import cost_functions
+from cort.coreference import feature_cache
+from cort.coreference import features
+from cort.coreference import instance_extractors
+from cort.coreference.approaches import mention_pairs
+
+
+__author__ = 'smartschat'
+
+
+class TestFeatureCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        directory = os.path.dirname(os.path.realpath(__file__)) + \
+            "/../core/resources/"
+        corpus = corpora.Corpus.from_file(
+            "test", open(directory + "input.conll", "r"))
+        corpus.documents = corpus.documents[:2]
+
+        for doc in corpus:
+            doc.system_mentions = \
+                mention_extractor.extract_system_mentions(doc)
+
+        cls.corpus = corpus
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = feature_cache.FeatureCache(self.directory)
+
+        self.extractor = instance_extractors.InstanceExtractor(
+            mention_pairs.extract_training_substructures,
+            [features.fine_type, features.head],
+            [features.exact_match, features.alias],
+            cost_functions.cost_based_on_consistency,
+            feature_cache=self.cache
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_cached_extraction(self):
+        extracted = self.extractor.extract_store(self.corpus)
+
+        self.assertEqual(len(self.corpus.documents),
+                         len(os.listdir(self.directory)))
+
+        fingerprint = feature_cache.fingerprint(self.extractor)
+        for doc in self.corpus:
+            self.assertTrue(isinstance(self.cache.load(doc, fingerprint)[2],
+                                       numpy.memmap))
+
+        loaded = self.extractor.extract_store(self.corpus)
+
+        for name in ["features", "arc_offsets", "substructure_offsets",
+                     "document_offsets", "anaphors", "antecedents", "costs",
+                     "consistency"]:
+            self.assertTrue(numpy.array_equal(getattr(extracted, name),
+                                              getattr(loaded, name)))
+
+        expected = [struct for doc in self.corpus
+                    for struct in self.extractor.extract_substructures(doc)]
+        actual = [[loaded.mention_pair(arc) for arc in arcs]
+                  for arcs in loaded.substructures]
+
+        self.assertEqual(len(expected), len(actual))
+        self.assertTrue(expected == actual)
+
+        stores = list(self.extractor.extract_stores(self.corpus))
+
+        for store in stores:
+            self.assertTrue(isinstance(store.features.base, numpy.memmap))
+
+        self.assertTrue(numpy.array_equal(
+            loaded.features, numpy.concatenate([store.features
+                                                for store in stores])))
+
+    def test_partially_cached_extraction(self):
+        expected = self.extractor.extract_store(self.corpus)
+
+        fingerprint = feature_cache.fingerprint(self.extractor)
+        shutil.rmtree(os.path.join(
+            self.directory,
+            feature_cache.document_hash(self.corpus.documents[0]) + "-" +
+            fingerprint))
+
+        loaded = self.extractor.extract_store(self.corpus)
+
+        self.assertTrue(numpy.array_equal(expected.features, loaded.features))
+        self.assertTrue(numpy.array_equal(expected.document_offsets,
+                                          loaded.document_offsets))
+
+    def test_fingerprint(self):
+        fingerprint = feature_cache.fingerprint(self.extractor)
+
+        self.assertEqual(fingerprint,
+                         feature_cache.fingerprint(self.extractor))
+
+        self.extractor.pairwise_features = [features.exact_match]
+        self.assertNotEqual(fingerprint,
+                            feature_cache.fingerprint(self.extractor))
+
+        self.extractor.pairwise_features = [features.exact_match,
+                                            features.alias]
+        self.extractor.candidate_policy = candidates.MentionDistance(3)
+        self.assertNotEqual(fingerprint,
+                            feature_cache.fingerprint(self.extractor))
+
+        self.extractor.candidate_policy = None
+        self.extractor.feature_hashing = "integer"
+        self.assertNotEqual(fingerprint,
+                            feature_cache.fingerprint(self.extractor))
+
+        self.extractor.feature_hashing = "string"
+        self.extractor.dropped_templates = [1]
+        self.assertNotEqual(fingerprint,
+                            feature_cache.fingerprint(self.extractor))
+
+        self.extractor.dropped_templates = []
+        self.assertEqual(fingerprint,
+                         feature_cache.fingerprint(self.extractor))
+
+    def test_fingerprint_covers_helper_modules(self):
+        described = [name for name, _ in
+                     feature_cache._module_sources(features.alias)]
+
+        self.assertEqual("cort.coreference.features", described[0])
+        self.assertIn("cort.coreference.blocking", described)
+
+    def test_document_hash(self):
+        doc = self.corpus.documents[0]
+
+        self.assertNotEqual(feature_cache.document_hash(doc),
+                            feature_cache.document_hash(
+                                self.corpus.documents[1]))
+
+        system_mentions = doc.system_mentions
+        doc_hash = feature_cache.document_hash(doc)
+
+        doc.system_mentions = system_mentions[:-1]
+        try:
+            self.assertNotEqual(doc_hash, feature_cache.document_hash(doc))
+        finally:
+            doc.system_mentions = system_mentions
+
+        self.assertEqual(doc_hash, feature_cache.document_hash(doc))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+import numpy
+
+from cort.coreference import feature_hashing
+
+
+__author__ = 'smartschat'
+
+
+class TestFeatureHashing(unittest.TestCase):
+    def test_prefix_constants(self):
+        self.assertEqual(feature_hashing.hash_string("ana_"),
+                         feature_hashing.ANAPHOR)
+        self.assertEqual(feature_hashing.hash_string("ante_"),
+                         feature_hashing.ANTECEDENT)
+
+    def test_hash_string(self):
+        self.assertEqual(feature_hashing.hash_string("head=man"),
+                         feature_hashing.hash_string("head=man"))
+        self.assertNotEqual(feature_hashing.hash_string("head=man"),
+                            feature_hashing.hash_string("head=woman"))
+
+    def test_combine(self):
+        first = feature_hashing.hash_string("fine_type=NAM")
+        second = feature_hashing.hash_string("gender=MALE")
+
+        self.assertEqual(feature_hashing.combine(first, second),
+                         feature_hashing.combine(first, second))
+        self.assertNotEqual(feature_hashing.combine(first, second),
+                            feature_hashing.combine(second, first))
+
+        combined = feature_hashing.combine(
+            numpy.array([[first], [second]], dtype=numpy.uint64),
+            numpy.array([first, second], dtype=numpy.uint64))
+
+        self.assertEqual((2, 2), combined.shape)
+        self.assertEqual(numpy.uint64, combined.dtype)
+        self.assertEqual(feature_hashing.combine(second, first),
+                         combined[1, 0])
+
+    def test_to_feature_indices(self):
+        indices = feature_hashing.to_feature_indices(
+            numpy.array([0, 2**24, 2**64 - 1], dtype=numpy.uint64))
+
+        self.assertEqual([0, 0, 2**24 - 1], list(indices))
+        self.assertEqual(numpy.uint32, indices.dtype)
+
+if __name__ == '__main__':
+    unittest.main()
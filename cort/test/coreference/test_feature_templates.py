@@ -0,0 +1,229 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from cort.core import corpora
+from cort.core import mention_extractor
+from cort.coreference import cost_functions
+from cort.coreference import feature_templates
+from cort.coreference import features
+from cort.coreference import instance_extractors
+from cort.coreference.approaches import mention_pairs
+
+
+__author__ = 'smartschat'
+
+
+class TestFeatureTemplates(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        directory = os.path.dirname(os.path.realpath(__file__)) + \
+            "/../core/resources/"
+        corpus = corpora.Corpus.from_file(
+            "test", open(directory + "input.conll", "r"))
+        corpus.documents = corpus.documents[:2]
+
+        for doc in corpus:
+            doc.system_mentions = \
+                mention_extractor.extract_system_mentions(doc)
+
+        cls.corpus = corpus
+
+    def extractor(self, mention_features, pairwise_features,
+                  feature_hashing="string"):
+        return instance_extractors.InstanceExtractor(
+            mention_pairs.extract_training_substructures,
+            mention_features,
+            pairwise_features,
+            cost_functions.cost_based_on_consistency,
+            feature_hashing=feature_hashing,
+            store_templates=True
+        )
+
+    def arc_features(self, store):
+        return [sorted(store[arc][0].tolist()) for arc in range(len(store))]
+
+    def test_names(self):
+        self.assertEqual(
+            ["fine_type", "head", "exact_match", "fine_type^head",
+             "fine_type^exact_match"],
+            feature_templates.names([features.fine_type, features.head],
+                                    [features.exact_match]))
+
+        self.assertEqual(
+            ["exact_match"],
+            feature_templates.names([], [features.exact_match]))
+
+    def test_column_templates(self):
+        self.assertEqual(
+            [0, 1, 0, 1, 0, 1, 2, 3, 3, 3, 4, 3, 3, 3, 4, 3, 3, 3, 4],
+            list(feature_templates.column_templates(2, 1)))
+
+        fired = feature_templates.fired_columns(
+            2, numpy.array([[True], [False]]))
+
+        self.assertEqual((2, 19), fired.shape)
+        self.assertTrue(fired[0].all())
+        self.assertEqual(
+            [0, 1, 0, 1, 0, 1, 3, 3, 3, 3, 3, 3, 3, 3, 3],
+            list(feature_templates.arc_templates(2, 1, fired[1:])))
+
+    def test_templates_are_stored(self):
+        mention_features = [features.fine_type, features.head]
+        pairwise_features = [features.exact_match, features.alias]
+
+        for feature_hashing in ["string", "integer"]:
+            store = self.extractor(mention_features, pairwise_features,
+                                   feature_hashing).extract_store(self.corpus)
+
+            self.assertEqual(len(store.features),
+                             len(store.feature_templates))
+            self.assertEqual(
+                set(range(2*len(mention_features + pairwise_features) - 1)),
+                set(store.feature_templates.tolist()))
+
+    def test_ablation(self):
+        mention_features = [features.fine_type, features.gender,
+                            features.head]
+        pairwise_features = [features.exact_match, features.alias,
+                             features.sentence_distance]
+
+        for feature_hashing in ["string", "integer"]:
+            store = self.extractor(mention_features, pairwise_features,
+                                   feature_hashing).extract_store(self.corpus)
+
+            for removed in [["gender"], ["alias", "head"]]:
+                ablated = store.select_templates(feature_templates.ablation(
+                    mention_features, pairwise_features, removed))
+
+                expected = self.extractor(
+                    [f for f in mention_features
+                     if f.__name__ not in removed],
+                    [f for f in pairwise_features
+                     if f.__name__ not in removed],
+                    feature_hashing).extract_store(self.corpus)
+
+                self.assertTrue(numpy.array_equal(expected.arc_offsets,
+                                                  ablated.arc_offsets))
+                self.assertEqual(self.arc_features(expected),
+                                 self.arc_features(ablated))
+
+    def test_ablation_of_first_feature(self):
+        self.assertEqual(
+            [1, 2],
+            feature_templates.ablation([features.fine_type, features.head],
+                                       [features.exact_match],
+                                       ["fine_type"]))
+
+        self.assertRaises(ValueError, feature_templates.ablation,
+                          [features.fine_type], [], ["soundex"])
+
+    def test_select_without_templates(self):
+        extractor = self.extractor([features.fine_type],
+                                   [features.exact_match])
+        extractor.store_templates = False
+
+        store = extractor.extract_store(self.corpus)
+
+        self.assertEqual(0, len(store.feature_templates))
+        self.assertRaises(ValueError, store.select_templates, [0])
+
+    def test_weight_mass(self):
+        mention_features = [features.fine_type, features.head]
+        pairwise_features = [features.exact_match]
+
+        store = self.extractor(mention_features,
+                               pairwise_features).extract_store(self.corpus)
+
+        weights = {"+": numpy.zeros(2**24), "-": numpy.zeros(2**24)}
+        weights["+"][store.features[store.feature_templates == 1]] = -0.5
+        weights["-"][store.features[store.feature_templates == 2]] = 2.0
+
+        mass, occurrences = feature_templates.weight_mass(
+            store, weights, mention_features, pairwise_features)
+
+        expected = [0.0]*5
+
+        for feature, template in zip(store.features.tolist(),
+                                     store.feature_templates.tolist()):
+            expected[template] += abs(weights["+"][feature]) + \
+                abs(weights["-"][feature])
+
+        self.assertEqual(expected, mass.tolist())
+        self.assertEqual(numpy.sum(store.feature_templates == 2)*2.0,
+                         mass[2])
+        self.assertEqual(
+            numpy.bincount(store.feature_templates).tolist(),
+            occurrences.tolist())
+
+        self.assertEqual([0, 3, 4],
+                         feature_templates.below_threshold(mass, 0.005))
+        self.assertEqual([], feature_templates.below_threshold(mass, 0))
+
+    def test_prune(self):
+        mention_features = [features.fine_type, features.gender,
+                            features.head]
+        pairwise_features = [features.exact_match, features.alias,
+                             features.sentence_distance]
+
+        self.assertEqual(
+            ([features.fine_type, features.gender],
+             [features.exact_match, features.alias,
+              features.sentence_distance],
+             [6]),
+            feature_templates.prune(mention_features, pairwise_features,
+                                    [2, 7, 8]))
+
+        for feature_hashing in ["string", "integer"]:
+            store = self.extractor(mention_features, pairwise_features,
+                                   feature_hashing).extract_store(self.corpus)
+
+            for skipped in [[0], [1, 6], [2, 7, 8], [3, 4, 9],
+                            list(range(1, 11))]:
+                pruned_mention_features, pruned_pairwise_features, \
+                    dropped = feature_templates.prune(
+                        mention_features, pairwise_features, skipped)
+
+                extractor = self.extractor(pruned_mention_features,
+                                           pruned_pairwise_features,
+                                           feature_hashing)
+                extractor.store_templates = False
+                extractor.dropped_templates = dropped
+
+                pruned = extractor.extract_store(self.corpus)
+
+                expected = store.select_templates(
+                    [template for template in range(11)
+                     if template not in skipped])
+
+                self.assertTrue(numpy.array_equal(expected.arc_offsets,
+                                                  pruned.arc_offsets))
+                self.assertEqual(self.arc_features(expected),
+                                 self.arc_features(pruned))
+
+    def test_save_and_load_weight_mass(self):
+        mention_features = [features.fine_type]
+        pairwise_features = [features.exact_match]
+
+        path = os.path.join(tempfile.mkdtemp(), "mass.json")
+
+        try:
+            feature_templates.save_weight_mass(
+                path, mention_features, pairwise_features,
+                numpy.array([3.0, 0.5, 0.0]), numpy.array([10, 2, 2]))
+
+            self.assertEqual(
+                [3.0, 0.5, 0.0],
+                feature_templates.load_weight_mass(
+                    path, mention_features, pairwise_features).tolist())
+
+            self.assertRaises(ValueError, feature_templates.load_weight_mass,
+                              path, mention_features, [features.alias])
+        finally:
+            shutil.rmtree(os.path.dirname(path))
+
+if __name__ == '__main__':
+    unittest.main()
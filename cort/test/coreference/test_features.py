@@ -0,0 +1,83 @@
+import os
+import unittest
+
+import numpy
+
+from cort.core import corpora
+from cort.core import mention_arrays
+from cort.core import mention_extractor
+from cort.coreference import features
+from cort.coreference.approaches import mention_pairs
+
+
+__author__ = 'smartschat'
+
+
+class TestVectorizedFeatures(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        directory = os.path.dirname(os.path.realpath(__file__)) + \
+            "/../core/resources/"
+        corpus = corpora.Corpus.from_file(
+            "test", open(directory + "input.conll", "r"))
+
+        cls.doc = corpus.documents[0]
+        cls.doc.system_mentions = \
+            mention_extractor.extract_system_mentions(cls.doc)
+
+        cls.arcs = [arc for struct in
+                    mention_pairs.extract_testing_substructures(cls.doc)
+                    for arc in struct]
+
+        ids = dict((mention, i) for i, mention
+                   in enumerate(cls.doc.system_mentions))
+
+        cls.mentions = mention_arrays.MentionArrays(cls.doc.system_mentions)
+        cls.anaphors = numpy.array([ids[arc[0]] for arc in cls.arcs])
+        cls.antecedents = numpy.array([ids[arc[1]] for arc in cls.arcs])
+
+    def assert_vectorized_equal(self, feature):
+        codes, values = feature.vectorized(self.mentions, self.anaphors,
+                                           self.antecedents)
+
+        self.assertEqual([feature(*arc) for arc in self.arcs],
+                         [values[code] if code >= 0 else None
+                          for code in codes])
+
+    def test_exact_match(self):
+        self.assert_vectorized_equal(features.exact_match)
+
+    def test_head_match(self):
+        self.assert_vectorized_equal(features.head_match)
+
+    def test_same_speaker(self):
+        self.assert_vectorized_equal(features.same_speaker)
+
+    def test_sentence_distance(self):
+        self.assert_vectorized_equal(features.sentence_distance)
+
+    def test_embedding(self):
+        self.assert_vectorized_equal(features.embedding)
+
+    def test_modifier(self):
+        self.assert_vectorized_equal(features.modifier)
+
+    def test_alias(self):
+        self.assert_vectorized_equal(features.alias)
+
+    def test_fallback(self):
+        def same_sentence(anaphor, antecedent):
+            if (anaphor.attributes["sentence_id"] ==
+                    antecedent.attributes["sentence_id"]):
+                return "same_sentence"
+
+        (codes, values), _ = features.compute_pairwise_features(
+            [same_sentence, features.head_match], self.mentions,
+            self.anaphors, self.antecedents)
+
+        self.assertEqual([same_sentence(*arc) for arc in self.arcs],
+                         [values[code] if code >= 0 else None
+                          for code in codes])
+
+if __name__ == '__main__':
+    unittest.main()
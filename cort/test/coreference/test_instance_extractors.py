@@ -0,0 +1,161 @@
+import array
+import os
+import unittest
+
+import numpy
+
+from cort.core import corpora
+from cort.core import mention_extractor
+from cort.coreference import cost_functions
+from cort.coreference import feature_hashing
+from cort.coreference import features
+from cort.coreference import instance_extractors
+from cort.coreference.approaches import mention_pairs
+from cort.util import multiprocessing as cort_multiprocessing
+
+
+__author__ = 'smartschat'
+
+
+class TestInstanceExtractor(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        directory = os.path.dirname(os.path.realpath(__file__)) + \
+            "/../core/resources/"
+        corpus = corpora.Corpus.from_file(
+            "test", open(directory + "input.conll", "r"))
+        corpus.documents = corpus.documents[:2]
+
+        for doc in corpus:
+            doc.system_mentions = \
+                mention_extractor.extract_system_mentions(doc)
+
+        cls.corpus = corpus
+
+    def setUp(self):
+        self.extractor = instance_extractors.InstanceExtractor(
+            mention_pairs.extract_training_substructures,
+            [features.fine_type, features.gender, features.head],
+            [features.exact_match, features.sentence_distance],
+            cost_functions.cost_based_on_consistency
+        )
+
+    def test_extract_forked(self):
+        substructures, arc_information = self.extractor.extract(self.corpus)
+
+        expected = []
+        for doc in self.corpus:
+            expected.extend(
+                self.extractor.extract_substructures(doc))
+
+        self.assertEqual(expected, substructures)
+
+        cache = {}
+        for struct in substructures:
+            for arc in struct:
+                arc_features, costs, consistent = arc_information[arc]
+                self.assertEqual(
+                    list(self.extractor._extract_features(arc, cache)),
+                    list(arc_features))
+                self.assertEqual(self.extractor.cost_function(arc), costs)
+                self.assertEqual(arc[0].decision_is_consistent(arc[1]),
+                                 consistent)
+
+    def test_costs_without_vectorized_cost_function(self):
+        expected = self.extractor.extract_store(self.corpus)
+
+        self.extractor.cost_function = \
+            lambda arc: cost_functions.cost_based_on_consistency(arc)
+        store = self.extractor.extract_store(self.corpus)
+
+        self.assertTrue(numpy.array_equal(expected.costs, store.costs))
+        self.assertTrue(numpy.array_equal(expected.consistency,
+                                          store.consistency))
+
+        self.extractor.cost_function = cost_functions.null_cost
+        store = self.extractor.extract_store(self.corpus)
+
+        self.assertEqual(0, store.costs.max())
+        self.assertTrue(0 < expected.costs.max())
+
+    def test_extract_stores(self):
+        store = self.extractor.extract_store(self.corpus)
+
+        batches = list(self.extractor.extract_stores(self.corpus,
+                                                     batch_size=1))
+
+        self.assertEqual(len(self.corpus.documents), len(batches))
+        self.assertEqual(
+            list(store.features),
+            [feature for batch in batches for feature in batch.features])
+        self.assertEqual(
+            store.mention_pairs(store.substructures),
+            [struct for batch in batches
+             for struct in batch.mention_pairs(batch.substructures)])
+
+    def test_extract_integer_hashing(self):
+        self.extractor.feature_hashing = "integer"
+        doc = self.corpus.documents[0]
+
+        (_, anaphors, antecedents, arc_features, _, _, feature_mapping,
+         _, _, _) = self.extractor._extract_doc(doc)
+
+        for i in [0, len(anaphors) // 2, len(anaphors) - 1]:
+            anaphor = doc.system_mentions[anaphors[i]]
+            antecedent = doc.system_mentions[antecedents[i]]
+
+            hashes = [feature_hashing.combine(
+                feature_hashing.ANAPHOR,
+                feature_hashing.hash_string(feature(anaphor)))
+                for feature in self.extractor.mention_features]
+            hashes += [feature_hashing.combine(
+                feature_hashing.ANTECEDENT,
+                feature_hashing.hash_string(feature(antecedent)))
+                for feature in self.extractor.mention_features]
+            hashes += [feature_hashing.combine(hashes[j], hashes[j + 3])
+                       for j in range(3)]
+            hashes += [feature_hashing.hash_string(feature(anaphor,
+                                                           antecedent))
+                       for feature in self.extractor.pairwise_features
+                       if feature(anaphor, antecedent)]
+            hashes += [feature_hashing.combine(hashes[j], hashes[k])
+                       for j in [0, 3, 6] for k in range(len(hashes))
+                       if k not in [0, 3, 6]]
+
+            self.assertEqual(
+                list(feature_hashing.to_feature_indices(
+                    numpy.array(hashes, dtype=numpy.uint64))),
+                list(arc_features[feature_mapping[i]:feature_mapping[i+1]]))
+
+    def test_unknown_worker_mode(self):
+        self.assertRaises(ValueError,
+                          instance_extractors.InstanceExtractor,
+                          mention_pairs.extract_training_substructures,
+                          [], [], cost_functions.null_cost, "threads")
+
+    def test_unknown_feature_hashing(self):
+        self.assertRaises(ValueError,
+                          instance_extractors.InstanceExtractor,
+                          mention_pairs.extract_training_substructures,
+                          [], [], cost_functions.null_cost,
+                          feature_hashing="md5")
+
+    def test_arrays_via_shared_memory(self):
+        arrays = [array.array("I", [1, 2, 3]),
+                  array.array("B", []),
+                  array.array("l", [-5, 2**40])]
+
+        name, layout = cort_multiprocessing.arrays_to_shared_memory(arrays)
+
+        self.assertEqual([("I", 3), ("B", 0), ("l", 2)], layout)
+
+        shared = cort_multiprocessing.arrays_from_shared_memory(name, layout)
+
+        self.assertEqual([a.tolist() for a in arrays],
+                         [a.tolist() for a in shared])
+        self.assertEqual([numpy.dtype("I"), numpy.dtype("B"),
+                          numpy.dtype("l")], [a.dtype for a in shared])
+        self.assertTrue(all(a.flags.aligned for a in shared))
+
+if __name__ == '__main__':
+    unittest.main()
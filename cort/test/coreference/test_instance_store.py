@@ -0,0 +1,293 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from cort.core import corpora
+from cort.core import mention_extractor
+from cort.coreference import cost_functions
+from cort.coreference import features
+from cort.coreference import instance_extractors
+from cort.coreference import instance_store
+from cort.coreference.approaches import mention_pairs
+
+
+__author__ = 'smartschat'
+
+
+class TestInstanceStore(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        directory = os.path.dirname(os.path.realpath(__file__)) + \
+            "/../core/resources/"
+        corpus = corpora.Corpus.from_file(
+            "test", open(directory + "input.conll", "r"))
+        corpus.documents = corpus.documents[:2]
+
+        for doc in corpus:
+            doc.system_mentions = \
+                mention_extractor.extract_system_mentions(doc)
+
+        cls.corpus = corpus
+
+        cls.extractor = instance_extractors.InstanceExtractor(
+            mention_pairs.extract_training_substructures,
+            [features.fine_type, features.gender, features.head],
+            [features.exact_match, features.sentence_distance],
+            cost_functions.cost_based_on_consistency
+        )
+
+        cls.store = cls.extractor.extract_store(corpus)
+
+    def test_layout(self):
+        expected = []
+        for doc in self.corpus:
+            expected.extend(self.extractor.extract_substructures(doc))
+
+        self.assertEqual(len(expected), len(self.store.substructures))
+        self.assertEqual(sum(len(struct) for struct in expected),
+                         len(self.store))
+        self.assertEqual(len(self.store) + 1, len(self.store.arc_offsets))
+        self.assertEqual(len(self.store.features),
+                         self.store.arc_offsets[-1])
+        self.assertEqual(len(self.store),
+                         self.store.document_offsets[-1])
+
+        for struct, arcs in zip(expected, self.store.substructures):
+            self.assertEqual(struct,
+                             [self.store.mention_pair(arc) for arc in arcs])
+
+    def test_arc_information(self):
+        cache = {}
+
+        for arc in [0, len(self.store) // 2, len(self.store) - 1]:
+            pair = self.store.mention_pair(arc)
+            arc_features, costs, consistent = self.store[arc]
+
+            self.assertEqual(
+                list(self.extractor._extract_features(pair, cache)),
+                list(arc_features))
+            self.assertEqual(self.extractor.cost_function(pair), costs)
+            self.assertEqual(pair[0].decision_is_consistent(pair[1]),
+                             consistent)
+
+    def test_sum_weights(self):
+        weights = numpy.random.RandomState(0).randint(
+            -5, 5, 2**24).astype(float)
+        arcs = numpy.array([len(self.store) - 1, 0, 3, 3])
+
+        self.assertEqual(
+            [weights[self.store[arc][0]].sum() for arc in arcs],
+            list(self.store.sum_weights(weights, arcs)))
+
+        matrix = numpy.random.RandomState(1).rand(2, 2**24)
+        self.assertTrue(numpy.array_equal(
+            [self.store.sum_weights(row, arcs) for row in matrix],
+            self.store.sum_weights(matrix, arcs)))
+
+    def test_to_arc_information(self):
+        substructures, arc_information = self.store.to_arc_information()
+
+        self.assertEqual(len(self.store.substructures), len(substructures))
+        self.assertEqual(len(self.store), len(arc_information))
+
+        arc = len(self.store) - 1
+        self.assertEqual(list(self.store[arc][0]),
+                         list(arc_information[substructures[-1][-1]][0]))
+
+    def test_perceptron(self):
+        substructures, arc_information = self.store.to_arc_information()
+
+        perceptron = mention_pairs.MentionPairsPerceptron(n_iter=2)
+        priors, weights = perceptron.fit(substructures, arc_information)
+
+        store_perceptron = mention_pairs.MentionPairsPerceptron(n_iter=2)
+        store_priors, store_weights = store_perceptron.fit(self.store)
+
+        self.assertEqual(priors, store_priors)
+        for label in weights:
+            self.assertTrue(numpy.array_equal(weights[label],
+                                              store_weights[label]))
+
+        self.assertEqual(perceptron.predict(substructures, arc_information),
+                         store_perceptron.predict(self.store))
+
+    def test_batched_prediction(self):
+        perceptron = mention_pairs.MentionPairsPerceptron(n_iter=2)
+        perceptron.fit(self.store)
+
+        extractor = instance_extractors.InstanceExtractor(
+            mention_pairs.extract_testing_substructures,
+            self.extractor.mention_features,
+            self.extractor.pairwise_features,
+            cost_functions.null_cost
+        )
+        store = extractor.extract_store(self.corpus)
+
+        scores = perceptron.score_arcs(store, "-")
+        label_scores = perceptron.score_arcs_by_label(store)
+        for arc in [0, len(store) // 2, len(store) - 1]:
+            self.assertEqual(perceptron.score_arc(store[arc][0], 0, "-"),
+                             scores[arc])
+            self.assertEqual(
+                perceptron.score_arc_by_label(store[arc][0], 0),
+                list(label_scores[:, arc]))
+
+        batched = perceptron.predict(store)
+
+        perceptron._predict_store = lambda instances: None
+        self.assertEqual(perceptron.predict(store), batched)
+
+    def test_perceptron_updates_of_many_epochs(self):
+        substructures, arc_information = self.store.to_arc_information()
+
+        perceptron = mention_pairs.MentionPairsPerceptron(n_iter=8,
+                                                          cost_scaling=2)
+        priors, weights = perceptron.fit(substructures, arc_information)
+
+        store_perceptron = mention_pairs.MentionPairsPerceptron(
+            n_iter=8, cost_scaling=2)
+        store_priors, store_weights = store_perceptron.fit(self.store)
+
+        self.assertEqual(priors, store_priors)
+        for label in weights:
+            self.assertTrue(numpy.array_equal(weights[label],
+                                              store_weights[label]))
+
+    def test_fit_parallel(self):
+        perceptron = mention_pairs.MentionPairsPerceptron(n_iter=2)
+        priors, weights = perceptron.fit(self.store)
+
+        # with one shard, parameter mixing reduces to fit
+        mixed = mention_pairs.MentionPairsPerceptron(n_iter=2)
+        mixed_priors, mixed_weights = mixed.fit_parallel(self.store,
+                                                         n_shards=1)
+
+        for label in weights:
+            self.assertAlmostEqual(priors[label], mixed_priors[label])
+            self.assertTrue(numpy.allclose(weights[label],
+                                           mixed_weights[label]))
+
+        parallel = [mention_pairs.MentionPairsPerceptron(n_iter=2)
+                    for _ in range(2)]
+        models = [parallel_perceptron.fit_parallel(self.store, n_shards=2)
+                  for parallel_perceptron in parallel]
+
+        self.assertEqual(models[0][0], models[1][0])
+        for label in weights:
+            self.assertTrue(numpy.array_equal(models[0][1][label],
+                                              models[1][1][label]))
+
+        self.assertFalse(numpy.allclose(weights["+"], models[0][1]["+"]))
+
+        # fit_parallel sets the mixed model, which differs from the serial one
+        reference = mention_pairs.MentionPairsPerceptron(
+            priors=models[0][0], weights=models[0][1])
+        _, labels, scores = parallel[0].predict(self.store)
+
+        self.assertEqual(reference.predict(self.store)[1:], (labels, scores))
+        self.assertNotEqual(perceptron.predict(self.store)[2], scores)
+
+    def test_early_stopping(self):
+        perceptron = mention_pairs.MentionPairsPerceptron(n_iter=2)
+        priors, weights = perceptron.fit(self.store)
+
+        for fit, kwargs in [("fit", {}), ("fit_parallel", {"n_shards": 1})]:
+            scores = iter([1, 3, 2, 3, 4])
+            epochs = []
+
+            def evaluate(epoch_priors, epoch_weights):
+                epochs.append(len(epochs) + 1)
+                return next(scores)
+
+            stopped = mention_pairs.MentionPairsPerceptron(n_iter=5)
+            stopped_priors, stopped_weights = getattr(stopped, fit)(
+                self.store, evaluate=evaluate, patience=2, **kwargs)
+
+            # the score did not improve in epochs 3 and 4, and the model of
+            # epoch 2 is kept
+            self.assertEqual([1, 2, 3, 4], epochs)
+            for label in weights:
+                self.assertAlmostEqual(priors[label], stopped_priors[label])
+                self.assertTrue(numpy.allclose(weights[label],
+                                               stopped_weights[label]))
+
+            self.assertIs(stopped.weights, stopped_weights)
+
+    def test_fit_shards(self):
+        directory = tempfile.mkdtemp()
+
+        try:
+            shards = self.extractor.extract_shards(self.corpus, directory, 1)
+
+            self.assertEqual(len(self.corpus.documents), len(shards))
+            self.assertEqual(
+                list(self.store.features),
+                [feature for shard in shards for feature in shard.features])
+
+            # with a single shard and blocks of size 1, the order of
+            # substructures is the same as in fit
+            perceptron = mention_pairs.MentionPairsPerceptron(n_iter=2)
+            priors, weights = perceptron.fit(self.store)
+
+            shard_perceptron = mention_pairs.MentionPairsPerceptron(n_iter=2)
+            shard_priors, shard_weights = shard_perceptron.fit_shards(
+                [self.extractor.extract_store(self.corpus, directory)],
+                block_size=1)
+
+            self.assertEqual(priors, shard_priors)
+            self.assertTrue(numpy.array_equal(weights["+"],
+                                              shard_weights["+"]))
+
+            blocked = mention_pairs.MentionPairsPerceptron(n_iter=2)
+            blocked.fit_shards(shards, block_size=100)
+            self.assertTrue(numpy.any(blocked.weights["+"]))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_spilled_store(self):
+        directory = tempfile.mkdtemp()
+
+        try:
+            spilled = self.extractor.extract_store(self.corpus, directory)
+
+            self.assertTrue(isinstance(spilled.features, numpy.memmap))
+
+            for name, _ in instance_store.FIELDS:
+                self.assertTrue(numpy.array_equal(getattr(self.store, name),
+                                                  getattr(spilled, name)))
+
+            self.assertEqual(self.store.mention_pair(len(self.store) - 1),
+                             spilled.mention_pair(len(spilled) - 1))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_writer_without_arcs(self):
+        directory = tempfile.mkdtemp()
+
+        try:
+            writer = instance_store.InstanceStoreWriter(directory)
+            writer.append(self.corpus.documents[0],
+                          [numpy.zeros(0, dtype=numpy.uint32)] * 4 +
+                          [numpy.zeros(0, dtype=numpy.uint8),
+                           numpy.zeros(1, dtype=numpy.int64),
+                           numpy.zeros(1, dtype=numpy.int64),
+                           numpy.zeros(0, dtype=numpy.uint16)])
+            empty = writer.close()
+
+            self.assertEqual(0, len(empty))
+            self.assertEqual(0, len(empty.substructures))
+            self.assertEqual([0, 0], list(empty.document_offsets))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_substructure_view(self):
+        view = self.store.substructures
+
+        self.assertEqual(view[len(view) - 1], view[-1])
+        self.assertRaises(IndexError, view.__getitem__, len(view))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import pickle
+import unittest
+
+import numpy
+
+from cort.coreference import label_weights
+
+
+__author__ = 'smartschat'
+
+
+class TestLabelWeights(unittest.TestCase):
+    def setUp(self):
+        self.weights = label_weights.LabelWeights(["+", "-"], 100)
+        self.weights.matrix[:] = numpy.random.RandomState(0).rand(2, 100)
+
+    def test_mapping(self):
+        self.assertEqual(["+", "-"], list(self.weights))
+        self.assertEqual(2, len(self.weights))
+        self.assertIn("-", self.weights)
+        self.assertNotIn("x", self.weights)
+        self.assertTrue(numpy.array_equal(self.weights.matrix[1],
+                                          self.weights["-"]))
+
+    def test_rows_are_views(self):
+        self.weights["-"][[3, 5]] += 1
+        self.weights["+"] = numpy.zeros(100)
+
+        self.assertEqual(0, self.weights.matrix[0].sum())
+        self.assertEqual(self.weights["-"][3], self.weights.matrix[1, 3])
+
+    def test_add_and_remove_labels(self):
+        self.weights["x"] = numpy.ones(100)
+
+        self.assertEqual(["+", "-", "x"], self.weights.labels)
+        self.assertEqual((3, 100), self.weights.matrix.shape)
+
+        del self.weights["+"]
+
+        self.assertEqual(["-", "x"], self.weights.labels)
+        self.assertTrue(numpy.array_equal(numpy.ones(100), self.weights["x"]))
+
+    def test_sum(self):
+        rng = numpy.random.RandomState(1)
+
+        for length in range(40):
+            features = rng.randint(0, 100, length)
+
+            for labels in [None, ["-", "+"], ["-"]]:
+                self.assertEqual(
+                    [self.weights[label].take(features).sum()
+                     for label in labels or self.weights.labels],
+                    list(self.weights.sum(features, labels)))
+
+    def test_from_dict(self):
+        weights = label_weights.LabelWeights.from_dict(
+            {label: self.weights[label] for label in ["-", "+"]})
+
+        self.assertEqual(["-", "+"], weights.labels)
+        self.assertTrue(numpy.array_equal(self.weights["+"], weights["+"]))
+
+        # the matrix is a copy
+        weights["+"][0] += 1
+        self.assertNotEqual(self.weights["+"][0], weights["+"][0])
+
+    def test_pickle(self):
+        weights = pickle.loads(pickle.dumps(self.weights))
+
+        self.assertEqual(self.weights.labels, weights.labels)
+        self.assertTrue(numpy.array_equal(self.weights["-"], weights["-"]))
+
+if __name__ == '__main__':
+    unittest.main()
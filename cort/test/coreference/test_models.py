@@ -0,0 +1,79 @@
+from collections import defaultdict
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from cort.coreference import models
+
+
+__author__ = 'smartschat'
+
+
+class TestModels(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+        self.priors = defaultdict(float, {"+": -1.5, "-": 1.5})
+        self.weights = {label: numpy.zeros(2**10) for label in self.priors}
+        self.weights["+"][[3, 17, 1000]] = [0.5, -2.25, 1/3]
+        self.weights["-"][[4, 17]] = [1.0, 2.0]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assert_model_equal(self, model, dtype=numpy.float64):
+        priors, weights = model
+
+        self.assertEqual(dict(self.priors), dict(priors))
+        self.assertEqual(sorted(self.weights), sorted(weights))
+
+        for label in self.weights:
+            self.assertEqual(dtype, weights[label].dtype)
+            self.assertTrue(numpy.array_equal(
+                self.weights[label].astype(dtype), weights[label]))
+
+    def test_layouts(self):
+        for layout in models.LAYOUTS:
+            path = os.path.join(self.directory, layout)
+            models.save(path, self.priors, self.weights, layout=layout)
+
+            self.assert_model_equal(models.load(path))
+
+    def test_dense_weights_are_memory_mapped(self):
+        models.save(self.directory, self.priors, self.weights,
+                    layout="dense")
+
+        priors, weights = models.load(self.directory)
+
+        self.assertTrue(isinstance(weights["+"], numpy.memmap))
+
+        # changes are not written back
+        weights["+"][3] += 1
+        self.assert_model_equal(models.load(self.directory))
+
+    def test_sparse_stores_nonzero_weights(self):
+        models.save(self.directory, self.priors, self.weights,
+                    dtype="float32")
+
+        self.assertEqual(3, len(numpy.load(
+            os.path.join(self.directory, "indices.0.npy"))))
+        self.assert_model_equal(models.load(self.directory), numpy.float32)
+
+    def test_pickle(self):
+        path = os.path.join(self.directory, "model.obj")
+        pickle.dump((self.priors, self.weights), open(path, "wb"))
+
+        self.assert_model_equal(models.load(path))
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, models.save, self.directory,
+                          self.priors, self.weights, layout="csv")
+        self.assertRaises(ValueError, models.save, self.directory,
+                          self.priors, self.weights, dtype="int8")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import unittest
+
+import numpy
+
+from cort.core import corpora
+from cort.core import mention_extractor
+from cort.coreference import cost_functions
+from cort.coreference import features
+from cort.coreference import instance_extractors
+from cort.coreference import profiling
+from cort.coreference.approaches import mention_pairs
+
+
+__author__ = 'smartschat'
+
+
+class TestFeatureProfile(unittest.TestCase):
+    def test_record_and_merge(self):
+        profile = profiling.FeatureProfile()
+        profile.record("alias", 0.5, calls=10, fired=2)
+        profile.record("[hashing]", 0.125)
+
+        other = profiling.FeatureProfile()
+        other.documents = 1
+        other.record("alias", 0.25, calls=10, fired=3)
+
+        profile.merge(other)
+
+        self.assertEqual(1, profile.documents)
+        self.assertEqual(0.75, profile.times["alias"])
+        self.assertEqual(20, profile.calls["alias"])
+        self.assertEqual(5, profile.fired["alias"])
+        self.assertEqual(1, profile.calls["[hashing]"])
+        self.assertTrue("[hashing]" not in profile.fired)
+
+    def test_collisions(self):
+        profile = profiling.FeatureProfile()
+
+        profile.record_features(["head", "alias"],
+                                numpy.array([0, 0, 0, 1]),
+                                ["ana_a", "ana_b", "ana_c", "alias"],
+                                numpy.array([1, 1, 2, 2]))
+
+        other = profiling.FeatureProfile()
+        other.record_features(["head", "alias"],
+                              numpy.array([0]),
+                              ["ana_d"],
+                              numpy.array([3]))
+        profile.merge(other)
+
+        self.assertEqual({"head": (4, 1), "alias": (1, 0), "all": (5, 2)},
+                         profile.collisions())
+
+        report = profile.report()
+        self.assertTrue(report[-1].split()[0] == "all")
+
+
+class TestProfiledExtraction(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        directory = os.path.dirname(os.path.realpath(__file__)) + \
+            "/../core/resources/"
+        corpus = corpora.Corpus.from_file(
+            "test", open(directory + "input.conll", "r"))
+        corpus.documents = corpus.documents[:2]
+
+        for doc in corpus:
+            doc.system_mentions = \
+                mention_extractor.extract_system_mentions(doc)
+
+        cls.corpus = corpus
+
+    def extractor(self, feature_hashing, profile_features=True):
+        return instance_extractors.InstanceExtractor(
+            mention_pairs.extract_training_substructures,
+            [features.fine_type, features.head],
+            [features.exact_match, features.alias],
+            cost_functions.cost_based_on_consistency,
+            feature_hashing=feature_hashing,
+            profile_features=profile_features
+        )
+
+    def test_profile(self):
+        expected = self.extractor("string", profile_features=False)
+        expected_store = expected.extract_store(self.corpus)
+
+        self.assertTrue(expected.profile is None)
+
+        for feature_hashing in ["string", "integer"]:
+            extractor = self.extractor(feature_hashing)
+            store = extractor.extract_store(self.corpus)
+            profile = extractor.profile
+
+            self.assertEqual(len(self.corpus.documents), profile.documents)
+
+            pairs = sum(not pair[1].is_dummy() for struct in
+                        store.mention_pairs(store.substructures)
+                        for pair in struct)
+
+            for name in ["exact_match", "alias"]:
+                self.assertEqual(pairs, profile.calls[name])
+                self.assertTrue(0 < profile.fired[name] < pairs)
+
+            # mention features are computed once per mention in a pair
+            self.assertTrue(
+                0 < profile.calls["head"] <=
+                sum(len(doc.system_mentions) - 1 for doc in self.corpus))
+            self.assertEqual(profile.calls["head"],
+                             profile.calls["fine_type"])
+
+            self.assertEqual(len(set(store.features.tolist())),
+                             len(set().union(*[
+                                 features.values()
+                                 for features in profile.features.values()])))
+
+            if feature_hashing == "string":
+                self.assertTrue(numpy.array_equal(expected_store.features,
+                                                  store.features))
+                self.assertEqual(0, len(store.feature_templates))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import random
+import unittest
+
+from cort.coreference import speakers
+
+
+__author__ = 'smartschat'
+
+
+class TestSpeakerTurns(unittest.TestCase):
+    def test_turns(self):
+        turns = speakers.SpeakerTurns(["a", "a", "b", "a", "a", "-"])
+
+        self.assertEqual([0, 0, 1, 2, 2, 3], turns.turns)
+        self.assertEqual(["a", "b", "a", "-"], turns.turn_speakers)
+
+    def test_only_two_speakers(self):
+        turns = speakers.SpeakerTurns(["a", "a", "b", "a", "b", "c", "b"])
+
+        self.assertTrue(turns.only_two_speakers(0, 1))
+        self.assertTrue(turns.only_two_speakers(0, 4))
+        self.assertTrue(turns.only_two_speakers(3, 4))
+        self.assertFalse(turns.only_two_speakers(4, 6))
+        self.assertFalse(turns.only_two_speakers(0, 3))
+        self.assertFalse(turns.only_two_speakers(3, 6))
+
+    def test_only_two_speakers_agrees_with_scan(self):
+        rng = random.Random(5)
+
+        for _ in range(20):
+            token_speakers = [rng.choice("abc") for _ in range(30)]
+            turns = speakers.SpeakerTurns(token_speakers)
+
+            for start in range(len(token_speakers)):
+                for end in range(start, len(token_speakers)):
+                    allowed = [token_speakers[start], token_speakers[end]]
+
+                    self.assertEqual(
+                        all(token_speaker in allowed for token_speaker
+                            in token_speakers[start:end + 1]),
+                        turns.only_two_speakers(start, end))
+
+    def test_normalize(self):
+        turns = speakers.SpeakerTurns(["Barack_Obama", "-"])
+
+        self.assertEqual("barack obama", turns.normalize("Barack_Obama"))
+        self.assertEqual("john smith", turns.normalize("John_Smith"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+""" Check which modules are imported at startup.
+
+These tests do not measure import times. They only check that heavy
+dependencies are not imported where they are not needed.
+
+numpy and mmh3 are imported at module level by the modules doing numeric
+work, since these run in hot loops. Plotting libraries, and nltk for modules
+not reading documents, are only loaded when needed, and the command line
+tools parse their arguments before importing cort.
+
+The imported modules are obtained by running a fresh interpreter with
+``-X importtime``, which reports each imported module.
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+
+import cort
+
+
+__author__ = 'smartschat'
+
+
+ROOT = os.path.dirname(os.path.abspath(cort.__path__[0]))
+
+
+def imported_modules(arguments):
+    """ Run a Python interpreter and record the modules it imports.
+
+    Args:
+        arguments (list(str)): Arguments passed to the interpreter.
+
+    Returns:
+        set(str): The names of the imported modules.
+    """
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = ROOT
+
+    process = subprocess.Popen([sys.executable, "-X", "importtime"]
+                               + arguments,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               env=environment)
+    _, err = process.communicate()
+
+    modules = set()
+    for line in err.decode("utf-8").splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+
+        modules.add(line.split("|")[-1].strip())
+
+    return modules
+
+
+@unittest.skipIf(sys.version_info < (3, 7), "requires -X importtime")
+class TestStartup(unittest.TestCase):
+    def assert_not_imported(self, modules, packages):
+        imported = [module for module in modules
+                    if module.split(".")[0] in packages]
+        self.assertEqual([], imported)
+
+    def test_core_does_not_import_plotting(self):
+        modules = imported_modules(["-c", "import cort.core.corpora"])
+        self.assertTrue("cort.core.corpora" in modules)
+        self.assert_not_imported(modules, ["matplotlib", "pylab"])
+
+    def test_coreference_does_not_import_nltk(self):
+        modules = imported_modules([
+            "-c",
+            "import cort.coreference.experiments, "
+            "cort.coreference.instance_extractors"])
+        self.assert_not_imported(modules, ["nltk", "matplotlib", "pylab"])
+
+    def test_analysis_does_not_import_numeric_libraries(self):
+        modules = imported_modules([
+            "-c",
+            "import cort.analysis.plotting, cort.analysis.visualization, "
+            "cort.analysis.error_extractors"])
+        self.assert_not_imported(modules, ["matplotlib", "pylab", "numpy",
+                                           "mmh3", "webbrowser"])
+
+    def test_command_line_help_does_not_import_cort(self):
+        for script in ["cort-train", "cort-predict", "cort-sweep",
+                       "cort-template-mass", "run-multigraph"]:
+            modules = imported_modules(
+                [os.path.join(ROOT, "bin", script), "--help"])
+            self.assert_not_imported(modules, ["cort", "nltk", "numpy",
+                                               "mmh3"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,9 @@
 import multiprocessing
 
 
+import numpy
+
+
 __author__ = 'martscsn'
 
 
@@ -31,4 +34,105 @@ def parmap(f, X, nprocs = multiprocessing.cpu_count()):
 
     [p.join() for p in proc]
 
-    return [x for i, x in sorted(res)]
\ No newline at end of file
+    return [x for i, x in sorted(res)]
+
+
+def supports_fork():
+    """ Check whether worker processes can be forked and share memory.
+
+    Returns:
+        bool: True if the platform supports the "fork" start method and
+        ``multiprocessing.shared_memory`` is available.
+    """
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        return False
+
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def arrays_to_shared_memory(arrays):
+    """ Copy arrays into a newly created block of shared memory.
+
+    Only the name of the block and the layout of the arrays need to be sent to
+    another process, which can then retrieve the arrays via
+    ``arrays_from_shared_memory``.
+
+    Args:
+        arrays (list(array.array)): The arrays to copy.
+
+    Returns:
+        (str, list((str, int))): The name of the shared memory block and, for
+        each array, its type code and length.
+    """
+    from multiprocessing import shared_memory
+
+    layout = [(a.typecode, len(a)) for a in arrays]
+    offsets = _offsets(layout)
+
+    block = shared_memory.SharedMemory(create=True, size=max(offsets[-1], 1))
+
+    for a, offset in zip(arrays, offsets):
+        length = len(a) * a.itemsize
+        block.buf[offset:offset + length] = memoryview(a).cast("B")
+
+    name = block.name
+    block.close()
+
+    return name, layout
+
+
+def arrays_from_shared_memory(name, layout):
+    """ Get the arrays stored in a block of shared memory without copying
+    them.
+
+    The name of the block is removed immediately. The memory is freed when
+    the returned arrays and all arrays viewing them have been garbage
+    collected.
+
+    Args:
+        name (str): The name of the shared memory block.
+        layout (list((str, int))): For each array, its type code and length
+            (as returned by ``arrays_to_shared_memory``).
+
+    Returns:
+        list(numpy.array): The arrays stored in the block, as read-only views
+        of the block.
+    """
+    from multiprocessing import shared_memory
+
+    block = shared_memory.SharedMemory(name=name)
+    block.unlink()
+
+    address = numpy.frombuffer(block.buf, dtype=numpy.uint8).ctypes.data
+
+    return [numpy.asarray(_SharedArray(block, address + offset,
+                                       numpy.dtype(typecode), length))
+            for (typecode, length), offset in zip(layout, _offsets(layout))]
+
+
+class _SharedArray:
+    # exposes an array stored in a block of shared memory to numpy. Arrays
+    # created from it keep it, and hence the block, alive; the block is
+    # closed when it is garbage collected
+    def __init__(self, block, address, dtype, length):
+        self.block = block
+        self.__array_interface__ = {
+            "shape": (length,),
+            "typestr": dtype.str,
+            "data": (address, True),
+            "version": 3
+        }
+
+
+def _offsets(layout):
+    # offsets of the arrays in a block of shared memory, aligned to 8 bytes,
+    # followed by the size of the block
+    offsets = [0]
+
+    for typecode, length in layout:
+        end = offsets[-1] + length * numpy.dtype(typecode).itemsize
+        offsets.append(end + -end % 8)
+
+    return offsets
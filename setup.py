@@ -11,6 +11,7 @@ setup(
               'cort.coreference',
               'cort.test.multigraph',
               'cort.test.analysis',
+              'cort.test.coreference',
               'cort.test.core',
               'cort.coreference.multigraph',
               'cort.coreference.approaches',
@@ -38,5 +39,6 @@ setup(
                  'analysis/visualization/lib/*',
                  'resources/*']
     },
-    scripts=['bin/cort-train', 'bin/cort-predict', 'bin/run-multigraph'],
+    scripts=['bin/cort-train', 'bin/cort-predict', 'bin/cort-sweep',
+             'bin/cort-template-mass', 'bin/run-multigraph'],
 )